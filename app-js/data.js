@@ -34,6 +34,7 @@ function convertArrayToDict(data) {
                 Tooltip: item.description !== "N/A" ? item.description : "",
                 WikiUrl: item.url || `https://terraria.wiki.gg/wiki/${item.name.replace(/\s+/g, '_')}`,
                 IconUrl: item.image_url || "",
+                SpriteSlot: item.sprite || null, // "<atlas url>#x,y,w,h" (generator atlas packer), drawn by item cards; IconUrl stays the fallback
                 IsHardmode: item.hardmode || false,
                 Stats: {
                     Damage: item.stats?.damage || -1,
@@ -54,8 +55,10 @@ function convertArrayToDict(data) {
                         Name: ing.name,
                         Amount: ing.amount
                     })),
-                    IsTransmutation: r.transmutation || false
+                    IsTransmutation: r.transmutation || false,
+                    RawMaterials: r.raw_materials || null // Precomputed totals for one craft (generator rollup)
                 })),
+                CraftingDepth: item.crafting?.depth ?? null,
                 ObtainedFromDrops: (item.acquisition || []).map(acq => ({
                     SourceNPC_Name: acq.source,
                     DropChance: acq.rate,
@@ -180,7 +183,9 @@ async function loadVersionData(targetVersion) {
         if (!res.ok) {
             if (targetVersion === '1.4.5') {
                 console.warn(`[Engine] Modern exports not found. Falling back to Legacy Python...`);
-                res = await fetch('terraria_items.json');
+                // Prefer the minified build (served precompressed where the host supports it)
+                res = await fetch('terraria_items.min.json');
+                if (!res.ok) res = await fetch('terraria_items.json');
                 if (!res.ok) throw new Error("No data files found for this version.");
                 loadedEnv = "Vanilla";
                 usedLegacy = true;
@@ -165,8 +165,11 @@ const imageObserver = new IntersectionObserver((entries, observer) => {
             if (img.dataset.src && !pendingImages.has(img)) {
                 const timeoutId = setTimeout(() => {
                     if (img.dataset.src) {
-                        img.src = img.dataset.src;
+                        const src = img.dataset.src;
+                        if (img.dataset.slot) spriteSlotImage(img.dataset.slot).then(url => { img.src = url; }, () => { img.src = src; });
+                        else img.src = src;
                         img.removeAttribute('data-src');
+                        img.removeAttribute('data-slot');
                     }
                     observer.unobserve(img); // INSTANT CPU RELIEF: Stop tracking this node!
                     pendingImages.delete(img);
@@ -185,6 +188,33 @@ const imageObserver = new IntersectionObserver((entries, observer) => {
     rootMargin: '300px' // Optimized margin
 });
 
+// --- Sprite atlases ---
+// A SpriteSlot ("<atlas url>#x,y,w,h") is cut out of its atlas once; every card showing it reuses the result.
+const spriteAtlases = new Map(); // atlas url -> Promise<HTMLImageElement>
+const spriteSlots = new Map();   // SpriteSlot -> Promise<data URL>
+function spriteSlotImage(slot) {
+    if (!spriteSlots.has(slot)) {
+        const [atlasUrl, rect] = slot.split('#');
+        const [x, y, w, h] = rect.split(',').map(Number);
+        if (!spriteAtlases.has(atlasUrl)) {
+            spriteAtlases.set(atlasUrl, new Promise((resolve, reject) => {
+                const atlas = new Image();
+                atlas.onload = () => resolve(atlas);
+                atlas.onerror = reject;
+                atlas.src = atlasUrl;
+            }));
+        }
+        spriteSlots.set(slot, spriteAtlases.get(atlasUrl).then(atlas => {
+            const canvas = document.createElement('canvas');
+            canvas.width = w;
+            canvas.height = h;
+            canvas.getContext('2d').drawImage(atlas, x, y, w, h, 0, 0, w, h);
+            return canvas.toDataURL();
+        }));
+    }
+    return spriteSlots.get(slot);
+}
+
 function createDirectImageUrl(name) {
     if (!name) return FALLBACK_ICON;
     
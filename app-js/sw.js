@@ -1,5 +1,5 @@
 // sw.js - Service Worker for Terraria App
-const CACHE_NAME = 'terraria-app-cache-v4';
+const CACHE_NAME = 'terraria-app-cache-v5';
 const TRACKER_CACHE = 'terraria-icons-tracker-v4';
 const EXPIRY_DAYS = 7;
 const EXPIRY_MS = EXPIRY_DAYS * 24 * 60 * 60 * 1000;
@@ -17,7 +17,7 @@ const CORE_ASSETS = [
     '/app-js/tree-core.js',
     '/app-js/tree-nodes.js',
     '/app-js/ui.js',
-    '/terraria_items.json',
+    '/terraria_items.min.json',
     // Add any specific CSS files or local fonts here if they aren't inline
 ];
 
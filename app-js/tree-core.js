@@ -130,6 +130,7 @@ function createItemCardElement(data, sizeClasses, contextRecipe = null, customCl
     const img = document.createElement('img');
     img.src = FALLBACK_ICON;
     img.dataset.src = data.IconUrl || createDirectImageUrl(data.DisplayName || data.name);
+    if (data.SpriteSlot) img.dataset.slot = data.SpriteSlot; // Cut from a shared atlas; dataset.src stays the fallback
     img.draggable = false; 
     img.ondragstart = (e) => e.preventDefault(); // Strict JS block
     img.className = sizeClasses.includes('w-32') ? 'w-14 h-14 object-contain mb-2' : 'w-10 h-10 object-contain mb-1';
@@ -0,0 +1,376 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+SPRITES_DIR = "sprites"
+CACHE_FILE = ".wiki_cache.sqlite"  # The generator's response cache, replayed by --recording
+HOST = "127.0.0.1"
+PORT = 8765
+
+# A handful of real wiki categories (keys of the generator's CATEGORY_MAP) for the synthetic pages
+SYNTHETIC_CATEGORIES = ["Broadswords", "Yoyos", "Bows", "Guns", "Wands", "Pickaxes", "Axes", "Head armor",
+                        "Wings", "Potion items", "Arrows", "Material items"]
+SYNTHETIC_STATIONS = ["Iron Anvil", "Work Bench", "By Hand", "Mythril Anvil", "Furnace", "Shimmer"]
+
+# ==========================================
+# WIKI CONTENT
+# ==========================================
+
+def sprite_names(sprites_dir: str = SPRITES_DIR) -> list:
+    return sorted(os.path.splitext(f)[0].replace("_", " ") for f in os.listdir(sprites_dir) if f.endswith(".png"))
+
+class SyntheticWiki:
+    """Deterministic Items/Recipes/Drops Cargo tables, page categories and redirects built from item names.
+
+    The first tenth of the names are base materials without recipes. Other items are
+    crafted from materials and, like upgrade chains, from one earlier crafted item, so
+    the recipe graph is acyclic and rolled-up amounts stay realistic. About 5% of
+    ingredient names and drop sources are redirect titles ("<name> (old)"), so the
+    generator's alias resolution has real work to do.
+
+    edit_page, create_page, delete_page and move_page change the tables the way the wiki
+    would and log the change for list=recentchanges, so --incremental builds can be
+    checked against a full crawl of the changed wiki.
+    """
+
+    def __init__(self, names: list, recipes_per_item: int = 2, seed: int = 0):
+        rng = random.Random(seed)
+        self.names = names
+        crafted_from = max(1, len(names) // 10)
+        materials = names[:crafted_from]
+        self.redirects = {f"{name} (old)": name for name in rng.sample(materials, len(materials) // 2)}
+        aliases = list(self.redirects)
+        npcs = [f"NPC {n}" for n in range(max(1, len(names) // 10))]
+        self.redirects.update({f"{npc} (old)": npc for npc in npcs[:len(npcs) // 20]})
+        npc_aliases = [alias for alias in self.redirects if alias.startswith("NPC ")]
+
+        def ingredients(rid: int) -> str:
+            parts = []
+            for _ in range(rng.randint(1, 4)):
+                roll = rng.random()
+                if roll < 0.05 and aliases:
+                    parts.append(f"¦{rng.choice(aliases)}¦{rng.randint(1, 20)}")
+                elif roll < 0.2 and rid - 1 > crafted_from:
+                    parts.append(f"¦{names[rng.randrange(crafted_from, rid - 1)]}¦1")
+                else:
+                    parts.append(f"¦{rng.choice(materials)}¦{rng.randint(1, 20)}")
+            return "^".join(parts)
+
+        self.tables = {
+            "Items": [{"_pageName": name, "itemid": str(i + 1), "name": name, "tooltip": rng.choice(["", "<i>'Mass production'</i>", "[c/FF0000:Expert] item"]),
+                       "damage": str(rng.randint(0, 90)), "rare": str(rng.randint(0, 10)), "hardmode": rng.choice(["1", ""]),
+                       "type": rng.choice(["Weapon", "Tool", "Armor", "Crafting material", "Weapon^Crafting material", ""]),
+                       "damagetype": rng.choice(["Melee", "Ranged", "Magic", "Summon", ""]), "axe": "", "hammer": ""}
+                      for i, name in enumerate(names)],
+            "Recipes": [{"_pageName": names[rid - 1], "resultid": str(rid), "station": rng.choice(SYNTHETIC_STATIONS),
+                         "ings": ingredients(rid), "args": rng.choice(["", "", "", "console", "removed"])}
+                        for rid in (rng.randint(crafted_from + 1, len(names)) for _ in range(len(names) * recipes_per_item))],
+            "Drops": [{"_pageName": name, "item": name, "name": rng.choice(npc_aliases) if npc_aliases and rng.random() < 0.05 else rng.choice(npcs),
+                       "rate": rng.choice(["1/50", "5%", "100%"])}
+                      for name in names if rng.random() < 0.3],
+        }
+        self.categories = {name: rng.choice(SYNTHETIC_CATEGORIES) for name in names if rng.random() < 0.6}
+        self.changes = []  # recentchanges entries, oldest first
+
+    def log_change(self, title: str, kind: str, **log):
+        change = {"type": kind, "ns": 0, "title": title, "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        if log:
+            change.update(log)
+        self.changes.append(change)
+
+    def page_rows(self, page: str) -> dict:
+        return {table: [row for row in rows if row["_pageName"] == page] for table, rows in self.tables.items()}
+
+    def edit_page(self, page: str, edit):
+        """Calls edit(rows) with this page's rows per table, to change, add or remove rows, then writes them back."""
+        rows = self.page_rows(page)
+        edit(rows)
+        for table in self.tables:
+            self.tables[table] = [row for row in self.tables[table] if row["_pageName"] != page] + [{**row, "_pageName": page} for row in rows[table]]
+        self.log_change(page, "edit")
+
+    def create_page(self, page: str, rows: dict, category: str | None = None):
+        for table, new_rows in rows.items():
+            self.tables[table].extend({**row, "_pageName": page} for row in new_rows)
+        if category:
+            self.categories[page] = category
+        self.log_change(page, "new")
+
+    def delete_page(self, page: str):
+        for table in self.tables:
+            self.tables[table] = [row for row in self.tables[table] if row["_pageName"] != page]
+        self.categories.pop(page, None)
+        self.log_change(page, "log", logtype="delete", logaction="delete", logparams={})
+
+    def move_page(self, page: str, target: str):
+        """Renames the page and the item it defines; the old title becomes a redirect."""
+        for rows in self.tables.values():
+            for row in rows:
+                if row["_pageName"] == page:
+                    row["_pageName"] = target
+                    for field in ("name", "item"):
+                        if row.get(field) == page: row[field] = target
+        if page in self.categories:
+            self.categories[target] = self.categories.pop(page)
+        self.redirects[page] = target
+        self.log_change(page, "log", logtype="move", logaction="move", logparams={"target_ns": 0, "target_title": target})
+
+    def respond(self, params: dict) -> dict:
+        if params.get("action") == "cargoquery":
+            return self.cargoquery(params)
+        if params.get("action") != "query":
+            return api_error("badvalue", f"Unrecognized value for parameter \"action\": {params.get('action')}.")
+        if params.get("list") == "recentchanges":
+            # Newest first, back to rcend; only the types asked for in rctype
+            kinds = params.get("rctype", "edit|new").split("|")
+            changes = [c for c in reversed(self.changes) if c["type"] in kinds and c["timestamp"] >= params.get("rcend", "")]
+            return {"batchcomplete": "", "query": {"recentchanges": changes}}
+        if params.get("list") == "categorymembers":
+            category = params.get("cmtitle", "").split(":", 1)[-1]
+            return {"batchcomplete": "", "query": {"categorymembers": [{"ns": 0, "title": name} for name, c in self.categories.items() if c == category]}}
+        titles = [t for t in params.get("titles", "").split("|") if t]
+        query = {}
+        if params.get("redirects"):
+            # Like MediaWiki, follow redirects to redirects (a moved page's old titles) and list every hop
+            hops, resolved = {}, []
+            for title in titles:
+                while title in self.redirects and title not in hops:
+                    hops[title] = self.redirects[title]
+                    title = self.redirects[title]
+                resolved.append(title)
+            query["redirects"] = [{"from": source, "to": target} for source, target in hops.items()]
+            titles = list(dict.fromkeys(resolved))
+        pages = {}
+        for n, title in enumerate(titles):
+            page = {"ns": 0, "title": title}
+            if params.get("prop") == "categories" and title in self.categories:
+                page["categories"] = [{"ns": 14, "title": f"Category:{self.categories[title]}"}]
+            pages[str(n + 1)] = page
+        query["pages"] = pages
+        return {"batchcomplete": "", "query": query}
+
+    def cargoquery(self, params: dict) -> dict:
+        table = self.tables.get(params.get("tables"))
+        if table is None:
+            return api_error("MWException", f"Table {params.get('tables')} not found.")
+        where = params.get("where")
+        if where:
+            # Only the `field IN ("a", "b")` form used by --incremental
+            match = re.match(r'(\w+) IN \((.*)\)$', where)
+            if not match:
+                return api_error("MWException", f"Unsupported where clause: {where}")
+            wanted = {unquote_cargo(v) for v in re.findall(r'"((?:[^"\\]|\\.)*)"', match.group(2))}
+            table = [row for row in table if row.get(match.group(1)) in wanted]
+        fields = [f.strip() for f in params.get("fields", "").split(",") if f.strip()]
+        if len(fields) == 1 and fields[0].upper().startswith("COUNT(*)"):
+            # The `COUNT(*)=alias` row count the generator asks for before paging concurrently
+            alias = fields[0].partition("=")[2] or "COUNT(*)"
+            return {"cargoquery": [{"title": {alias: str(len(table))}}]}
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 50))
+        return {"cargoquery": [{"title": {f: row.get(f, "") for f in fields}} for row in table[offset:offset + limit]]}
+
+class RecordedWiki:
+    """Replays the generator's ResponseCache: every request it made is answered with the body it got."""
+
+    def __init__(self, path: str = CACHE_FILE):
+        db = sqlite3.connect(path)
+        self.bodies = dict(db.execute("SELECT params, body FROM responses"))
+        db.close()
+
+    def respond(self, params: dict) -> dict:
+        # Same normalization as ResponseCache.normalize (values arrive as strings already)
+        body = self.bodies.get(json.dumps(params, sort_keys=True, ensure_ascii=False))
+        return json.loads(body) if body is not None else api_error("notrecorded", f"No recorded response for {params}")
+
+def unquote_cargo(value: str) -> str:
+    return re.sub(r'\\(.)', r'\1', value)
+
+def file_url(base_url: str, filename: str) -> str:
+    """The IconUrl DataExporterMod would export for `filename`, on this server."""
+    return f"{base_url}/wiki/Special:FilePath/{quote(filename)}"
+
+def api_error(code: str, info: str) -> dict:
+    return {"error": {"code": code, "info": info}}
+
+def placeholder_png(name: str) -> bytes:
+    """A valid 1x1 PNG whose colour is derived from `name`, so distinct sprites have distinct bytes."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rgba = hashlib.sha256(name.encode("utf-8")).digest()[:3] + b"\xff"
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00" + rgba)) + chunk(b"IEND", b""))
+
+# ==========================================
+# HTTP SERVER
+# ==========================================
+
+class FakeWiki:
+    """A local stand-in for terraria.wiki.gg: /api.php, /wiki/Special:FilePath/<file> and /images/<file>.
+
+    GET /__stats returns the request counters as JSON, free of latency and 429s.
+
+    Every request is delayed by `latency_ms` +/- `jitter_ms`, and a `rate_429` share of them
+    is answered with HTTP 429 and a Retry-After header instead. Special:FilePath redirects to
+    /images/ like the real wiki; images carry an ETag and honour If-None-Match. Images come
+    from `sprites_dir` when the file exists there, otherwise (synthetic content only) a
+    generated placeholder PNG.
+    """
+
+    def __init__(self, content, sprites_dir: str = SPRITES_DIR, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 rate_429: float = 0.0, retry_after: int = 1, seed: int = 0):
+        self.content = content
+        self.sprites_dir = sprites_dir
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.rate_429, self.retry_after = rate_429, retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"api_requests": 0, "file_requests": 0, "http_429": 0, "not_modified": 0, "bytes": 0}
+
+    def count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    def delay_and_throttle(self) -> bool:
+        """Sleeps for the simulated latency; returns True when this request should get a 429."""
+        with self._lock:
+            delay = max(0.0, self._rng.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)) / 1000
+            throttled = self._rng.random() < self.rate_429
+        time.sleep(delay)
+        return throttled
+
+    def image(self, filename: str) -> bytes | None:
+        path = os.path.join(self.sprites_dir, filename)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        if isinstance(self.content, SyntheticWiki):
+            return placeholder_png(filename)
+        return None
+
+    def start(self, host: str = HOST, port: int = 0) -> str:
+        """Serves from a daemon thread; port 0 picks a free one. Returns the base URL."""
+        self._server = ThreadingHTTPServer((host, port), FakeWikiHandler)
+        self._server.daemon_threads = True
+        self._server.wiki = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class FakeWikiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the real wiki offers
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes; don't let delayed ACKs stall the body
+
+    def do_GET(self):
+        wiki = self.server.wiki
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            with wiki._lock:
+                stats = dict(wiki.stats)
+            return self.reply(200, json.dumps(stats).encode("utf-8"), "application/json")
+        if wiki.delay_and_throttle():
+            wiki.count(http_429=1)
+            return self.reply(429, b'{"error": {"code": "ratelimited"}}', "application/json", {"Retry-After": str(wiki.retry_after)})
+
+        if url.path == "/api.php":
+            wiki.count(api_requests=1)
+            params = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+            return self.reply(200, json.dumps(wiki.content.respond(params), ensure_ascii=False).encode("utf-8"), "application/json")
+
+        if url.path.startswith("/wiki/Special:FilePath/"):
+            return self.reply(302, b"", "text/plain", {"Location": "/images/" + url.path.split("/", 3)[-1]})
+
+        if url.path.startswith("/images/"):
+            wiki.count(file_requests=1)
+            body = wiki.image(unquote(url.path[len("/images/"):]))
+            if body is None:
+                return self.reply(404, b"Not Found", "text/plain")
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                wiki.count(not_modified=1)
+                return self.reply(304, b"", "image/png", {"ETag": etag})
+            return self.reply(200, body, "image/png", {"ETag": etag})
+
+        self.reply(404, b"Not Found", "text/plain")
+
+    def reply(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        if self.path != "/__stats":
+            self.server.wiki.count(bytes=len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown out the benchmark output
+
+# ==========================================
+# ENTRY POINT
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Terraria wiki's MediaWiki/Cargo API and sprite files.")
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port (default: %(default)s)")
+    parser.add_argument("--recording", metavar="CACHE_FILE", help=f"Replay a generator response cache such as {CACHE_FILE} instead of synthetic content")
+    parser.add_argument("--items", type=int, default=0, help="Synthetic items, taken from the sprite names (default: all)")
+    parser.add_argument("--sprites-dir", default=SPRITES_DIR, help="Sprite files served through Special:FilePath (default: %(default)s)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean delay added to every request (default: %(default)s)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- spread around the latency (default: %(default)s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with HTTP 429 (default: %(default)s)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with each 429 (default: %(default)s)")
+    parser.add_argument("--export-file", help="Also write a DataExporterMod-style export whose IconUrls point at this server, for `python -m terraria_pipeline sprites --json-file`")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.recording:
+        content = RecordedWiki(args.recording)
+        print(f"Replaying {len(content.bodies)} recorded responses from {args.recording}.")
+    else:
+        content = SyntheticWiki(sprite_names(args.sprites_dir)[:args.items or None], seed=args.seed)
+        print(f"Serving {len(content.names)} synthetic items ({sum(map(len, content.tables.values()))} Cargo rows).")
+    wiki = FakeWiki(content, args.sprites_dir, args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after, args.seed)
+    base_url = wiki.start(port=args.port)
+    if args.export_file:
+        names = content.names if isinstance(content, SyntheticWiki) else sprite_names(args.sprites_dir)
+        with open(args.export_file, 'w', encoding='utf-8') as f:
+            json.dump([{"DisplayName": name, "IconUrl": file_url(base_url, name.replace(" ", "_") + ".png")} for name in names], f, indent=1)
+        print(f"Wrote {len(names)} icon URLs to {args.export_file}.")
+    # pipeline-benchmarks.py e2e waits for this line
+    print(f"Listening on {base_url} (python -m terraria_pipeline build --api-url {base_url}/api.php)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        wiki.stop()
+        print(f"\nStopped. {wiki.stats}")
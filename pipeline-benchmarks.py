@@ -0,0 +1,1031 @@
+import argparse
+import contextlib
+import filecmp
+import gc
+import gzip
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from terraria_pipeline import generator as gen, normalizer as norm, sprites as dl
+from terraria_pipeline import columnar as col, crafting as craft, exports as exp, search as srch, sitemap as smap, store as st, versions as ver, wikitext as wt
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+FAKE_WIKI_SCRIPT = "fake-wiki-server.py"
+BASELINE_FILE = "pipeline-benchmarks.baseline.json"  # Reference timings for the e2e benchmark, written by --update-baseline
+SPRITES_DIR = "sprites"
+CACHE_FILE = ".wiki_cache.sqlite"  # The generator's response cache; real Cargo rows are harvested from it
+DATABASE_FILE = "terraria_items.json"
+
+# Generic type / damage class / tool stat combinations crossed with every sprite name
+CLASSIFIER_VARIANTS = [
+    ([], "", {}),
+    (["Weapon"], "Melee", {}),
+    (["Weapon"], "Ranged", {}),
+    (["Weapon"], "Summon", {}),
+    (["Weapon"], "Magic", {}),
+    (["Armor"], "", {}),
+    (["Vanity"], "", {}),
+    (["Weapon", "Armor"], "Summon", {}),
+    (["Tool"], "Melee", {"axe": 15.0}),
+    (["Tool"], "Melee", {"hammer": 55.0}),
+    (["Crafting material"], "", {}),
+    (["Consumable"], "Ranged", {}),
+]
+
+def sprite_names() -> list:
+    return sorted(os.path.splitext(f)[0].replace("_", " ") for f in os.listdir(SPRITES_DIR) if f.endswith(".png"))
+
+def time_per_call(fn, inputs, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time per input, in microseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            fn(value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6
+
+# ==========================================
+# STEP 3 CLASSIFIER
+# ==========================================
+
+def legacy_detective(item: dict) -> str | None:
+    """The original if/elif Detective Inference chain, kept verbatim as the golden reference."""
+    name_lower = item["name"].lower()
+    dmg_class = item.get("damage_class", "").lower()
+    g_types_lower = [t.lower() for t in item["generic_types"]]
+
+    if "pickaxe" in name_lower: return "Pickaxe"
+    elif "hamaxe" in name_lower: return "Hamaxe"
+    elif "chainsaw" in name_lower: return "Chainsaw"
+    elif "drill" in name_lower: return "Drill"
+    elif item["stats"].get("axe") and "axe" in name_lower: return "Axe"
+    elif item["stats"].get("hammer") and "hammer" in name_lower: return "Hammer"
+    elif "fishing pole" in name_lower: return "Fishing Pole"
+    elif "weapon" in g_types_lower:
+        if "whip" in name_lower and dmg_class == "summon": return "Whip"
+        elif "staff" in name_lower: return "Minion Summon" if dmg_class == "summon" else "Wand"
+        elif any(x in name_lower for x in ["sword", "blade", "saber", "katana", "scimitar", "claymore"]): return "Sword"
+        elif "bow" in name_lower and dmg_class == "ranged": return "Bow"
+        elif "gun" in name_lower and dmg_class == "ranged": return "Gun"
+        elif "yoyo" in name_lower: return "Yoyo"
+        elif any(x in name_lower for x in ["spear", "lance", "pike", "trident", "halberd"]): return "Spear"
+    elif "armor" in g_types_lower or "vanity" in g_types_lower:
+        if any(x in name_lower for x in ["helmet", "headgear", "mask", "hat", "hood", "cap", "crown", "goggles", "helm"]): return "Head Armor"
+        elif any(x in name_lower for x in ["breastplate", "shirt", "robe", "chainmail", "tunic", "chestplate", "suit", "armor"]): return "Body Armor"
+        elif any(x in name_lower for x in ["leggings", "greaves", "pants", "boots"]): return "Leg Armor"
+    elif any(x in name_lower for x in ["potion", "flask", "brew"]): return "Potion"
+    elif "dye" in name_lower: return "Dye"
+    elif "arrow" in name_lower: return "Arrow"
+    elif "bullet" in name_lower: return "Bullet"
+    elif any(x in name_lower for x in ["fish", "koi", "trout", "salmon", "bass", "jellyfish", "tuna", "minnow"]): return "Fish"
+    elif any(x in name_lower for x in ["seed", "spore"]): return "Seed"
+    elif "crate" in name_lower: return "Crate"
+    return None
+
+def bench_classifier(args) -> bool:
+    corpus = [
+        {"name": name, "generic_types": g_types, "damage_class": dmg_class, "stats": stats}
+        for name in sprite_names()
+        for g_types, dmg_class, stats in CLASSIFIER_VARIANTS
+    ]
+
+    mismatches = [(item, legacy_detective(item), gen.DETECTIVE.classify(item)) for item in corpus if legacy_detective(item) != gen.DETECTIVE.classify(item)]
+    for item, expected, actual in mismatches[:10]:
+        print(f"  [MISMATCH] {item['name']} {item['generic_types']} {item['damage_class']}: expected {expected}, got {actual}")
+    print(f"Golden check: {len(corpus) - len(mismatches)}/{len(corpus)} classifications identical to the legacy chain.")
+
+    legacy_us = time_per_call(legacy_detective, corpus)
+    compiled_us = time_per_call(gen.DETECTIVE.classify, corpus)
+    ratio = compiled_us / legacy_us
+    print(f"Legacy chain:   {legacy_us:.2f} us/item")
+    print(f"Compiled rules: {compiled_us:.2f} us/item ({ratio:.2f}x of legacy, limit {args.max_ratio:.2f}x)")
+    return not mismatches and ratio <= args.max_ratio
+
+# ==========================================
+# TEXT NORMALIZATION
+# ==========================================
+
+# Representative raw Cargo values (Items.tooltip/type/damagetype, Recipes.station/ings, Drops.*),
+# used when no response cache is available to harvest real rows from.
+NORMALIZER_FIXTURES = [
+    "Iron Anvil", "Iron Anvil", "Work Bench", "By Hand", "Mythril Anvil", "Ancient Manipulator",
+    "Furnace", "Shimmer", "Chlorophyte Extractinator", "Tinkerer's Workshop", "Crystal Ball",
+    "Melee", "Ranged", "Magic", "Summon", "Weapon^Tool", "Crafting material^Block", "Accessory",
+    "¦Iron Bar¦10^¦Wood¦3", "¦Lead Bar¦8^¦Any Wood¦3", "¦Copper Bar¦12", "¦Soul of Light¦15^¦Pixie Dust¦12^¦Unicorn Horn¦1",
+    "¦[[Fallen Star|Fallen Star]]¦5^¦Iron Bar¦10", "¦Gel¦2^¦Wood¦1",
+    "Can mine Meteorite", "<i>'Mass production'</i>", "Increases movement speed by 10%<br/>Allows flight",
+    "[c/FF0000:Expert] Summons a [[Baby Slime|baby slime]] to fight for you\nThe slime follows", "[i:3456] Right click to open", "Line one\n[i:58]\nLine two", "[c/FFD700:[[Gold Coin|Gold]]] coins",
+    "Zombie", "Demon Eye", "Eye of Cthulhu", "1/50 (2%)", "[[Treasure Bag (Eye of Cthulhu)|Treasure Bag]]",
+]
+
+def load_normalizer_fixtures(cache_file: str) -> tuple:
+    """Returns (text fields, ingredient strings) from cached Cargo rows, or the built-in fixtures."""
+    texts, ings = [], []
+    if os.path.exists(cache_file):
+        db = sqlite3.connect(cache_file)
+        for (body,) in db.execute("SELECT body FROM responses"):
+            for entry in json.loads(body).get("cargoquery", []):
+                for key, value in entry.get("title", {}).items():
+                    if isinstance(value, str) and value:
+                        (ings if key == "ings" else texts).append(value)
+        db.close()
+    if not texts:
+        print(f"(No Cargo rows in {cache_file}; using built-in fixtures.)")
+        texts = [v for v in NORMALIZER_FIXTURES if "¦" not in v]
+        ings = [v for v in NORMALIZER_FIXTURES if "¦" in v]
+    return texts, ings
+
+def legacy_sanitize_text(text: str) -> str:
+    """The original four uncompiled re.sub passes, kept verbatim as the golden reference."""
+    if not text: return ""
+    text = re.sub(r'<[^>]+>', ' ', text)
+    text = re.sub(r'\[c/[a-fA-F0-9]{6}:(.*?)\]', r'\1', text)
+    text = re.sub(r'\[[a-zA-Z]:.*?\]', '', text)
+    text = re.sub(r'\[\[(?:[^|\]]*\|)?([^\]]+)\]\]', r'\1', text)
+    return re.sub(r'[\r\n\t]+', ' ', text).strip()
+
+def legacy_parse_ingredients(ings_string: str) -> list:
+    ingredients = []
+    if not ings_string: return ingredients
+    for part in ings_string.split('^'):
+        match = re.search(r'¦(.*?)¦(\d+)', part)
+        if match:
+            ingredients.append({"name": legacy_sanitize_text(match.group(1)), "amount": int(match.group(2))})
+    return ingredients
+
+def bench_normalizer(args) -> bool:
+    texts, ings = load_normalizer_fixtures(args.cache_file)
+    # A build normalizes the same strings over and over; mimic that with a repeated, shuffled workload.
+    rng = random.Random(0)
+    text_load = [rng.choice(texts) for _ in range(args.calls)]
+    ing_load = [rng.choice(ings) for _ in range(args.calls)] if ings else []
+
+    mismatches = [t for t in texts if wt.sanitize_text(t) != legacy_sanitize_text(t)]
+    mismatches += [s for s in ings if wt.parse_ingredients(s) != legacy_parse_ingredients(s)]
+    for value in mismatches[:10]:
+        print(f"  [MISMATCH] {value!r}")
+    print(f"Golden check: {len(texts) + len(ings) - len(mismatches)}/{len(texts) + len(ings)} distinct fixtures byte-identical.")
+
+    def run_new(_):
+        for t in text_load: wt.sanitize_text(t)
+        for s in ing_load: wt.parse_ingredients(s)
+
+    def run_cold(_):
+        wt._sanitize_text.cache_clear()
+        wt._parse_ingredient_pairs.cache_clear()
+        run_new(_)
+
+    def run_legacy(_):
+        for t in text_load: legacy_sanitize_text(t)
+        for s in ing_load: legacy_parse_ingredients(s)
+
+    calls = len(text_load) + len(ing_load)
+    legacy_us = time_per_call(run_legacy, [None], repeat=3) / calls
+    cold_us = time_per_call(run_cold, [None], repeat=3) / calls
+    new_us = time_per_call(run_new, [None], repeat=3) / calls
+    ratio = new_us / legacy_us
+    print(f"Workload: {calls} calls over {len(set(texts)) + len(set(ings))} distinct strings")
+    print(f"Legacy passes:      {legacy_us:.3f} us/call")
+    print(f"Engine (cold memo): {cold_us:.3f} us/call")
+    print(f"Engine (warm memo): {new_us:.3f} us/call ({ratio:.2f}x of legacy, limit {args.max_ratio:.2f}x)")
+    return not mismatches and ratio <= args.max_ratio
+
+# ==========================================
+# ITEM STORE
+# ==========================================
+
+def synthetic_rows(names: list, recipes_per_item: int, heavy_items: int, sources_per_heavy_item: int) -> tuple:
+    """Items/Recipes/Drops rows shaped like Cargo output, with a few very heavily dropped items."""
+    rng = random.Random(0)
+    stations = ["Iron Anvil", "Work Bench", "By Hand", "Mythril Anvil", "Furnace", "Shimmer"]
+    item_rows = [{"itemid": str(i + 1), "name": name, "type": "Weapon^Crafting material", "damagetype": "Melee", "damage": "12", "rare": "2"} for i, name in enumerate(names)]
+    recipe_rows = [
+        {"resultid": str(rng.randint(1, len(names))), "station": rng.choice(stations),
+         "ings": "^".join(f"¦{rng.choice(names)}¦{rng.randint(1, 20)}" for _ in range(rng.randint(1, 4)))}
+        for _ in range(len(names) * recipes_per_item)
+    ]
+    npcs = [f"NPC {n}" for n in range(sources_per_heavy_item)]
+    drop_rows = [{"item": names[i], "name": npc, "rate": "1/50"} for i in range(heavy_items) for npc in npcs]
+    drop_rows += [{"item": rng.choice(names), "name": rng.choice(npcs), "rate": "5%"} for _ in range(len(names))]
+    return item_rows, recipe_rows, drop_rows
+
+def legacy_build(gen, item_rows, recipe_rows, drop_rows) -> dict:
+    """The old dict-of-dicts build: _recipe_signatures sets and a list scan per Drops row."""
+    items_db, name_to_id_map = {}, {}
+    for data in item_rows:
+        item_id, record = gen.build_item_payload(data)
+        items_db[item_id] = record.to_payload()
+        name_to_id_map[record.name.lower()] = item_id
+    for data in recipe_rows:
+        rid, args_lower = data["resultid"], str(data.get("args", "")).lower()
+        if any(flag in args_lower for flag in ["removed", "historical", "obsolete", "deprecated", "legacy", "old=", "former", "unobtainable", "desktop=n", "desktop=false", "desktop=0", "pc=n", "pc=false", "pc=0"]): continue
+        if re.search(r'(?:version|patch)[=:\s\'"]+[0-9]+\.[0-9]+', args_lower): continue
+        if re.search(r'\b[0-9]+\.[0-9]+(?:\.[0-9]+)?\s*=\s*(?:n|false|0)\b', args_lower): continue
+        resolved_ings = wt.parse_ingredients(data["ings"])
+        station = wt.sanitize_text(data["station"])
+        signature = station + "|" + "|".join(sorted([f"{i['name']}:{i['amount']}" for i in resolved_ings]))
+        existing = items_db[rid].setdefault("_recipe_signatures", set())
+        if signature not in existing:
+            existing.add(signature)
+            items_db[rid]["crafting"]["recipes"].append({"station": station, "ingredients": resolved_ings, "version": "Desktop", "transmutation": "shimmer" in station.lower()})
+    for item in items_db.values(): item.pop("_recipe_signatures", None)
+    for data in drop_rows:
+        item_name, source_name = wt.sanitize_text(data["item"]).lower(), wt.sanitize_text(data["name"])
+        if item_name in name_to_id_map:
+            item_id = name_to_id_map[item_name]
+            if source_name not in [x['source'] for x in items_db[item_id]["acquisition"]]:
+                items_db[item_id]["acquisition"].append({"type": "drop", "source": source_name, "rate": wt.sanitize_text(data["rate"])})
+    return items_db
+
+def store_build(gen, item_rows, recipe_rows, drop_rows):
+    items_db = st.ItemStore()
+    for data in item_rows:
+        items_db.add(*gen.build_item_payload(data))
+    for data in recipe_rows:
+        gen.add_recipe_row(items_db, data)
+    for data in drop_rows:
+        gen.add_drop_row(items_db, data)
+    return items_db
+
+def measure(gen, fn, *args) -> tuple:
+    """(result, best-of-3 seconds, retained MiB, peak MiB, index MiB); memory is traced in a separate run.
+
+    Index MiB is the size of the ItemStore reverse-index containers and their signature tuples
+    (0 for the dict build); ids and source names are shared with the records.
+    """
+    elapsed = float("inf")
+    for _ in range(3):
+        wt._sanitize_text.cache_clear()
+        wt._parse_ingredient_pairs.cache_clear()
+        start = time.perf_counter()
+        fn(gen, *args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    wt._sanitize_text.cache_clear()
+    wt._parse_ingredient_pairs.cache_clear()
+    tracemalloc.start()
+    result = fn(gen, *args)
+    retained, peak = (size / 2**20 for size in tracemalloc.get_traced_memory())
+    tracemalloc.stop()
+    index_mb = 0.0
+    if isinstance(result, st.ItemStore):
+        index_mb = sum(sys.getsizeof(index) + sum(sys.getsizeof(owners) for owners in index.values() if isinstance(owners, set))
+                       for index in (result.by_drop_source, result.by_recipe_signature))
+        index_mb = (index_mb + sum(map(sys.getsizeof, result.by_recipe_signature))) / 2**20
+    return result, elapsed, retained, peak, index_mb
+
+def bench_store(args) -> bool:
+    rows = synthetic_rows(sprite_names(), args.recipes_per_item, args.heavy_items, args.sources_per_heavy_item)
+    print(f"Workload: {len(rows[0])} items, {len(rows[1])} recipe rows, {len(rows[2])} drop rows")
+
+    legacy_db, legacy_s, legacy_mb, legacy_peak, _ = measure(gen, legacy_build, *rows)
+    store_db, store_s, store_mb, store_peak, index_mb = measure(gen, store_build, *rows)
+    identical = json.dumps(legacy_db, sort_keys=True) == json.dumps(store_db.to_payloads(), sort_keys=True)
+    print(f"Golden check: ItemStore export {'matches' if identical else 'DIFFERS FROM'} the dict-of-dicts build.")
+    print(f"dict-of-dicts: {legacy_s:.2f} s, retained {legacy_mb:.1f} MiB, peak {legacy_peak:.1f} MiB")
+    print(f"ItemStore:     {store_s:.2f} s, retained {store_mb:.1f} MiB, peak {store_peak:.1f} MiB ({legacy_s / store_s:.1f}x faster)")
+    print(f"  records {store_mb - index_mb:.1f} MiB + reverse indexes {index_mb:.1f} MiB; the gate counts both against the dict build")
+
+    sample = list(store_db.name_index)[:1000]
+    lookup_us = time_per_call(lambda name: store_db[store_db.name_index[name]], sample)
+    source_us = time_per_call(lambda name: store_db.items_dropped_by(name), [f"NPC {n}" for n in range(args.sources_per_heavy_item)])
+    print(f"Lookups: by name {lookup_us:.3f} us, by drop source {source_us:.3f} us")
+    return identical and store_s <= legacy_s and store_mb <= legacy_mb and store_peak <= legacy_peak
+
+# ==========================================
+# EXPORTS
+# ==========================================
+
+def load_export_database(path: str) -> dict:
+    """The real database when it exists, otherwise a synthetic one built through ItemStore."""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    print(f"{path} not found; exporting a synthetic database instead.")
+    return store_build(gen, *synthetic_rows(sprite_names(), 3, 0, 50)).to_payloads()
+
+def bench_exports(args) -> bool:
+    database = load_export_database(args.database)
+    indented = json.dumps(database, indent=4, ensure_ascii=False).encode("utf-8")
+    minified = json.dumps(database, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    codecs = {"": lambda blob: blob, ".gz": gzip.decompress}
+    blobs = {"indented": indented, "indented.gz": gzip.compress(indented, 9, mtime=0),
+             "minified": minified, "minified.gz": gzip.compress(minified, 9, mtime=0)}
+    try:
+        import brotli
+        codecs[".br"] = brotli.decompress
+        blobs["minified.br"] = brotli.compress(minified, quality=11)
+    except ImportError:
+        print("brotli is not installed; skipping the .br variant.")
+
+    print(f"{len(database)} items")
+    parse_ms, round_trips = {}, True
+    for name, blob in blobs.items():
+        decode = codecs[name[name.find("."):] if "." in name else ""]
+        round_trips &= json.loads(decode(blob)) == database
+        # The cyclic GC fires at random points inside a big json.loads; keep it out of the timings.
+        gc.collect()
+        gc.disable()
+        try:
+            parse_ms[name] = time_per_call(lambda b: json.loads(decode(b)), [blob], repeat=args.repeat) / 1000
+        finally:
+            gc.enable()
+        print(f"  {name:<12} {len(blob) / 1024:9.0f} KiB ({len(blob) / len(indented):6.1%})  decode+parse {parse_ms[name]:7.1f} ms")
+    print(f"Round trip: every variant {'parses back to' if round_trips else 'DIFFERS FROM'} the database.")
+    return round_trips and len(minified) < len(indented) and parse_ms["minified"] <= parse_ms["indented"]
+
+def bench_columnar(args) -> bool:
+    database = load_export_database(args.database)
+    minified = json.dumps(database, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    binary = col.encode_columnar(database)
+    mismatches = col.verify_columnar(database, binary)
+    print(f"{len(database)} items")
+    print(f"Round trip: {'lossless' if not mismatches else f'{len(mismatches)} items DIFFER, e.g. {mismatches[:5]}'}")
+
+    results = {}
+    for name, blob, decode in [("minified JSON", minified, json.loads), ("columnar", binary, col.decode_columnar)]:
+        gc.collect()
+        gc.disable()
+        try:
+            decode_ms = time_per_call(decode, [blob], repeat=args.repeat) / 1000
+        finally:
+            gc.enable()
+        tracemalloc.start()
+        decode(blob)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        gz = len(gzip.compress(blob, 9, mtime=0))
+        results[name] = (len(blob), gz)
+        print(f"  {name:<14} {len(blob) / 1024:8.0f} KiB raw  {gz / 1024:7.0f} KiB gzip  decode {decode_ms:7.1f} ms  peak {peak_mb:6.1f} MiB")
+    print("  (decode times are for the Python reference reader; a client reads the typed columns directly)")
+    (json_raw, json_gz), (bin_raw, bin_gz) = results["minified JSON"], results["columnar"]
+    return not mismatches and bin_raw < json_raw and bin_gz < json_gz
+
+def monthly_update(database: dict, rng, change_share: float) -> dict:
+    """A plausible next build: stat tweaks and new recipes on a share of the items, one item removed, a few added."""
+    updated = json.loads(json.dumps(database))
+    for item_id in rng.sample(sorted(updated), int(len(updated) * change_share)):
+        item = updated[item_id]
+        if rng.random() < 0.5:
+            item["stats"]["damage"] = float(rng.randint(1, 200))
+        else:
+            item["crafting"]["recipes"].append({"station": "Iron Anvil", "ingredients": [{"name": "Wood", "amount": rng.randint(1, 9)}],
+                                                "version": "Desktop", "transmutation": False})
+            item["crafting"]["is_craftable"] = True
+    updated.pop(rng.choice(sorted(updated)))
+    template = next(iter(database.values()))
+    for n in range(3):
+        updated[str(900000 + n)] = {**template, "id": 900000 + n, "name": f"New Item {n}"}
+    return updated
+
+def bench_versions(args) -> bool:
+    database = load_export_database(args.database)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as versions_dir, open(os.devnull, 'w') as quiet:
+        builds = [exp.minified_json(database)]
+        for _ in range(args.versions - 1):
+            database = monthly_update(database, rng, args.change_share)
+            builds.append(exp.minified_json(database))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(quiet):
+            entries = [ver.publish_version(data, versions_dir, keep=args.versions) for data in builds]
+        publish_s = time.perf_counter() - start
+        start = time.perf_counter()
+        problems = ver.verify_versions(versions_dir, full_build=None)
+        verify_s = time.perf_counter() - start
+        start = time.perf_counter()
+        caught_up = ver.apply_version_patches(builds[0], versions_dir) == builds[-1]
+        apply_s = time.perf_counter() - start
+
+        print(f"{len(database)} items, {args.versions} versions, {args.change_share:.0%} of the items changed per version")
+        patch_gz = full_gz = 0
+        for entry in entries[1:]:
+            patch = ver.read_version_file(versions_dir, entry["patch"]["file"])
+            full = ver.read_version_file(versions_dir, entry["file"])
+            patch_gz += len(gzip.compress(patch, 9, mtime=0))
+            full_gz += len(gzip.compress(full, 9, mtime=0))
+            print(f"  v{entry['version']}: patch {len(patch) / 1024:7.1f} KiB ({entry['patch']['changed']} changed, {entry['patch']['added']} added, "
+                  f"{entry['patch']['removed']} removed)  vs. full {len(full) / 1024:7.0f} KiB")
+    print(f"Gzipped, catching up from v1 costs {patch_gz / 1024:.0f} KiB of patches vs. {full_gz / 1024:.0f} KiB of full builds "
+          f"({patch_gz / full_gz:.1%}).")
+    print(f"publish {publish_s:.2f} s, verify {verify_s:.2f} s, apply v1 -> v{args.versions} {apply_s * 1000:.0f} ms")
+    print(f"Verification: {'every patch reproduces its full build byte-for-byte' if not problems and caught_up else f'FAILED {problems}'}")
+    return not problems and caught_up and patch_gz < full_gz * args.max_patch_ratio
+
+def legacy_craft_scan(gen, database: dict, inventory: set, k: int) -> list:
+    """What the Discovery Engine does without an index: walk every recipe and check each ingredient."""
+    owned = {name.lower() for name in inventory}
+    owned |= {group.lower() for group, members in craft.RECIPE_GROUPS.items() if owned & {m.lower() for m in members}}
+    found = []
+    for product_id, item in database.items():
+        for recipe_index, recipe in enumerate(item["crafting"]["recipes"]):
+            gap = len({ing["name"].lower() for ing in recipe["ingredients"]} - owned)
+            if gap <= k: found.append([int(product_id), recipe_index, gap])
+    return found
+
+def bench_craftquery(args) -> bool:
+    database = load_export_database(args.database)
+    index = craft.build_craft_index(database)
+    engine = craft.CraftQueryEngine(index)
+    print(f"{len(index['recipes'])} recipes over {len(index['ingredients'])} ingredients")
+
+    rng = random.Random(args.seed)
+    pool = index["ingredients"] + [m.lower() for members in craft.RECIPE_GROUPS.values() for m in members]
+    inventories = [set(rng.sample(pool, min(args.inventory_size, len(pool)))) for _ in range(args.inventories)]
+
+    passed = True
+    for k in range(args.max_missing + 1):
+        expected = [sorted(legacy_craft_scan(gen, database, inv, k), key=lambda hit: (hit[2], hit[0], hit[1])) for inv in inventories]
+        actual = [sorted(engine.almost_craftable(inv, k), key=lambda hit: (hit[2], hit[0], hit[1])) for inv in inventories]
+        mismatches = sum(1 for e, a in zip(expected, actual) if e != a)
+        gc.collect()
+        gc.disable()
+        try:
+            legacy_us = time_per_call(lambda inv: legacy_craft_scan(gen, database, inv, k), inventories, repeat=args.repeat)
+            engine_us = time_per_call(lambda inv: engine.almost_craftable(inv, k), inventories, repeat=args.repeat)
+        finally:
+            gc.enable()
+        hits = sum(len(a) for a in actual) / len(actual)
+        print(f"  missing <= {k}: scan {legacy_us / 1000:8.2f} ms  index {engine_us / 1000:8.2f} ms  ({legacy_us / engine_us:5.1f}x)  "
+              f"{hits:8.1f} hits/query  {'identical' if not mismatches else f'{mismatches} inventories DIFFER'}")
+        passed = passed and not mismatches and engine_us < legacy_us
+    return passed
+
+def legacy_search(gen, index: dict, query: str) -> set:
+    """The client's search without an index: every term checked for every query token."""
+    tokens = srch.normalize_search_text(query).split()
+    return {index["items"][t] for t, term in enumerate(index["terms"]) if all(tok in term for tok in tokens)}
+
+def search_queries(rng, names: list, count: int) -> list:
+    """(kind, query, intended name) triples: prefixes, mid-word substrings, word pairs and one-letter typos."""
+    queries = []
+    while len(queries) < count:
+        name = rng.choice(names)
+        words = name.split()
+        kind = rng.choice(["prefix", "substring", "words", "typo"])
+        if kind == "prefix":
+            queries.append((kind, name[:rng.randint(3, max(3, min(8, len(name))))], name))
+        elif kind == "substring" and len(name) >= 6:
+            start = rng.randint(1, len(name) - 4)
+            queries.append((kind, name[start:start + rng.randint(3, 5)], name))
+        elif kind == "words" and len(words) >= 2:
+            queries.append((kind, " ".join(rng.sample(words, 2)), name))
+        elif kind == "typo" and len(name) >= 6:
+            i = rng.randint(1, len(name) - 2)
+            queries.append((kind, name[:i] + rng.choice(["", rng.choice("aeiou"), name[i + 1]]) + name[i + 1:], name))
+    return queries
+
+def bench_search(args) -> bool:
+    database = load_export_database(args.database)
+    index = srch.build_search_index(database, {})
+    print(f"{len(database)} items, {len(index['terms'])} terms, {len(index['trigrams'])} trigrams")
+    names = [item["name"] for item in database.values()]
+    queries = search_queries(random.Random(args.seed), names, args.queries)
+
+    mismatches, typo_found, typo_total, latencies, legacy_us = 0, 0, 0, [], 0.0
+    gc.collect()
+    gc.disable()
+    try:
+        for kind, query, intended in queries:
+            latencies.append(time_per_call(lambda q: srch.search_items(index, q), [query], repeat=args.repeat))
+            legacy_us += time_per_call(lambda q: legacy_search(gen, index, q), [query], repeat=1)
+    finally:
+        gc.enable()
+    for kind, query, intended in queries:
+        results = srch.search_items(index, query, limit=None)
+        if srch.search_items(index, query) != results[:srch.SEARCH_RESULT_LIMIT]: mismatches += 1
+        if kind == "typo":
+            typo_total += 1
+            typo_found += any(database[i]["name"] == intended for i in results[:srch.SEARCH_RESULT_LIMIT])
+        elif max(map(len, srch.normalize_search_text(query).split())) >= 3:
+            expected = legacy_search(gen, index, query)
+            if set(results[:len(expected)]) != expected: mismatches += 1
+
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"  {len(queries)} queries: index p50 {p50:6.0f} us  p99 {p99:6.0f} us  max {latencies[-1]:6.0f} us  "
+          f"(full scan {legacy_us / len(queries):6.0f} us avg)")
+    print(f"  Exact matches vs. full scan: {'identical' if not mismatches else f'{mismatches} queries DIFFER'}")
+    print(f"  One-letter typos: intended item in the top {srch.SEARCH_RESULT_LIMIT} for {typo_found}/{typo_total}")
+    return not mismatches and p99 < args.max_p99_us and typo_found >= args.min_typo_recall * typo_total
+
+# ==========================================
+# EXPORT NORMALIZER
+# ==========================================
+
+def synthetic_export(names: list, env: str, seed: int) -> list:
+    """DataExporterMod-shaped items: stats, recipes on real tile names, drop/shop/container sources and shimmer edges."""
+    rng = random.Random(f"{seed}-{env}")
+    tiles = ["Anvils", "WorkBenches", "MythrilAnvil", "Furnaces", "LunarCraftingStation", "CosmicAnvil"]
+    categories = ["Sword", "Gun", "Pickaxe", "Accessory", "Helmet", "Block / Furniture", "Material", "Potion", "Summon Weapon"]
+    sources = ["NPC: Zombie", "NPC: Eye of Cthulhu", "Shop: Merchant", "Chest/Crate/Bag: Wooden Crate", "Any Enemy"]
+    items = []
+    for i, name in enumerate(names):
+        damage = rng.choice([0, 0, rng.randint(5, 150)])
+        items.append({
+            "ID": str(i + 1) if env == "Vanilla" or i % 3 else f"{env}Mod_{name.replace(' ', '')}",
+            "InternalName": name, "DisplayName": name, "ModSource": "Vanilla", "Category": rng.choice(categories),
+            "Tooltip": rng.choice(["", f"'The {name} of legend'"]), "WikiUrl": f"https://terraria.wiki.gg/wiki/{name.replace(' ', '_')}",
+            "IconUrl": f"/sprites/{name.replace(' ', '_')}.png", "IsHardmode": rng.random() < 0.4, "IsExpert": False, "IsMaster": False,
+            "Stats": {"MaxStack": rng.choice([1, 9999]), "Damage": damage, "DamageClass": rng.choice(["true melee damage", " ranged damage", " damage"]),
+                      "Knockback": round(rng.uniform(0, 10), 2), "CritChance": 4, "UseTime": rng.randint(5, 60), "Velocity": rng.choice([0.0, 11.5]),
+                      "ManaCost": 0, "AutoReuse": True, "Consumable": False, "Defense": rng.choice([0, 0, 7]),
+                      "Value": {"Raw": rng.randint(0, 500000), "Platinum": 0, "Gold": 0, "Silver": 0, "Copper": 0}, "Rarity": rng.randint(-1, 11),
+                      "ToolPower": {"Pickaxe": rng.choice([0, 0, 65]), "Axe": 0, "Hammer": 0}},
+            "Recipes": [{"Stations": rng.sample(tiles, rng.randint(0, 2)), "Conditions": rng.choice([[], [], ["Near Water"]]),
+                         "Ingredients": [{"ID": "0", "Name": rng.choice(names), "Amount": rng.randint(1, 20)} for _ in range(rng.randint(1, 4))]}
+                        for _ in range(rng.randint(0, 3))],
+            "ObtainedFromDrops": [{"SourceNPC_ID": 0, "SourceNPC_Name": rng.choice(sources), "DropChance": "5%", "Conditions": []}
+                                  for _ in range(rng.randint(0, 3))],
+            "ShimmerDecraft": rng.choice(names) if rng.random() < 0.05 else None,
+        })
+    return items
+
+def load_whole_export(norm, export_path: str, output_dir: str) -> str:
+    """The json.load approach: the whole array, then every payload, held at once. Same output as normalize_export."""
+    with open(export_path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    database = {}
+    for item in items:
+        payload = norm.normalize_item(item)
+        database[str(payload["id"])] = payload
+    by_name = {}
+    for payload in database.values():
+        by_name.setdefault(payload["name"].lower(), []).append(payload)
+    for item in items:
+        for payload in by_name.get((item.get("ShimmerDecraft") or "").lower(), ()):
+            payload["crafting"]["recipes"].append(norm.shimmer_recipe(item["DisplayName"]))
+    for payload in database.values():
+        payload["crafting"]["is_craftable"] = bool(payload["crafting"]["recipes"])
+    path = os.path.join(output_dir, os.path.basename(norm.output_path(export_path)))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(database, f, indent=4, ensure_ascii=False)
+    return path
+
+def traced_peak_mib(fn, *args) -> tuple:
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        return result, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+def bench_dataexports(args) -> bool:
+    logging.disable(logging.INFO)
+    names = sprite_names()
+    names = [f"{names[i % len(names)]}{'' if i < len(names) else f' {i // len(names) + 1}'}" for i in range(args.items)]
+    envs = ["Vanilla", "Vanilla_Calamity", "Vanilla_Fargowiltas", "All", "Vanilla_Thorium", "Vanilla_Spirit"][:args.envs]
+    with tempfile.TemporaryDirectory() as scratch:
+        exports = []
+        for env in envs:
+            exports.append(os.path.join(scratch, f"Terraria_{env}_1.4.4_Export.json"))
+            with open(exports[-1], 'w', encoding='utf-8') as f:
+                json.dump(synthetic_export(names, env, args.seed), f, indent=2)
+        size_mib = sum(os.path.getsize(path) for path in exports) / 2**20
+        print(f"Workload: {len(envs)} exports x {args.items} items ({size_mib:.0f} MiB)")
+        whole_dir, stream_dir = os.path.join(scratch, "whole"), os.path.join(scratch, "stream")
+        os.makedirs(whole_dir)
+
+        start = time.perf_counter()
+        for path in exports:
+            load_whole_export(norm, path, whole_dir)
+        whole_s = time.perf_counter() - start
+        start = time.perf_counter()
+        norm.normalize_exports(exports, stream_dir, workers=args.workers)
+        stream_s = time.perf_counter() - start
+
+        # Peak Python heap for one file, each approach in this process.
+        _, whole_peak = traced_peak_mib(load_whole_export, norm, exports[0], whole_dir)
+        _, stream_peak = traced_peak_mib(norm.normalize_export, exports[0], stream_dir)
+
+        identical = all(filecmp.cmp(os.path.join(whole_dir, name), os.path.join(stream_dir, name), shallow=False) for name in os.listdir(whole_dir))
+    print(f"Golden check: the streamed files {'match' if identical else 'DIFFER FROM'} the json.load conversion.")
+    print(f"{'json.load, one file at a time:':<32} {whole_s:6.2f} s, peak heap {whole_peak:7.1f} MiB per file")
+    print(f"{f'streaming, {args.workers} processes:':<32} {stream_s:6.2f} s, peak heap {stream_peak:7.1f} MiB per file "
+          f"({whole_s / stream_s:.1f}x faster on {os.cpu_count()} CPUs)")
+    return identical and stream_peak <= whole_peak * args.max_memory_ratio
+
+# ==========================================
+# END-TO-END (FAKE WIKI)
+# ==========================================
+
+def start_fake_wiki(args) -> tuple:
+    """Runs fake-wiki-server.py in its own process, so its work stays out of the timings and the traced memory.
+
+    Returns (process, base URL).
+    """
+    command = [sys.executable, FAKE_WIKI_SCRIPT, "--port", "0", "--items", str(args.items), "--sprites-dir", SPRITES_DIR,
+               "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms), "--rate-429", str(args.rate_429),
+               "--retry-after", str(args.retry_after), "--seed", str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in server.stdout:
+        print(f"[fake wiki] {line.rstrip()}")
+        if line.startswith("Listening on "):
+            return server, line.split()[2]
+    raise RuntimeError(f"{FAKE_WIKI_SCRIPT} exited with code {server.wait()} before it started listening")
+
+def wiki_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/__stats") as response:
+        return json.load(response)
+
+def peak_rss_mib() -> float | None:
+    """This process's peak resident set size (None where the resource module is missing, i.e. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB elsewhere
+
+def run_pipeline(base_url: str, names: list, workers: int, rps: float) -> dict:
+    """Downloads the sprites, then builds the database, exports and sitemap in a scratch directory.
+
+    Meant to run in a fresh process (see bench_e2e), so module-level caches start empty
+    and the peak RSS belongs to this run alone.
+    """
+    gen.API_URL = f"{base_url}/api.php"
+    logging.disable(logging.INFO)
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            with open(dl.JSON_FILE_PATH, 'w', encoding='utf-8') as f:
+                json.dump([{"DisplayName": name, "IconUrl": f"{base_url}/wiki/Special:FilePath/{urllib.parse.quote(name.replace(' ', '_'))}.png"}
+                           for name in names], f)
+            with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+                before = wiki_stats(base_url)
+                start = time.perf_counter()
+                dl.main(workers=workers, requests_per_second=rps)
+                sprites_s = time.perf_counter() - start
+                between = wiki_stats(base_url)
+
+                gen.load_sprite_aliases()
+                start = time.perf_counter()
+                items_db = gen.fetch_data(workers=workers, requests_per_second=rps)
+                crawl_s = time.perf_counter() - start
+                exp.write_exports(items_db, gen.ALIAS_CACHE)
+                smap.generate_sitemap(items_db)
+                build_s = time.perf_counter() - start
+                after = wiki_stats(base_url)
+            with open(dl.METRICS_FILE, 'r', encoding='utf-8') as f:
+                sprite_run = json.load(f)["run"]
+        finally:
+            os.chdir(workdir)
+    peak_mib = peak_rss_mib()
+    build_requests = after["api_requests"] + after["http_429"] - between["api_requests"] - between["http_429"]
+    return {
+        "payloads": items_db.to_payloads(),
+        "sprites_s": round(sprites_s, 3), "crawl_s": round(crawl_s, 3), "build_s": round(build_s, 3), "peak_rss_mib": peak_mib and round(peak_mib, 1),
+        "sprites_per_s": round(len(names) / sprites_s, 1), "items_per_s": round(len(items_db) / build_s, 1),
+        "requests_per_s": round(build_requests / build_s, 1), "api_requests": after["api_requests"] - between["api_requests"],
+        "file_requests": between["file_requests"] - before["file_requests"], "http_429": after["http_429"] - before["http_429"],
+        "sprites_failed": sprite_run["failed"],
+    }
+
+def bench_e2e(args) -> bool:
+    server, base_url = start_fake_wiki(args)
+    names = sprite_names()[:args.items or None][:args.sprites]  # The server serves the first --items names
+    settings = {key: getattr(args, key) for key in ("items", "sprites", "workers", "rps", "latency_ms", "jitter_ms", "rate_429", "retry_after", "seed")}
+
+    runs = {}
+    try:
+        for strategy, workers in [("sequential", 1), ("concurrent", args.workers)]:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                runs[strategy] = pool.submit(run_pipeline, base_url, names, workers, args.rps).result()
+    finally:
+        server.terminate()
+        server.wait()
+
+    identical = runs["sequential"].pop("payloads") == runs["concurrent"].pop("payloads")
+    complete = all(run["sprites_failed"] == 0 for run in runs.values())
+    print(f"Golden check: the concurrent build {'matches' if identical else 'DIFFERS FROM'} the sequential one; "
+          f"{'every' if complete else 'NOT every'} sprite downloaded.")
+    for strategy, run in runs.items():
+        print(f"{strategy:<10} crawl {run['crawl_s']:6.2f} s  build {run['build_s']:6.2f} s  {run['items_per_s']:7.1f} items/s  {run['requests_per_s']:6.1f} req/s "
+              f"({run['api_requests']} API calls, {run['http_429']} 429s)  sprites {run['sprites_s']:6.2f} s  {run['sprites_per_s']:6.1f}/s  "
+              f"peak RSS {run['peak_rss_mib'] or 'n/a'} MiB")
+    # The crawl and the sprite downloads wait on the wiki; the exports after the crawl are CPU work that workers cannot speed up.
+    speedup = {phase: runs["sequential"][phase] / runs["concurrent"][phase] for phase in ("crawl_s", "build_s", "sprites_s")}
+    concurrent = speedup["crawl_s"] >= args.min_speedup and speedup["sprites_s"] >= args.min_speedup
+    print(f"{args.workers} workers vs. 1: crawl {speedup['crawl_s']:.1f}x, build {speedup['build_s']:.1f}x, sprites {speedup['sprites_s']:.1f}x faster "
+          f"(crawl and sprites need {args.min_speedup:.1f}x)")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"settings": settings, "runs": runs}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}.")
+        return identical and complete and concurrent
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; rerun with --update-baseline to record one.")
+        return identical and complete and concurrent
+    if baseline["settings"] != settings:
+        print(f"{args.baseline} was recorded with different settings ({baseline['settings']}); skipping the regression check.")
+        return identical and complete and concurrent
+    regressions = []
+    for strategy, run in runs.items():
+        for phase in ("crawl_s", "build_s", "sprites_s"):
+            limit = baseline["runs"][strategy][phase] * args.max_slowdown
+            print(f"  {strategy} {phase[:-2]}: {run[phase]:.2f} s vs. baseline {baseline['runs'][strategy][phase]:.2f} s (limit {limit:.2f} s)")
+            if run[phase] > limit:
+                regressions.append(f"{strategy} {phase[:-2]}")
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+    return identical and complete and concurrent and not regressions
+
+# ==========================================
+# INCREMENTAL BUILDS (FAKE WIKI)
+# ==========================================
+
+def load_fake_wiki_module():
+    """Imports fake-wiki-server.py (not an importable name) so its SyntheticWiki can be changed between builds."""
+    spec = importlib.util.spec_from_file_location("fake_wiki_server", FAKE_WIKI_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def change_wiki(wiki, rng, pages: int, revisit: list) -> tuple:
+    """Edits, creates, deletes and moves about `pages` item pages; returns (counts per change, edited pages).
+
+    An edit bumps the item's stats, changes or deletes its recipe and drop rows, and
+    toggles a recipe and a drop row for some other item, so rows that only feed an item
+    through another page come and go too. The `revisit` pages are edited first.
+    """
+    names = sorted(row["name"] for row in wiki.tables["Items"])
+    ids = sorted(row["itemid"] for row in wiki.tables["Items"])
+    chosen = [page for page in revisit if page in names] + rng.sample(names, pages)
+    chosen = list(dict.fromkeys(chosen))
+    counts, edited = {"edit": 0, "create": 0, "delete": 0, "move": 0}, []
+
+    def edit(rows):
+        item = rows["Items"][0] if rows["Items"] else None
+        if item:
+            item.update(damage=str(int(item["damage"] or 0) + 1), rare=str(rng.randint(0, 10)))
+        own = [row for row in rows["Recipes"] if item and row["resultid"] == item["itemid"]]
+        foreign = [row for row in rows["Recipes"] if row not in own]
+        if own:
+            own.pop(rng.randrange(len(own)))
+            for row in own:
+                row["station"] = rng.choice(["Tinkerer's Workshop", "Hellforge"])
+        rows["Recipes"] = own if foreign else own + [{"resultid": rng.choice(ids), "station": "Work Bench", "ings": f"¦{rng.choice(names)}¦3", "args": ""}]
+        rows["Drops"] = ([] if rows["Drops"] else [{"item": rng.choice(names), "name": "NPC 0", "rate": "2%"}])
+
+    for n, page in enumerate(chosen):
+        kind = "edit" if n < len(revisit) else ("edit", "edit", "create", "delete", "move")[n % 5]
+        if kind == "edit":
+            wiki.edit_page(page, edit)
+            edited.append(page)
+        elif kind == "create":
+            item_id = str(max(int(i) for i in ids) + 1)
+            ids.append(item_id)
+            title = f"New item {item_id}"
+            wiki.create_page(title, {"Items": [{"itemid": item_id, "name": title, "tooltip": "", "damage": "7", "rare": "2", "hardmode": "",
+                                               "type": "Weapon", "damagetype": "Melee", "axe": "", "hammer": ""}],
+                                     "Recipes": [{"resultid": item_id, "station": "Iron Anvil", "ings": f"¦{page}¦2", "args": ""}],
+                                     "Drops": [{"item": title, "name": "NPC 1", "rate": "1/50"}]}, category="Broadswords")
+        elif kind == "delete":
+            wiki.delete_page(page)
+        else:
+            wiki.move_page(page, f"{page} (moved)")
+        counts[kind] += 1
+    return counts, edited
+
+def crawl(directory: str, incremental: bool, workers: int, rps: float) -> dict:
+    """One `build` (or `build --incremental`) in `directory`, with that directory's own alias cache; returns the database."""
+    workdir = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            gen.ALIAS_CACHE.clear()
+            gen.ALIAS_RESOLVED_AT.clear()
+            gen.load_alias_cache()
+            started_at = datetime.now(timezone.utc)
+            if incremental:
+                previous = gen.load_build_state()
+                if previous is None:
+                    raise RuntimeError(f"no previous build in {directory}")
+                gen.fetch_data_incremental(previous, workers=workers, requests_per_second=rps)
+            else:
+                gen.fetch_data(workers=workers, requests_per_second=rps)
+            gen.save_build_state(started_at, "incremental" if incremental else "full")
+            gen.save_alias_cache()
+        with open(gen.JSON_OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.chdir(workdir)
+
+def bench_incremental(args) -> bool:
+    """Full build, then rounds of wiki changes each followed by --incremental; every result must equal a fresh full build
+    and take fewer API calls than it."""
+    fake = load_fake_wiki_module()
+    wiki = fake.SyntheticWiki(sprite_names()[:args.items or None], seed=args.seed)
+    server = fake.FakeWiki(wiki, SPRITES_DIR)
+    gen.API_URL = f"{server.start()}/api.php"
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    passed = True
+    try:
+        with tempfile.TemporaryDirectory() as chain:
+            start = time.perf_counter()
+            crawl(chain, False, args.workers, args.rps)
+            full_s = time.perf_counter() - start
+            print(f"Full build of {len(wiki.names)} items: {full_s:.2f} s")
+            edited = []
+            for round_no in range(1, args.rounds + 1):
+                counts, edited = change_wiki(wiki, rng, args.pages, edited)
+                server.reset_stats()
+                start = time.perf_counter()
+                incremental = crawl(chain, True, args.workers, args.rps)
+                incremental_s, requests = time.perf_counter() - start, server.stats["api_requests"]
+                server.reset_stats()
+                with tempfile.TemporaryDirectory() as fresh:  # no alias cache or build state carried over
+                    start = time.perf_counter()
+                    expected = crawl(fresh, False, args.workers, args.rps)
+                    fresh_s = time.perf_counter() - start
+                identical, full_requests = incremental == expected, server.stats["api_requests"]
+                passed &= identical and requests < full_requests
+                print(f"Round {round_no}: {', '.join(f'{n} {kind}' for kind, n in counts.items())} -> incremental {incremental_s:.2f} s "
+                      f"({requests} API calls{'' if requests < full_requests else ', NOT FEWER'}) vs. full {fresh_s:.2f} s ({full_requests}); "
+                      f"{'identical' if identical else 'DIFFERENT'} databases ({len(incremental)} vs. {len(expected)} items)")
+                if not identical:
+                    differing = sorted(set(incremental) ^ set(expected) | {i for i in set(incremental) & set(expected) if incremental[i] != expected[i]})
+                    print(f"  differing items: {', '.join(differing[:10])}{' ...' if len(differing) > 10 else ''}")
+    finally:
+        server.stop()
+    return passed
+
+# ==========================================
+# OFFLINE STAGES (FAKE WIKI)
+# ==========================================
+
+def run_cli(directory: str, *argv) -> subprocess.CompletedProcess:
+    """`python -m terraria_pipeline ARGV` in `directory`, in a fresh interpreter so no module-level cache carries over."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")])))
+    return subprocess.run([sys.executable, "-m", "terraria_pipeline", *argv], cwd=directory, env=env, capture_output=True, text=True)
+
+def read_tree(directory: str) -> dict:
+    """Relative path -> bytes of every file under `directory`."""
+    tree = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                tree[os.path.relpath(path, directory)] = f.read()
+    return tree
+
+def bench_stages(args) -> bool:
+    """`build`, then `stages all` over its crawl snapshot in a new process; every published file must come out byte for byte."""
+    fake = load_fake_wiki_module()
+    wiki = fake.SyntheticWiki(sprite_names()[:args.items or None], seed=args.seed)
+    server = fake.FakeWiki(wiki, SPRITES_DIR)
+    base_url = server.start()
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            built = run_cli(scratch, "build", "--api-url", f"{base_url}/api.php", "--no-cache", "--workers", str(args.workers), "--rps", str(args.rps))
+            if built.returncode:
+                print(built.stdout[-2000:], built.stderr[-2000:])
+                return False
+            expected = read_tree(scratch)
+            start = time.perf_counter()
+            rerun = run_cli(scratch, "stages", "all")
+            stages_s = time.perf_counter() - start
+            if rerun.returncode:
+                print(rerun.stdout[-2000:], rerun.stderr[-2000:])
+                return False
+            actual = read_tree(scratch)
+    finally:
+        server.stop()
+    published = [path for path in sorted(expected) if path != gen.METRICS_FILE]
+    differing = [path for path in published if actual.get(path) != expected[path]]
+    terms = len(json.loads(expected[exp.SEARCH_INDEX_OUTPUT_FILE])["terms"])
+    print(f"build then `stages all` ({stages_s:.2f} s) over {len(wiki.names)} items: {len(published) - len(differing)} of {len(published)} files "
+          f"identical, search index of {terms} terms included")
+    for path in differing:
+        print(f"  DIFFERENT: {path}")
+    return not differing
+
+# ==========================================
+# ENTRY POINT
+# ==========================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks and golden checks for the TerrariTree data pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    classifier = subparsers.add_parser("classifier", help="Step 3 rule table vs. the legacy if/elif chain")
+    classifier.add_argument("--max-ratio", type=float, default=1.0, help="Fail if compiled time exceeds this multiple of the legacy time (default: %(default)s)")
+    classifier.set_defaults(run=bench_classifier)
+
+    normalizer = subparsers.add_parser("normalizer", help="sanitize_text / parse_ingredients vs. the legacy regex passes")
+    normalizer.add_argument("--cache-file", default=CACHE_FILE, help="Response cache to harvest real Cargo rows from (default: %(default)s)")
+    normalizer.add_argument("--calls", type=int, default=100000, help="Normalization calls per timed run (default: %(default)s)")
+    normalizer.add_argument("--max-ratio", type=float, default=0.5, help="Fail if the engine takes more than this multiple of the legacy time (default: %(default)s)")
+    normalizer.set_defaults(run=bench_normalizer)
+
+    store = subparsers.add_parser("store", help="ItemStore vs. the dict-of-dicts items_db (time, memory, golden export)")
+    store.add_argument("--recipes-per-item", type=int, default=3)
+    store.add_argument("--heavy-items", type=int, default=200, help="Items dropped by every NPC (default: %(default)s)")
+    store.add_argument("--sources-per-heavy-item", type=int, default=300)
+    store.set_defaults(run=bench_store)
+
+    exports = subparsers.add_parser("exports", help="Byte size and parse time of the minified/precompressed exports vs. the indented JSON")
+    exports.add_argument("--database", default=DATABASE_FILE, help="Database to export (default: %(default)s, synthetic if missing)")
+    exports.add_argument("--repeat", type=int, default=5, help="Timed parses per variant (default: %(default)s)")
+    exports.set_defaults(run=bench_exports)
+
+    columnar = subparsers.add_parser("columnar", help="Columnar binary export vs. minified JSON (lossless round trip, size, decode)")
+    columnar.add_argument("--database", default=DATABASE_FILE, help="Database to encode (default: %(default)s, synthetic if missing)")
+    columnar.add_argument("--repeat", type=int, default=5, help="Timed decodes per format (default: %(default)s)")
+    columnar.set_defaults(run=bench_columnar)
+
+    versions = subparsers.add_parser("versions", help="Delta patches between versioned builds vs. refetching the full build (size, byte-for-byte apply)")
+    versions.add_argument("--database", default=DATABASE_FILE, help="First version's database (default: %(default)s, synthetic if missing)")
+    versions.add_argument("--versions", type=int, default=4, help="Versions in the chain (default: %(default)s)")
+    versions.add_argument("--change-share", type=float, default=0.02, help="Share of the items changed per version (default: %(default)s)")
+    versions.add_argument("--max-patch-ratio", type=float, default=0.25, help="Fail if the gzipped patches exceed this share of the gzipped full builds (default: %(default)s)")
+    versions.add_argument("--seed", type=int, default=24)
+    versions.set_defaults(run=bench_versions)
+
+    craftquery = subparsers.add_parser("craftquery", help="Bitset craft-query index vs. a full recipe scan over random inventories")
+    craftquery.add_argument("--database", default=DATABASE_FILE, help="Database to index (default: %(default)s, synthetic if missing)")
+    craftquery.add_argument("--inventories", type=int, default=200, help="Random inventories per query type (default: %(default)s)")
+    craftquery.add_argument("--inventory-size", type=int, default=40, help="Distinct items per inventory (default: %(default)s)")
+    craftquery.add_argument("--max-missing", type=int, default=2, help="Benchmark \"missing at most k\" for k = 0..this (default: %(default)s)")
+    craftquery.add_argument("--repeat", type=int, default=3)
+    craftquery.add_argument("--seed", type=int, default=15)
+    craftquery.set_defaults(run=bench_craftquery)
+
+    search = subparsers.add_parser("search", help="Prefix/trigram search index latency and accuracy vs. a full name scan")
+    search.add_argument("--database", default=DATABASE_FILE, help="Database to index (default: %(default)s, synthetic if missing)")
+    search.add_argument("--queries", type=int, default=2000)
+    search.add_argument("--repeat", type=int, default=3, help="Timed runs per query, best kept (default: %(default)s)")
+    search.add_argument("--max-p99-us", type=float, default=1000.0, help="Fail if the 99th percentile lookup exceeds this (default: %(default)s)")
+    search.add_argument("--min-typo-recall", type=float, default=0.8, help="Fail if fewer typo queries find their item (default: %(default)s)")
+    search.add_argument("--seed", type=int, default=16)
+    search.set_defaults(run=bench_search)
+
+    dataexports = subparsers.add_parser("dataexports", help="Streaming, multi-process DataExporterMod normalizer vs. json.load of each export")
+    dataexports.add_argument("--envs", type=int, default=4, help="Synthetic environment exports, up to 6 (default: %(default)s)")
+    dataexports.add_argument("--items", type=int, default=10000, help="Items per export (default: %(default)s)")
+    dataexports.add_argument("--workers", type=int, default=4, help="Normalizer processes (default: %(default)s)")
+    dataexports.add_argument("--max-memory-ratio", type=float, default=0.25, help="Fail if the streamed peak heap exceeds this multiple of json.load's (default: %(default)s)")
+    dataexports.add_argument("--seed", type=int, default=23)
+    dataexports.set_defaults(run=bench_dataexports)
+
+    e2e = subparsers.add_parser("e2e", help="Full pipeline (sprites, build, exports, sitemap) against a local fake wiki, sequential vs. concurrent")
+    e2e.add_argument("--items", type=int, default=3000, help="Synthetic wiki items, the first N sprite names; 0 for all (default: %(default)s)")
+    e2e.add_argument("--sprites", type=int, default=200, help="Sprites fetched through Special:FilePath (default: %(default)s)")
+    e2e.add_argument("--workers", type=int, default=8, help="Workers for the concurrent run (default: %(default)s)")
+    e2e.add_argument("--rps", type=float, default=1000.0, help="Client request budget, high enough that latency is the bottleneck (default: %(default)s)")
+    e2e.add_argument("--latency-ms", type=float, default=100.0, help="Simulated server latency, near the real wiki's (default: %(default)s)")
+    e2e.add_argument("--jitter-ms", type=float, default=20.0)
+    e2e.add_argument("--rate-429", type=float, default=0.01, help="Share of requests answered with HTTP 429 (default: %(default)s)")
+    e2e.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds on injected 429s (default: %(default)s)")
+    e2e.add_argument("--seed", type=int, default=22)
+    e2e.add_argument("--baseline", default=BASELINE_FILE, help="(default: %(default)s)")
+    e2e.add_argument("--min-speedup", type=float, default=2.0, help="Fail unless the concurrent crawl and sprite downloads are this many times faster (default: %(default)s)")
+    e2e.add_argument("--max-slowdown", type=float, default=1.5, help="Fail if a phase takes more than this multiple of its baseline time (default: %(default)s)")
+    e2e.add_argument("--update-baseline", action="store_true", help="Record this run as the new baseline instead of comparing against it")
+    e2e.set_defaults(run=bench_e2e)
+
+    incremental = subparsers.add_parser("incremental", help="--incremental builds after wiki edits, creations, deletions and moves vs. a fresh full build")
+    incremental.add_argument("--items", type=int, default=1000, help="Synthetic wiki items, the first N sprite names; 0 for all (default: %(default)s)")
+    incremental.add_argument("--pages", type=int, default=40, help="Pages changed per round (default: %(default)s)")
+    incremental.add_argument("--rounds", type=int, default=2, help="Change + incremental build rounds; later rounds re-edit the pages edited before (default: %(default)s)")
+    incremental.add_argument("--workers", type=int, default=4)
+    incremental.add_argument("--rps", type=float, default=1000.0)
+    incremental.add_argument("--seed", type=int, default=3)
+    incremental.set_defaults(run=bench_incremental)
+
+    stages = subparsers.add_parser("stages", help="`stages all` over the crawl snapshot vs. the files the build published (search index included)")
+    stages.add_argument("--items", type=int, default=1000, help="Synthetic wiki items, the first N sprite names; 0 for all (default: %(default)s)")
+    stages.add_argument("--workers", type=int, default=4)
+    stages.add_argument("--rps", type=float, default=1000.0)
+    stages.add_argument("--seed", type=int, default=16)
+    stages.set_defaults(run=bench_stages)
+
+    args = parser.parse_args()
+    passed = args.run(args)
+    print("PASS" if passed else "FAIL")
+    sys.exit(0 if passed else 1)
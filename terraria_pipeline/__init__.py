@@ -0,0 +1,25 @@
+"""The TerrariTree data pipeline: wiki crawl, offline stages, sprites and export normalization.
+
+Run it with `python -m terraria_pipeline COMMAND` (see --help), or use it as a library:
+
+    from terraria_pipeline import iter_items
+    for item_id, payload in iter_items("terraria_items.crawl.json"):
+        ...
+
+Submodules are imported on first use, so `import terraria_pipeline` stays cheap.
+"""
+from importlib import import_module
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "fetch_data": "generator", "fetch_data_incremental": "generator", "iter_items": "generator",
+    "load_database": "generator", "offline_stages": "generator", "run_stages": "generator",
+    "OFFLINE_STAGES": "generator", "ItemStore": "store",
+    "iter_json_array": "normalizer", "iter_json_object": "normalizer", "normalize_exports": "normalizer",
+}
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
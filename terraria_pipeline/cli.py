@@ -0,0 +1,186 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from . import exports, generator, normalizer, sprites
+from . import versions as versioned
+
+# Every stage name --profile accepts, in build order
+BUILD_STAGES = ["items", "categories", "inference", "recipes", "drops", "aliases", "rollup", "atlases", "export", "exports", "versions", "sitemap"]
+
+def add_profile_arguments(parser: argparse.ArgumentParser, stages):
+    parser.add_argument("--profile", action="append", metavar="STAGE", choices=stages, default=[],
+                        help=f"Profile a stage (repeatable): {', '.join(stages)}")
+    parser.add_argument("--profile-mode", choices=["cpu", "memory"], default="cpu", help=f"cProfile or tracemalloc, written to {generator.PROFILE_DIR}/ (default: %(default)s)")
+
+def build(args) -> int:
+    """The full or incremental crawl, then the exports, versions and sitemap."""
+    if args.replay and (args.no_cache or not os.path.exists(args.cache_file)):
+        args.parser.error(f"--replay needs an existing cache at {args.cache_file}")
+    response_cache = None if args.no_cache else generator.ResponseCache(args.cache_file, args.cache_ttl, replay=args.replay)
+
+    generator.load_alias_cache()
+    generator.load_sprite_aliases()
+    # A resumed crawl keeps its original start time so the next --incremental run asks for every change since then.
+    checkpoint = (generator.Checkpoint.load() if args.resume else None) or generator.Checkpoint()
+    started_at = checkpoint.started_at
+    previous_build = generator.load_build_state() if args.incremental and not checkpoint.stages else None
+    run_info = {"mode": "incremental" if previous_build else "resume" if checkpoint.stages else "full",
+                "started_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), "workers": args.workers, "rps": args.rps}
+    run_started, run_cpu = time.monotonic(), time.process_time()
+
+    def finish_run(status: str):
+        generator.METRICS.write(args.metrics_file, **run_info, status=status, finished_at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                                wall_s=round(time.monotonic() - run_started, 3), cpu_s=round(time.process_time() - run_cpu, 3))
+
+    try:
+        if previous_build:
+            db_payload = generator.fetch_data_incremental(previous_build, workers=args.workers, requests_per_second=args.rps, cache=response_cache)
+        else:
+            db_payload = generator.fetch_data(workers=args.workers, requests_per_second=args.rps, cache=response_cache, checkpoint=checkpoint)
+    except generator.StageAborted as e:
+        print(f"\n[!] BUILD ABORTED: {e}")
+        if previous_build:
+            print(f"    {generator.JSON_OUTPUT_FILE} was not updated; rerun to retry the incremental build.")
+        else:
+            print(f"    {generator.JSON_OUTPUT_FILE} was not updated. Partial progress is in {generator.CHECKPOINT_FILE}; rerun with --resume.")
+        generator.save_alias_cache()  # The batches that did resolve are still good
+        finish_run("aborted")
+        if response_cache:
+            response_cache.close()
+        return 1
+    generator.save_build_state(started_at, "incremental" if previous_build else "full")
+    generator.save_alias_cache()
+    if db_payload:
+        generator.run_stages(generator.offline_stages(db_payload, ["exports", "versions", "sitemap"], args.shards, args.versions_keep))
+    finish_run("ok")
+    print(f"Metrics written to {args.metrics_file}.")
+    if response_cache:
+        response_cache.close()
+    return 0
+
+def stages(args) -> int:
+    """Reruns the chosen offline stages over a saved database, without touching the network."""
+    names = generator.OFFLINE_STAGES if "all" in args.stages else args.stages
+    # The search index lists the build's aliases and the image URLs follow the sprite dedup, as in build().
+    generator.load_alias_cache()
+    generator.load_sprite_aliases()
+    try:
+        items_db = generator.load_database(args.database)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[!] Cannot load {args.database}: {e}")
+        return 1
+    planned = generator.offline_stages(items_db, names, args.shards, args.versions_keep)
+    print(f"Loaded {len(items_db)} items from {args.database}; running {', '.join(stage.name for stage in planned)}.")
+    generator.run_stages(planned)
+    return 0
+
+def versions(args) -> int:
+    if args.action == "verify":
+        problems = versioned.verify_versions()
+        for problem in problems:
+            print(f"[!] {problem}")
+        print(f"{len(versioned.load_versions()['versions'])} versions in {versioned.VERSIONS_DIR}/: {'FAILED' if problems else 'OK'}")
+        return 1 if problems else 0
+    with open(args.base, 'rb') as f:
+        try:
+            patched = versioned.apply_version_patches(f.read())
+        except versioned.PatchError as e:
+            print(f"[!] {e}")
+            return 1
+    with open(args.out, 'wb') as f:
+        f.write(patched)
+    print(f"Wrote version {versioned.load_versions()['latest']['version']} to {args.out}.")
+    return 0
+
+def download_sprites(args) -> int:
+    sprites.JSON_FILE_PATH = args.json_file
+    sprites.OUTPUT_DIR = args.output_dir
+    sprites.main(workers=args.workers, requests_per_second=args.rps, metrics_file=args.metrics_file,
+                 profile_stages=args.profile, profile_mode=args.profile_mode)
+    return 0
+
+def normalize(args) -> int:
+    exports = args.exports or sorted(glob.glob(normalizer.EXPORT_GLOB))
+    if not exports:
+        logging.error(f"No exports found matching {normalizer.EXPORT_GLOB}.")
+        return 1
+    normalizer.normalize_exports(exports, args.output_dir, args.workers, args.chunk_size)
+    return 0
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m terraria_pipeline", description="Builds the TerrariTree item database, sprites and exports.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    p = commands.add_parser("build", help="Crawl the wiki and build everything", description="Builds terraria_items.json and the sitemap from the Terraria wiki.")
+    p.add_argument("--workers", type=int, default=generator.FETCH_WORKERS, help="Cargo pages kept in flight at once (default: %(default)s)")
+    p.add_argument("--rps", type=float, default=generator.REQUESTS_PER_SECOND, help="Shared request budget in requests/second (default: %(default)s)")
+    p.add_argument("--api-url", default=generator.API_URL, help="MediaWiki API endpoint, e.g. a local fake-wiki-server.py (default: %(default)s)")
+    p.add_argument("--database", default=generator.JSON_OUTPUT_FILE, help="Item database written by the build (default: %(default)s)")
+    p.add_argument("--crawl-file", default=generator.CRAWL_OUTPUT_FILE, help="Crawl snapshot written next to it, the input of `stages` (default: %(default)s)")
+    p.add_argument("--cache-file", default=generator.CACHE_FILE, help="SQLite response cache (default: %(default)s)")
+    p.add_argument("--cache-ttl", type=float, default=generator.CACHE_TTL_HOURS, help="Hours before a cached response is refetched (default: %(default)s)")
+    p.add_argument("--no-cache", action="store_true", help="Always hit the network and do not record responses")
+    p.add_argument("--replay", action="store_true", help="Serve every request from the cache only; never touch the network")
+    p.add_argument("--incremental", action="store_true", help=f"Only refetch pages changed since the build recorded in {generator.BUILD_STATE_FILE}")
+    p.add_argument("--resume", action="store_true", help=f"Continue an interrupted full crawl from {generator.CHECKPOINT_FILE}")
+    p.add_argument("--shards", choices=["id", "category"], help=f"Also write lazy-loadable shards and a manifest to {exports.SHARD_DIR}/")
+    p.add_argument("--versions-keep", type=int, default=versioned.VERSIONS_KEEP, help=f"Full builds kept in {versioned.VERSIONS_DIR}/ (default: %(default)s)")
+    p.add_argument("--metrics-file", default=generator.METRICS_FILE, help="Per-stage metrics JSON written after the run (default: %(default)s)")
+    add_profile_arguments(p, BUILD_STAGES)
+    p.set_defaults(run=build, parser=p)
+
+    p = commands.add_parser("stages", help="Rerun offline stages over a saved database",
+                            description="Reruns any subset of the post-crawl stages over a saved database, e.g. `stages inference export` after an INFERENCE_RULES "
+                                        "change or `stages sitemap`. Publishing from the crawl snapshot also runs inference, rollup and atlases, whose fields it leaves out; "
+                                        "running all of them over it reproduces the last build.")
+    p.add_argument("stages", nargs="+", choices=[*generator.OFFLINE_STAGES, "all"], metavar="STAGE",
+                   help=f"Any of {', '.join(generator.OFFLINE_STAGES)}, or all; they always run in that order")
+    p.add_argument("--database", default=generator.CRAWL_OUTPUT_FILE,
+                   help="Crawl snapshot or built database to start from (default: %(default)s, the only input Step 3 can reclassify)")
+    p.add_argument("--output", default=generator.JSON_OUTPUT_FILE, help="Item database written by the export stage (default: %(default)s)")
+    p.add_argument("--shards", choices=["id", "category"], help=f"Also write lazy-loadable shards and a manifest to {exports.SHARD_DIR}/")
+    p.add_argument("--versions-keep", type=int, default=versioned.VERSIONS_KEEP, help=f"Full builds kept in {versioned.VERSIONS_DIR}/ (default: %(default)s)")
+    add_profile_arguments(p, list(generator.OFFLINE_STAGES))
+    p.set_defaults(run=stages)
+
+    p = commands.add_parser("versions", help="Check or apply the versioned builds", description=f"Works on the builds and delta patches in {versioned.VERSIONS_DIR}/.")
+    actions = p.add_subparsers(dest="action", required=True, metavar="ACTION")
+    actions.add_parser("verify", help="Check every build and patch byte-for-byte")
+    apply = actions.add_parser("apply", help="Bring the build BASE up to the latest version and write it to OUT")
+    apply.add_argument("base", metavar="BASE")
+    apply.add_argument("out", metavar="OUT")
+    p.set_defaults(run=versions)
+
+    p = commands.add_parser("sprites", help="Download the item sprites", description="Downloads (or revalidates) every item sprite listed in the DataExporterMod export.")
+    p.add_argument("--workers", type=int, default=sprites.DOWNLOAD_WORKERS, help="Downloads in flight at once (default: %(default)s)")
+    p.add_argument("--rps", type=float, default=sprites.REQUESTS_PER_SECOND_PER_HOST, help="Requests/second per host (default: %(default)s)")
+    p.add_argument("--json-file", default=sprites.JSON_FILE_PATH, help="DataExporterMod export listing the IconUrls (default: %(default)s)")
+    p.add_argument("--output-dir", default=sprites.OUTPUT_DIR, help="Where the sprites are saved (default: %(default)s)")
+    p.add_argument("--metrics-file", default=sprites.METRICS_FILE, help="Run metrics JSON (default: %(default)s)")
+    p.add_argument("--profile", action="append", choices=["load", "download", "report"], default=[], help="Profile a stage (repeatable)")
+    p.add_argument("--profile-mode", choices=["cpu", "memory"], default="cpu", help=f"cProfile or tracemalloc, written to {sprites.PROFILE_DIR}/ (default: %(default)s)")
+    p.set_defaults(run=download_sprites)
+
+    p = commands.add_parser("normalize", help="Convert DataExporterMod exports", description="Converts DataExporterMod exports into the generator's terraria_items.json schema.")
+    p.add_argument("exports", nargs="*", help=f"Export files (default: every {normalizer.EXPORT_GLOB} in the current directory)")
+    p.add_argument("--output-dir", default=normalizer.OUTPUT_DIR, help="Where the terraria_items_<Env>_<version>.json files go (default: %(default)s)")
+    p.add_argument("--workers", type=int, default=normalizer.NORMALIZE_WORKERS, help="Export files normalized at once (default: %(default)s)")
+    p.add_argument("--chunk-size", type=int, default=normalizer.CHUNK_SIZE, help="Characters read per parser step (default: %(default)s)")
+    p.set_defaults(run=normalize)
+    return parser
+
+def main(argv=None) -> int:
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    if args.command in ("build", "stages"):
+        generator.PROFILE_STAGES.update(args.profile)
+        generator.PROFILE_MODE = args.profile_mode
+        generator.JSON_OUTPUT_FILE = args.database if args.command == "build" else args.output
+    if args.command == "build":
+        generator.API_URL = args.api_url
+        generator.CRAWL_OUTPUT_FILE = args.crawl_file
+    return args.run(args)
@@ -0,0 +1,212 @@
+import array
+import json
+import struct
+import sys
+
+from .store import ItemRecord
+
+# ==========================================
+# COLUMNAR BINARY EXPORT
+# ==========================================
+
+# Layout (little-endian): COLUMNAR_MAGIC, u32 header length, UTF-8 JSON header, then the
+# string table (u32 offsets + UTF-8 blob) and every column in header order as raw arrays.
+# Strings are stored once and referenced by index. url/image_url are omitted when they
+# equal generate_wiki_url/generate_image_url(name); sprite aliases are not applied there,
+# since a reader cannot know them. Ingredients point at the crafted-from item by index
+# when the name matches one exactly. Variable-length lists (generic types,
+# recipes, ingredients, acquisition, raw materials) are CSR-style offset + value columns.
+# The rollup_crafting fields are optional (header "rollup") but all-or-nothing.
+
+COLUMNAR_MAGIC = b"TTCOL\x00\x01\x00"
+NO_STRING = 0xFFFFFFFF  # String-ref sentinel: None, or "derive from the name" for URLs
+STRING_COLUMNS = ("name", "description", "url", "image_url", "specific_type", "damage_class", "sprite")
+
+class ColumnarFormatError(ValueError):
+    """The payload has a shape the columnar format cannot represent losslessly, or the file is corrupt."""
+
+def _column(typecode: str, values=()) -> array.array:
+    column = array.array(typecode, values)
+    if column.itemsize != {"B": 1, "i": 4, "I": 4, "q": 8, "d": 8}[typecode]:
+        raise ColumnarFormatError(f"array '{typecode}' is {column.itemsize} bytes on this platform")
+    return column
+
+def encode_columnar(payloads: dict) -> bytes:
+    """Packs JSON payloads (item id -> item dict) into the columnar format."""
+    from .generator import generate_image_url, generate_wiki_url
+    strings, string_ids = [], {}
+
+    def ref(text):
+        if text is None: return NO_STRING
+        if not isinstance(text, str): raise ColumnarFormatError(f"expected a string, got {text!r}")
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    keys = list(payloads)
+    first_index_of = {}
+    for index, key in enumerate(keys):
+        first_index_of.setdefault(payloads[key]["name"], index)
+    rollup = bool(keys) and "depth" in payloads[keys[0]]["crafting"]
+    crafting_keys = {"is_craftable", "recipes"} | ({"depth"} if rollup else set())
+    recipe_keys = ["station", "ingredients", "version", "transmutation"] + (["raw_materials"] if rollup else [])
+    stat_keys = {}
+    for item in payloads.values():
+        for stat, value in item["stats"].items():
+            kind = "q" if type(value) is int else "d" if type(value) is float else None
+            if kind is None or stat_keys.setdefault(stat, kind) != kind:
+                raise ColumnarFormatError(f"stat '{stat}' mixes types or is not numeric: {value!r}")
+
+    cols = {name: _column("I") for name in STRING_COLUMNS}
+    cols.update({name: _column(code) for name, code in [
+        ("id", "i"), ("is_craftable", "B"), ("hardmode", "B"),
+        ("generic_offsets", "I"), ("generic_types", "I"),
+        ("recipe_offsets", "I"), ("recipe_station", "I"), ("recipe_version", "I"), ("recipe_transmutation", "B"),
+        ("ingredient_offsets", "I"), ("ingredient_ref", "i"), ("ingredient_amount", "i"),
+        ("acquisition_offsets", "I"), ("acquisition_type", "I"), ("acquisition_source", "I"), ("acquisition_rate", "I"),
+    ] + ([("crafting_depth", "i"), ("raw_offsets", "I"), ("raw_ref", "i"), ("raw_amount", "q")] if rollup else [])})
+    for stat, kind in stat_keys.items():
+        cols[f"stat_present:{stat}"], cols[f"stat:{stat}"] = _column("B"), _column(kind)
+    for name in ("generic_offsets", "recipe_offsets", "ingredient_offsets", "acquisition_offsets") + (("raw_offsets",) if rollup else ()):
+        cols[name].append(0)
+
+    item_keys = set(ItemRecord.__slots__) - set(ItemRecord.INTERNAL)  # payloads as exported, without page provenance
+    for key in keys:
+        item = payloads[key]
+        if set(item) - item_keys or not item_keys - set(ItemRecord.OPTIONAL) <= set(item) or str(item["id"]) != key:
+            raise ColumnarFormatError(f"item {key} does not have the ItemRecord payload shape")
+        cols["id"].append(item["id"])
+        cols["name"].append(ref(item["name"]))
+        cols["description"].append(ref(item["description"]))
+        cols["url"].append(NO_STRING if item["url"] == generate_wiki_url(item["name"]) else ref(item["url"]))
+        cols["image_url"].append(NO_STRING if item["image_url"] == generate_image_url(item["name"], resolve_alias=False) else ref(item["image_url"]))
+        cols["specific_type"].append(ref(item["specific_type"]))
+        cols["damage_class"].append(ref(item["damage_class"]))
+        cols["sprite"].append(ref(item.get("sprite")))
+        cols["generic_types"].extend(ref(t) for t in item["generic_types"])
+        cols["generic_offsets"].append(len(cols["generic_types"]))
+        for stat in stat_keys:
+            present = stat in item["stats"]
+            cols[f"stat_present:{stat}"].append(present)
+            if present: cols[f"stat:{stat}"].append(item["stats"][stat])
+        cols["is_craftable"].append(item["crafting"]["is_craftable"])
+        cols["hardmode"].append({None: 0, False: 1, True: 2}[item.get("hardmode")])
+
+        if list(item["crafting"]) != [k for k in ("is_craftable", "recipes", "depth") if k in crafting_keys]:
+            raise ColumnarFormatError(f"item {key} has unexpected crafting fields")
+        if rollup:
+            cols["crafting_depth"].append(item["crafting"]["depth"])
+        for recipe in item["crafting"]["recipes"]:
+            if list(recipe) != recipe_keys:
+                raise ColumnarFormatError(f"item {key} has a recipe with unexpected fields")
+            cols["recipe_station"].append(ref(recipe["station"]))
+            cols["recipe_version"].append(ref(recipe["version"]))
+            cols["recipe_transmutation"].append(recipe["transmutation"])
+            for ing in recipe["ingredients"]:
+                if list(ing) != ["name", "amount"]:
+                    raise ColumnarFormatError(f"item {key} has an ingredient with unexpected fields")
+                index = first_index_of.get(ing["name"])
+                cols["ingredient_ref"].append(index if index is not None else -1 - ref(ing["name"]))
+                cols["ingredient_amount"].append(ing["amount"])
+            cols["ingredient_offsets"].append(len(cols["ingredient_ref"]))
+            if rollup:
+                for material, count in recipe["raw_materials"].items():
+                    index = first_index_of.get(material)
+                    cols["raw_ref"].append(index if index is not None else -1 - ref(material))
+                    try:
+                        cols["raw_amount"].append(count)
+                    except OverflowError:
+                        raise ColumnarFormatError(f"item {key} needs {count} {material}, more than a 64-bit column holds") from None
+                cols["raw_offsets"].append(len(cols["raw_ref"]))
+        cols["recipe_offsets"].append(len(cols["recipe_station"]))
+        for acq in item["acquisition"]:
+            if list(acq) != ["type", "source", "rate"]:
+                raise ColumnarFormatError(f"item {key} has an acquisition entry with unexpected fields")
+            cols["acquisition_type"].append(ref(acq["type"]))
+            cols["acquisition_source"].append(ref(acq["source"]))
+            cols["acquisition_rate"].append(ref(acq["rate"]))
+        cols["acquisition_offsets"].append(len(cols["acquisition_type"]))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = _column("I", [0])
+    for blob in encoded:
+        string_offsets.append(string_offsets[-1] + len(blob))
+    cols = {"string_offsets": string_offsets, **cols}
+    header = json.dumps({
+        "items": len(keys), "stats": list(stat_keys), "rollup": rollup, "string_bytes": string_offsets[-1],
+        "columns": [[name, column.typecode, len(column)] for name, column in cols.items()],
+    }, separators=(',', ':')).encode("utf-8")
+
+    parts = [COLUMNAR_MAGIC, struct.pack("<I", len(header)), header, b"".join(encoded)]
+    for column in cols.values():
+        if sys.byteorder == "big": column.byteswap()
+        parts.append(column.tobytes())
+    return b"".join(parts)
+
+def decode_columnar(data: bytes) -> dict:
+    """Rebuilds the JSON payloads (item id -> item dict, in the original order) from encode_columnar output."""
+    from .generator import generate_image_url, generate_wiki_url
+    if data[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC:
+        raise ColumnarFormatError("not a columnar item database (bad magic)")
+    view, pos = memoryview(data), len(COLUMNAR_MAGIC)
+    (header_len,) = struct.unpack_from("<I", data, pos)
+    header = json.loads(bytes(view[pos + 4:pos + 4 + header_len]))
+    pos += 4 + header_len
+    string_blob = view[pos:pos + header["string_bytes"]]
+    pos += header["string_bytes"]
+    cols = {}
+    for name, typecode, count in header["columns"]:
+        column = _column(typecode)
+        column.frombytes(view[pos:pos + count * column.itemsize])
+        if sys.byteorder == "big": column.byteswap()
+        cols[name], pos = column, pos + count * column.itemsize
+    if pos != len(data):
+        raise ColumnarFormatError(f"{len(data) - pos} trailing bytes")
+
+    offsets = cols["string_offsets"]
+    strings = [str(string_blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)]
+    text = lambda i: None if i == NO_STRING else strings[i]
+    names = [strings[i] for i in cols["name"]]
+    stat_cursor = {stat: 0 for stat in header["stats"]}
+    payloads = {}
+    for n in range(header["items"]):
+        stats = {}
+        for stat in header["stats"]:
+            if cols[f"stat_present:{stat}"][n]:
+                stats[stat] = cols[f"stat:{stat}"][stat_cursor[stat]]
+                stat_cursor[stat] += 1
+        recipes = []
+        for r in range(cols["recipe_offsets"][n], cols["recipe_offsets"][n + 1]):
+            ingredients = []
+            for g in range(cols["ingredient_offsets"][r], cols["ingredient_offsets"][r + 1]):
+                target = cols["ingredient_ref"][g]
+                ingredients.append({"name": names[target] if target >= 0 else strings[-1 - target], "amount": cols["ingredient_amount"][g]})
+            recipes.append({"station": strings[cols["recipe_station"][r]], "ingredients": ingredients,
+                            "version": strings[cols["recipe_version"][r]], "transmutation": bool(cols["recipe_transmutation"][r])})
+            if header["rollup"]:
+                recipes[-1]["raw_materials"] = {names[t] if t >= 0 else strings[-1 - t]: cols["raw_amount"][m]
+                                                for m in range(cols["raw_offsets"][r], cols["raw_offsets"][r + 1]) for t in [cols["raw_ref"][m]]}
+        acquisition = [{"type": strings[cols["acquisition_type"][a]], "source": strings[cols["acquisition_source"][a]], "rate": strings[cols["acquisition_rate"][a]]}
+                       for a in range(cols["acquisition_offsets"][n], cols["acquisition_offsets"][n + 1])]
+        url, image_url = text(cols["url"][n]), text(cols["image_url"][n])
+        item = {
+            "id": cols["id"][n], "name": names[n], "description": strings[cols["description"][n]],
+            "url": url if url is not None else generate_wiki_url(names[n]),
+            "image_url": image_url if image_url is not None else generate_image_url(names[n], resolve_alias=False),
+            "generic_types": [strings[i] for i in cols["generic_types"][cols["generic_offsets"][n]:cols["generic_offsets"][n + 1]]],
+            "specific_type": text(cols["specific_type"][n]), "damage_class": strings[cols["damage_class"][n]],
+            "stats": stats, "crafting": {"is_craftable": bool(cols["is_craftable"][n]), "recipes": recipes}, "acquisition": acquisition,
+        }
+        if header["rollup"]: item["crafting"]["depth"] = cols["crafting_depth"][n]
+        if cols["hardmode"][n]: item["hardmode"] = cols["hardmode"][n] == 2
+        if cols["sprite"][n] != NO_STRING: item["sprite"] = strings[cols["sprite"][n]]
+        payloads[str(item["id"])] = item
+    return payloads
+
+def verify_columnar(payloads: dict, data: bytes) -> list:
+    """Round-trips `data` against the JSON payloads; returns the ids that differ (empty = lossless)."""
+    decoded = decode_columnar(data)
+    if list(decoded) != list(payloads):
+        return sorted(set(decoded) ^ set(payloads)) or ["<item order>"]
+    return [key for key in payloads if decoded[key] != payloads[key]]
@@ -0,0 +1,293 @@
+from .store import ItemStore
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# --- CRAFTING GRAPH ---
+UPGRADE_CLOSURE_MAX_DEPTH = 4    # Crafting steps followed from an item when listing what it upgrades into
+UPGRADE_CLOSURE_MAX_ITEMS = 250  # Nearest-first cap per item; raw materials like Wood reach thousands
+# --- RECIPE GROUPS (mirrors RECIPE_GROUPS in app-js/state.js) ---
+# Any member satisfies a group ingredient. The crafting rollup takes a group's depth from
+# its shallowest member, and counts the group itself as one raw material.
+RECIPE_GROUPS = {
+    "Any Wood": ["Wood", "Boreal Wood", "Rich Mahogany", "Ebonwood", "Shadewood", "Pearlwood", "Spooky Wood", "Dynasty Wood", "Ash Wood"],
+    "Any Iron Bar": ["Iron Bar", "Lead Bar"],
+    "Any Copper Bar": ["Copper Bar", "Tin Bar"],
+    "Any Silver Bar": ["Silver Bar", "Tungsten Bar"],
+    "Any Gold Bar": ["Gold Bar", "Platinum Bar"],
+    "Any Cobalt Bar": ["Cobalt Bar", "Palladium Bar"],
+    "Any Mythril Bar": ["Mythril Bar", "Orichalcum Bar"],
+    "Any Adamantite Bar": ["Adamantite Bar", "Titanium Bar"],
+    "Any Demonite Bar": ["Demonite Bar", "Crimtane Bar"],
+    "Any Sand": ["Sand Block", "Ebonsand Block", "Crimsand Block", "Pearlsand Block"],
+    "Any Bird": ["Bird", "Blue Jay", "Cardinal", "Goldfinch"],
+    "Any Scorpion": ["Scorpion", "Black Scorpion"],
+    "Any Squirrel": ["Squirrel", "Red Squirrel", "Gold Squirrel"],
+    "Any Bug": ["Grubby", "Sluggy", "Buggy"],
+    "Any Jungle Bug": ["Grubby", "Sluggy", "Buggy"],
+    "Any Duck": ["Duck", "Mallard Duck"],
+    "Any Butterfly": ["Monarch Butterfly", "Sulphur Butterfly", "Zebra Swallowtail Butterfly", "Ulysses Butterfly", "Julia Butterfly", "Red Admiral Butterfly", "Purple Emperor Butterfly", "Tree Nymph Butterfly"],
+    "Any Firefly": ["Firefly", "Lightning Bug"],
+    "Any Snail": ["Snail", "Glowing Snail", "Magma Snail"],
+    "Any Fruit": ["Apple", "Apricot", "Banana", "Blackcurrant", "Blood Orange", "Cherry", "Coconut", "Dragon Fruit", "Elderberry", "Grapefruit", "Lemon", "Mango", "Peach", "Pineapple", "Plum", "Rambutan", "Starfruit", "Spicy Pepper", "Pomegranate"],
+    "Any Dragonfly": ["Black Dragonfly", "Blue Dragonfly", "Green Dragonfly", "Orange Dragonfly", "Red Dragonfly", "Yellow Dragonfly"],
+    "Any Turtle": ["Turtle", "Jungle Turtle"],
+    "Any Macaw": ["Blue Macaw", "Scarlet Macaw"],
+    "Any Cockatiel": ["Gray Cockatiel", "Yellow Cockatiel"],
+    "Any Balloon": ["Shiny Red Balloon", "Green Balloon", "Pink Balloon"],
+    "Any Cloud": ["Cloud", "Rain Cloud", "Snow Cloud"],
+    "Any Pressure Plate": ["Red Pressure Plate", "Green Pressure Plate", "Gray Pressure Plate", "Brown Pressure Plate", "Blue Pressure Plate", "Yellow Pressure Plate", "Lihzahrd Pressure Plate"]
+}
+
+# ==========================================
+# CRAFTING GRAPH
+# ==========================================
+
+def strongly_connected_groups(successors: dict) -> list:
+    """Iterative Tarjan: the groups of 2+ nodes (or self-loops) that can reach each other, i.e. crafting cycles."""
+    index_of, low, on_stack, stack, groups, counter = {}, {}, set(), [], [], 0
+    for root in successors:
+        if root in index_of: continue
+        work = [(root, iter(successors[root]))]
+        index_of[root] = low[root] = counter; counter += 1
+        stack.append(root); on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index_of:
+                    index_of[child] = low[child] = counter; counter += 1
+                    stack.append(child); on_stack.add(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                elif child in on_stack:
+                    low[node] = min(low[node], index_of[child])
+                continue
+            work.pop()
+            if work: low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index_of[node]:
+                group = []
+                while True:
+                    member = stack.pop(); on_stack.discard(member); group.append(member)
+                    if member == node: break
+                if len(group) > 1 or node in successors.get(node, ()):
+                    groups.append(sorted(group, key=int))
+    return groups
+
+def build_usage_index(items_db: ItemStore) -> dict:
+    """Precomputes what the client's "What is this for?" view and upgrade trees need.
+
+    - used_in: lowercase ingredient name -> [[product id, recipe index, amount], ...], in
+      database order. Keys match the client's usageIndex, so group names such as
+      "any wood" are kept as-is.
+    - upgrades: item id -> ids craftable from it within UPGRADE_CLOSURE_MAX_DEPTH steps,
+      nearest first. Each list is capped at UPGRADE_CLOSURE_MAX_ITEMS, and the capped ids
+      are listed in `truncated`.
+    - cycles: groups of items that craft into each other, e.g. shimmer and transmutation
+      loops. Each member's closure contains the rest of its group, but never the item itself.
+    The graph is built in one pass over the recipes. Each closure is a bounded BFS with a
+    visited set, so the total work is linear in the item count.
+    """
+    # Products per ingredient item as insertion-ordered dict keys: O(1) de-duplication for
+    # materials like Wood that feed thousands of recipes, in first-seen order.
+    used_in, successors = {}, {item_id: {} for item_id in items_db}
+    name_index = items_db.name_index
+    for product_id, item in items_db.items():
+        for recipe_index, recipe in enumerate(item["crafting"]["recipes"]):
+            for ing in recipe["ingredients"]:
+                used_in.setdefault(ing["name"].lower(), []).append([int(product_id), recipe_index, ing["amount"]])
+                source_id = name_index.get(ing["name"].lower())
+                if source_id is not None:
+                    successors[source_id][product_id] = None
+    successors = {item_id: list(products) for item_id, products in successors.items()}
+
+    upgrades, truncated = {}, []
+    for item_id, direct in successors.items():
+        if not direct: continue
+        seen, frontier, closure = {item_id}, direct, []
+        for _ in range(UPGRADE_CLOSURE_MAX_DEPTH):
+            next_frontier = []
+            for product_id in frontier:
+                if product_id in seen: continue
+                seen.add(product_id)
+                closure.append(int(product_id))
+                next_frontier.extend(successors[product_id])
+            if len(closure) > UPGRADE_CLOSURE_MAX_ITEMS or not next_frontier: break
+            frontier = next_frontier
+        if len(closure) > UPGRADE_CLOSURE_MAX_ITEMS:
+            truncated.append(int(item_id))
+        upgrades[item_id] = closure[:UPGRADE_CLOSURE_MAX_ITEMS]
+
+    cycles = strongly_connected_groups(successors)
+    return {"used_in": used_in, "upgrades": upgrades, "truncated": truncated, "cycles": [[int(i) for i in group] for group in cycles]}
+
+def build_craft_index(items_db: ItemStore) -> dict:
+    """The Discovery Engine's "what can I craft with these items" index, as JSON-ready data.
+
+    - ingredients: lowercase ingredient names, numbered densely with the most used first.
+    - recipes: [product id, recipe index] in database order. masks[r] is recipe r's
+      ingredient bitset as hex, so BigInt("0x" + mask) works in the client.
+    - postings: ingredient number -> recipe numbers that use it.
+    - by_size: ingredient count -> recipe numbers, so "missing at most k" queries can
+      reach recipes that share nothing with the inventory.
+    - groups: lowercase member name -> numbers of the group ingredients it satisfies
+      ("wood" -> "any wood").
+    """
+    uses, recipes = {}, []
+    for product_id, item in items_db.items():
+        for recipe_index, recipe in enumerate(item["crafting"]["recipes"]):
+            names = sorted({ing["name"].lower() for ing in recipe["ingredients"]})
+            recipes.append(([int(product_id), recipe_index], names))
+            for name in names:
+                uses[name] = uses.get(name, 0) + 1
+    ingredients = sorted(uses, key=lambda name: (-uses[name], name))
+    number = {name: n for n, name in enumerate(ingredients)}
+
+    masks, postings, by_size = [], [[] for _ in ingredients], {}
+    for r, (_, names) in enumerate(recipes):
+        mask = 0
+        for name in names:
+            mask |= 1 << number[name]
+            postings[number[name]].append(r)
+        masks.append(format(mask, "x"))
+        by_size.setdefault(len(names), []).append(r)
+    groups = {}
+    for group, members in RECIPE_GROUPS.items():
+        if group.lower() in number:
+            for member in members:
+                groups.setdefault(member.lower(), []).append(number[group.lower()])
+    return {"ingredients": ingredients, "recipes": [ref for ref, _ in recipes], "masks": masks,
+            "postings": postings, "by_size": {str(size): rs for size, rs in sorted(by_size.items())}, "groups": groups}
+
+class CraftQueryEngine:
+    """Python reference for querying a build_craft_index index: subset and "missing at most k" queries.
+
+    The inventory becomes one bitset, with group ingredients switched on by their
+    members. Candidates come from the postings of owned ingredients (plus the recipes
+    with at most k ingredients). Each candidate is then settled with a single
+    mask & ~inventory popcount.
+    """
+
+    def __init__(self, index: dict):
+        self.index = index
+        self.number = {name: n for n, name in enumerate(index["ingredients"])}
+        self.masks = [int(mask, 16) for mask in index["masks"]]
+        self.by_size = {int(size): rs for size, rs in index["by_size"].items()}
+
+    def inventory_mask(self, inventory) -> int:
+        mask = 0
+        for name in inventory:
+            name = name.lower()
+            if name in self.number: mask |= 1 << self.number[name]
+            for group_number in self.index["groups"].get(name, ()):
+                mask |= 1 << group_number
+        return mask
+
+    def missing(self, inventory, k: int = 0) -> dict:
+        """Recipe number -> count of missing ingredients, for every recipe missing at most k."""
+        owned = self.inventory_mask(inventory)
+        candidates = set()
+        bits = owned
+        while bits:
+            low = bits & -bits
+            candidates.update(self.index["postings"][low.bit_length() - 1])
+            bits ^= low
+        for size in range(1, k + 1):
+            candidates.update(self.by_size.get(size, ()))
+        found = {}
+        for r in candidates:
+            gap = (self.masks[r] & ~owned).bit_count()
+            if gap <= k: found[r] = gap
+        return found
+
+    def craftable(self, inventory) -> list:
+        """[product id, recipe index] for every recipe the inventory fully covers, in database order."""
+        return [self.index["recipes"][r] for r in sorted(self.missing(inventory, 0))]
+
+    def almost_craftable(self, inventory, k: int) -> list:
+        """[product id, recipe index, missing count] for recipes missing at most k ingredients, fewest missing first."""
+        found = self.missing(inventory, k)
+        return [self.index["recipes"][r] + [found[r]] for r in sorted(found, key=lambda r: (found[r], r))]
+
+def rollup_crafting(items_db: ItemStore):
+    """Writes crafting["depth"] per item and recipe["raw_materials"] per recipe variant.
+
+    depth is 0 for an item with no usable recipe. Otherwise it is 1 + the deepest
+    ingredient of its shallowest non-transmutation recipe. raw_materials is
+    {material name: count} for one craft of that recipe. Each craftable ingredient is
+    expanded through its own first non-transmutation recipe (the UI default), and
+    treated as yielding one unit per craft. Group ingredients ("Any Wood") and
+    unresolvable names stay raw materials. Both traversals are memoized per item. An
+    item reached again while it is still being expanded (a shimmer or crafting loop)
+    counts as a raw material in the totals. A recipe that needs such an item is ignored
+    for depth.
+    """
+    name_index, depth_memo, raw_memo, in_progress = items_db.name_index, {}, {}, object()
+    craft_recipes = lambda item_id: [r for r in items_db[item_id]["crafting"]["recipes"] if not r["transmutation"]]
+    finished = lambda memo, item_id: None if memo[item_id] is in_progress else memo[item_id]
+
+    def members(name):
+        return [name_index[m.lower()] for m in RECIPE_GROUPS.get(name, [name]) if m.lower() in name_index]
+
+    def resolve(name):
+        return None if name in RECIPE_GROUPS else name_index.get(name.lower())
+
+    def ingredient_depth(name):
+        member_ids = members(name)
+        if not member_ids: return 0
+        depths = [d for d in (finished(depth_memo, i) for i in member_ids) if d is not None]
+        return min(depths) if depths else None
+
+    def item_depth(item_id):
+        depths = []
+        for recipe in craft_recipes(item_id):
+            ingredient_depths = [ingredient_depth(ing["name"]) for ing in recipe["ingredients"]]
+            if None not in ingredient_depths: depths.append(1 + max(ingredient_depths, default=0))
+        return min(depths, default=0)
+
+    def recipe_raw(recipe):
+        totals = {}
+        for ing in recipe["ingredients"]:
+            item_id = resolve(ing["name"])
+            expanded = finished(raw_memo, item_id) if item_id is not None else None
+            for material, count in (expanded or {ing["name"]: 1}).items():
+                totals[material] = totals.get(material, 0) + count * ing["amount"]
+        return totals
+
+    def item_raw(item_id):
+        """Raw totals for one craft of the item, or None when it is itself a raw material."""
+        recipes = craft_recipes(item_id)
+        return recipe_raw(recipes[0]) if recipes else None
+
+    def depth_children(item_id):
+        return [m for recipe in craft_recipes(item_id) for ing in recipe["ingredients"] for m in members(ing["name"])]
+
+    def raw_children(item_id):
+        recipes = craft_recipes(item_id)
+        return [i for i in map(resolve, (ing["name"] for ing in recipes[0]["ingredients"])) if i is not None] if recipes else []
+
+    def memoized(root, children, combine, memo):
+        """Iterative post-order DFS (crafting chains can outgrow the recursion limit).
+
+        memo[node] = combine(node) once every child is done. A child still on the stack
+        is part of a cycle, and combine sees it as in_progress.
+        """
+        if root in memo: return
+        memo[root] = in_progress
+        stack = [(root, iter(children(root)))]
+        while stack:
+            node, pending = stack[-1]
+            child = next(pending, None)
+            if child is None:
+                stack.pop()
+                memo[node] = combine(node)
+            elif child not in memo:
+                memo[child] = in_progress
+                stack.append((child, iter(children(child))))
+
+    for item_id, item in items_db.items():
+        memoized(item_id, depth_children, item_depth, depth_memo)
+        item["crafting"]["depth"] = depth_memo[item_id]
+        for recipe in item["crafting"]["recipes"]:
+            for ing in recipe["ingredients"]:
+                if resolve(ing["name"]) is not None: memoized(resolve(ing["name"]), raw_children, item_raw, raw_memo)
+            recipe["raw_materials"] = recipe_raw(recipe)
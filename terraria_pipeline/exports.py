@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from .columnar import ColumnarFormatError, encode_columnar, verify_columnar
+from .crafting import build_craft_index, build_usage_index
+from .search import build_search_index
+from .store import ItemStore
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# The indented JSON stays the reviewable artifact; clients download the minified/precompressed siblings.
+MIN_JSON_OUTPUT_FILE = "terraria_items.min.json"  # Written with .gz and (if brotli is installed) .br siblings
+SHARD_DIR = "terraria_items.shards"               # Optional per-range / per-category shards + manifest.json
+SHARD_ID_RANGE = 1000                             # Item ids per shard with --shards id
+COLUMNAR_OUTPUT_FILE = "terraria_items.bin"       # Columnar binary build (+ .gz), see encode_columnar
+USAGE_OUTPUT_FILE = "terraria_items.usage.json"   # "Used in" index + upgrade closures (+ .gz), see build_usage_index
+CRAFT_INDEX_OUTPUT_FILE = "terraria_items.craftindex.json"  # Discovery Engine bitset index (+ .gz), see build_craft_index
+SEARCH_INDEX_OUTPUT_FILE = "terraria_items.search.json"     # Prefix table + trigram postings (+ .gz), see build_search_index
+
+# ==========================================
+# EXPORTS
+# ==========================================
+
+_MIN_JSON = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+def minified_json(payloads) -> bytes:
+    """The exact bytes of terraria_items.min.json; versions are addressed by their sha256."""
+    return _MIN_JSON(payloads).encode('utf-8')
+
+def write_compressed(path: str, data: bytes) -> dict:
+    """Writes `data` plus .gz and .br siblings; returns {file: bytes written}. Brotli is optional."""
+    outputs = {path: data, path + ".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        outputs[path + ".br"] = brotli.compress(data, quality=11)
+    except ImportError:
+        if os.path.exists(path + ".br"): os.remove(path + ".br")  # never leave a stale sibling behind
+    for out_path, blob in outputs.items():
+        with open(out_path, 'wb') as f:
+            f.write(blob)
+    return {out_path: len(blob) for out_path, blob in outputs.items()}
+
+def shard_key(item_id: str, record, shard_by: str) -> str:
+    if shard_by == "id":
+        first = (int(item_id) - 1) // SHARD_ID_RANGE * SHARD_ID_RANGE + 1
+        return f"items-{first:05d}-{first + SHARD_ID_RANGE - 1:05d}"
+    return "category-" + (re.sub(r'[^a-z0-9]+', '-', (record["specific_type"] or "item").lower()).strip('-') or "item")
+
+def write_exports(items_db: ItemStore, aliases: dict, shard_by: str | None = None):
+    """Step 6b: minified + precompressed builds, and optionally shards with a manifest for lazy loading.
+
+    `aliases` (wiki redirect -> canonical page name) become extra search terms.
+
+    With shards, the manifest lists every shard's file, item count, size and sha256.
+    Id-range shards also record their id bounds. Category shards list their ids,
+    because a category cannot be derived from an id.
+    """
+    print("\nStep 6b/7: Writing Minified & Precompressed Exports...")
+    payloads = items_db.to_payloads()
+    sizes = write_compressed(MIN_JSON_OUTPUT_FILE, minified_json(payloads))
+    try:
+        sizes.update(write_columnar(payloads))
+    except ColumnarFormatError as e:
+        print(f"  [!] Skipped {COLUMNAR_OUTPUT_FILE}: {e}")
+    usage = build_usage_index(items_db)
+    sizes.update(write_compressed(USAGE_OUTPUT_FILE, json.dumps(usage, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+    craft_index = build_craft_index(items_db)
+    sizes.update(write_compressed(CRAFT_INDEX_OUTPUT_FILE, json.dumps(craft_index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+    search_index = build_search_index(items_db, aliases)
+    sizes.update(write_compressed(SEARCH_INDEX_OUTPUT_FILE, json.dumps(search_index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+    print(f"  -> Usage index: {len(usage['used_in'])} ingredients, {len(usage['upgrades'])} upgrade closures, {len(usage['cycles'])} crafting cycles.")
+    for out_path, size in sizes.items():
+        print(f"  -> {out_path}: {size / 1024:.0f} KiB")
+    if MIN_JSON_OUTPUT_FILE + ".br" not in sizes:
+        print("  -> brotli is not installed; skipped the .br sibling.")
+    if not shard_by:
+        return
+
+    shards = {}
+    for item_id, record in items_db.items():
+        shards.setdefault(shard_key(item_id, record, shard_by), []).append(item_id)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    for stale in os.listdir(SHARD_DIR):
+        if stale.endswith((".json", ".json.gz", ".json.br")): os.remove(os.path.join(SHARD_DIR, stale))
+
+    manifest = {"shard_by": shard_by, "item_count": len(payloads), "shards": []}
+    for key in sorted(shards):
+        data = json.dumps({i: payloads[i] for i in shards[key]}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        write_compressed(os.path.join(SHARD_DIR, key + ".min.json"), data)
+        entry = {"file": key + ".min.json", "count": len(shards[key]), "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+        if shard_by == "id":
+            ids = [int(i) for i in shards[key]]
+            entry.update(first_id=min(ids), last_id=max(ids))
+        else:
+            entry["ids"] = shards[key]
+        manifest["shards"].append(entry)
+    with open(os.path.join(SHARD_DIR, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"  -> {len(shards)} {shard_by} shards + manifest.json in {SHARD_DIR}/")
+
+def write_columnar(payloads: dict, path: str = COLUMNAR_OUTPUT_FILE) -> dict:
+    """Encodes, verifies the round trip, then writes the binary (+ compressed siblings). Returns the sizes."""
+    data = encode_columnar(payloads)
+    mismatches = verify_columnar(payloads, data)
+    if mismatches:
+        raise ColumnarFormatError(f"round trip differs for {len(mismatches)} items, e.g. {mismatches[:5]}")
+    return write_compressed(path, data)
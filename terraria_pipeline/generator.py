@@ -0,0 +1,1765 @@
+import contextvars
+import cProfile
+import hashlib
+import json
+import math
+import os
+import pstats
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from .crafting import rollup_crafting
+from .exports import minified_json, shard_key, write_compressed, write_exports
+from .sitemap import generate_sitemap
+from .store import ItemRecord, ItemStore
+from .versions import VERSIONS_KEEP, publish_version
+from .wikitext import parse_ingredients, parse_numeric_stat, sanitize_text
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+JSON_OUTPUT_FILE = "terraria_items.json"
+CRAWL_OUTPUT_FILE = "terraria_items.crawl.json"  # The crawl before the offline stages, the input of `python -m terraria_pipeline stages`
+BUILD_STATE_FILE = "terraria_items.build.json"  # Timestamp of the last build, read by --incremental
+USER_AGENT = "TerrariaJSONBuilder/14.0 (Heuristic Fallback Engine)"
+API_URL = "https://terraria.wiki.gg/api.php"
+
+# --- NETWORK BUDGET ---
+# Every API call shares one token bucket. 2.2 req/s matches the old fixed 0.45s sleep.
+REQUESTS_PER_SECOND = 2.2
+FETCH_WORKERS = 1          # Cargo offsets kept in flight at once (1 = sequential)
+CARGO_PAGE_SIZE = 500      # Within the wiki's Cargo query limit, so a shorter page is always the last one
+MAX_RATE_LIMIT_RETRIES = 5 # Consecutive HTTP 429s tolerated per request before giving up
+
+# --- RESPONSE CACHE ---
+# Raw API responses are kept on disk so reruns (and --replay) skip the network entirely.
+CACHE_FILE = ".wiki_cache.sqlite"
+CACHE_TTL_HOURS = 24 * 20  # Comfortably inside the monthly rebuild cadence
+CACHE_MAX_MB = 512
+
+# --- ALIAS CACHE ---
+ALIAS_CACHE_FILE = ".alias_cache.json"
+ALIAS_TTL_DAYS = 60             # Redirects rarely change; re-check them every couple of builds
+ALIAS_CACHE_MAX_ENTRIES = 50000
+
+# --- INCREMENTAL BUILDS ---
+RECENT_CHANGES_MAX_DAYS = 90  # MediaWiki's default $wgRCMaxAge; older builds need a full crawl
+CARGO_IN_BATCH = 50           # Values per `field IN (...)` refetch query, which keeps the URL short
+
+# --- SPRITES & ATLASES ---
+SPRITES_DIR = "sprites"                # Where sprites.py saves the icons generate_image_url points at
+SPRITE_ALIAS_FILE = "sprites-aliases.json"  # Duplicate sprite file -> canonical copy, written by sprites.py
+ATLAS_DIR = "sprites/atlas"
+ATLAS_MAP_FILE = "sprites/atlas/atlas.json"  # item id -> [atlas index, x, y, w, h] (+ .gz)
+ATLAS_GROUP_BY = "category"            # "category" or "id", same keys as --shards
+ATLAS_MAX_SIZE = 2048                  # Atlas side in px; WebGL/mobile-safe
+ATLAS_MAX_SPRITE_SIZE = 256            # Larger sprites (boss portraits) keep their own file
+ATLAS_PADDING = 1                      # Transparent gap that stops neighbours bleeding when scaled
+ATLAS_PALETTE_COLORS = 256             # Sheets whose sprites share this many RGBA colours are saved as palette PNGs
+
+# --- INSTRUMENTATION ---
+METRICS_FILE = "terraria_items.metrics.json"  # Per-stage timings, request stats and Step 4 filter counts of the last run
+PROFILE_DIR = "profiles"                       # --profile output: <stage>.prof (cProfile) or <stage>.tracemalloc.txt
+PROFILE_TOP = 25                               # Functions / allocation sites listed per profiled stage
+
+# --- CHECKPOINTS ---
+CHECKPOINT_FILE = "terraria_items.checkpoint.json"  # Partial full-crawl state, read by --resume
+CHECKPOINT_INTERVAL_SECONDS = 30  # Minimum gap between mid-stage checkpoint writes
+
+# --- THE ULTIMATE CATEGORY MAP (Layer 1: Category API) ---
+CATEGORY_MAP = {
+    # ⚔️ Melee Weapons
+    "Broadswords": "Sword",
+    "Shortswords": "Sword",
+    "Yoyos": "Yoyo",
+    "Spears": "Spear",
+    "Boomerangs": "Boomerang",
+    "Flails": "Flail",
+    "Whips": "Whip",
+    "Other melee weapons": "Melee Weapon",
+    
+    # 🏹 Ranged Weapons
+    "Bows": "Bow",
+    "Repeaters": "Repeater",
+    "Guns": "Gun",
+    "Launchers": "Launcher",
+    "Consumable ranged weapons": "Consumable Ranged",
+    "Other ranged weapons": "Ranged Weapon",
+    
+    # 🔮 Magic Weapons
+    "Magic weapons": "Magic Weapon",
+    "Wands": "Wand",
+    "Magic guns": "Magic Gun",
+    "Spell tomes": "Spell Tome",
+    
+    # 👻 Summon Weapons
+    "Minion summon items": "Minion Summon",
+    "Sentry summon items": "Sentry Summon",
+    
+    # ⛏️ Tools
+    "Pickaxes": "Pickaxe",
+    "Axes": "Axe",
+    "Hammers": "Hammer",
+    "Hamaxes": "Hamaxe",
+    "Chainsaws": "Chainsaw",
+    "Drills": "Drill",
+    "Fishing poles": "Fishing Pole",
+    "Grappling hooks": "Grappling Hook",
+    "Wiring tools": "Wiring Tool",
+    "Painting tools": "Painting Tool",
+    
+    # 🛡️ Armor & Vanity
+    "Head armor": "Head Armor",
+    "Body armor": "Body Armor",
+    "Leg armor": "Leg Armor",
+    "Vanity items": "Vanity",
+    "Vanity accessories": "Vanity Accessory",
+    
+    # 💍 Accessories
+    "Accessory items": "Accessory",
+    "Wings": "Wings",
+    "Shields": "Shield",
+    "Boots": "Boots",
+    "Informational accessories": "Informational Accessory",
+    "Combat accessories": "Combat Accessory",
+    "Movement accessories": "Movement Accessory",
+    "Health and Mana accessories": "Health/Mana Accessory",
+    "Construction accessories": "Construction Accessory",
+    "Fishing accessories": "Fishing Accessory",
+    "Music Boxes": "Music Box",
+    
+    # 🧪 Consumables / Materials
+    "Potion items": "Potion",
+    "Food items": "Food",
+    "Ammunition items": "Ammo",
+    "Arrows": "Arrow",
+    "Bullets": "Bullet",
+    "Rockets": "Rocket",
+    "Darts": "Dart",
+    "Dye items": "Dye",
+    "Paints": "Paint",
+    "Flasks": "Flask",
+    "Hair dyes": "Hair Dye",
+    "Material items": "Material",
+    "Bait items": "Bait",
+    
+    # 🐟 Nature & Wildlife
+    "Fish": "Fish",
+    "Quest fish": "Quest Fish",
+    "Critters": "Critter",
+    "Seeds": "Seed",
+    "Plants": "Plant",
+    
+    # 💎 Materials & Mining
+    "Ores": "Ore",
+    "Bars": "Bar",
+    "Gems": "Gem",
+    
+    # 🐶 Summons, Pets & Bags
+    "Boss summon items": "Boss Summon",
+    "Event summon items": "Event Summon",
+    "Pet summon items": "Pet",
+    "Light pet summon items": "Light Pet",
+    "Mount summon items": "Mount",
+    "Minecarts": "Minecart",
+    "Treasure Bags": "Treasure Bag",
+    "Crates": "Crate",
+    "Grab bags": "Grab Bag",
+    
+    # 🧱 World Building & Furniture
+    "Block items": "Block",
+    "Wall items": "Wall",
+    "Furniture items": "Furniture",
+    "Crafting stations": "Crafting Station",
+    "Light sources": "Light Source",
+    "Doors": "Door",
+    "Chairs": "Chair",
+    "Tables": "Table",
+    "Beds": "Bed",
+    "Chests": "Chest",
+    "Banners": "Banner",
+    "Trophies": "Trophy",
+    "Statues": "Statue",
+    "Paintings": "Painting",
+    "Mechanisms": "Mechanism",
+    "Traps": "Trap",
+    "Wire items": "Wire",
+    
+    # 🔑 Misc
+    "Keys": "Key",
+    "Golf clubs": "Golf Club",
+    "Kites": "Kite",
+    "Quest items": "Quest Item",
+    "Souls": "Soul",
+    "Developer items": "Developer Item",
+    "Unobtainable items": "Unobtainable"
+}
+
+# --- THE HEURISTIC SAFETY NET (Layer 2: Generic Type Inference) ---
+# Maps reliable Cargo generic_types to our clean specific_type tags.
+GENERIC_FALLBACK_MAP = {
+    "Mount summon": "Mount",
+    "Pet summon": "Pet",
+    "Light pet summon": "Light Pet",
+    "Food": "Food",
+    "Potion": "Potion",
+    "Ammunition": "Ammo",
+    "Dye": "Dye",
+    "Hook": "Grappling Hook",
+    "Minecart": "Minecart",
+    "Boss summon": "Boss Summon",
+    "Event summon": "Event Summon",
+    "Block": "Block",
+    "Wall": "Wall",
+    "Material": "Material",
+    "Accessory": "Accessory",
+    "Armor": "Armor",
+    "Furniture": "Furniture",
+    "Weapon": "Weapon",
+    "Tool": "Tool",
+    "Key": "Key",
+    "Ore": "Ore",
+    "Bar": "Bar",
+    "Coin": "Coin",
+    "Gem": "Gem",
+    "Fish": "Fish",
+    "Quest Fish": "Quest Fish",
+    "Critter": "Critter",
+    "Seed": "Seed"
+}
+
+# --- THE DETECTIVE RULES (Layer 3: Name Inference) ---
+# Only consulted when neither the Category API nor GENERIC_FALLBACK_MAP produced a tag.
+# The lowest priority that matches wins. A rule matches when the lowercase name contains
+# any of its keywords and every optional gate holds:
+#   damage_class  -> exact lowercase damage class
+#   stat          -> this stats key must be non-zero
+#   generic_any   -> at least one of these lowercase generic_types
+#   generic_none  -> none of these lowercase generic_types
+INFERENCE_RULES = [
+    # Tools win regardless of generic type
+    {"priority": 10, "type": "Pickaxe", "keywords": ["pickaxe"]},
+    {"priority": 20, "type": "Hamaxe", "keywords": ["hamaxe"]},
+    {"priority": 30, "type": "Chainsaw", "keywords": ["chainsaw"]},
+    {"priority": 40, "type": "Drill", "keywords": ["drill"]},
+    {"priority": 50, "type": "Axe", "keywords": ["axe"], "stat": "axe"},
+    {"priority": 60, "type": "Hammer", "keywords": ["hammer"], "stat": "hammer"},
+    {"priority": 70, "type": "Fishing Pole", "keywords": ["fishing pole"]},
+
+    # Weapons
+    {"priority": 100, "type": "Whip", "keywords": ["whip"], "damage_class": "summon", "generic_any": ["weapon"]},
+    {"priority": 110, "type": "Minion Summon", "keywords": ["staff"], "damage_class": "summon", "generic_any": ["weapon"]},
+    {"priority": 120, "type": "Wand", "keywords": ["staff"], "generic_any": ["weapon"]},
+    {"priority": 130, "type": "Sword", "keywords": ["sword", "blade", "saber", "katana", "scimitar", "claymore"], "generic_any": ["weapon"]},
+    {"priority": 140, "type": "Bow", "keywords": ["bow"], "damage_class": "ranged", "generic_any": ["weapon"]},
+    {"priority": 150, "type": "Gun", "keywords": ["gun"], "damage_class": "ranged", "generic_any": ["weapon"]},
+    {"priority": 160, "type": "Yoyo", "keywords": ["yoyo"], "generic_any": ["weapon"]},
+    {"priority": 170, "type": "Spear", "keywords": ["spear", "lance", "pike", "trident", "halberd"], "generic_any": ["weapon"]},
+
+    # Armor & Vanity (weapons never fall through to these)
+    {"priority": 200, "type": "Head Armor", "keywords": ["helmet", "headgear", "mask", "hat", "hood", "cap", "crown", "goggles", "helm"], "generic_any": ["armor", "vanity"], "generic_none": ["weapon"]},
+    {"priority": 210, "type": "Body Armor", "keywords": ["breastplate", "shirt", "robe", "chainmail", "tunic", "chestplate", "suit", "armor"], "generic_any": ["armor", "vanity"], "generic_none": ["weapon"]},
+    {"priority": 220, "type": "Leg Armor", "keywords": ["leggings", "greaves", "pants", "boots"], "generic_any": ["armor", "vanity"], "generic_none": ["weapon"]},
+
+    # Everything else (weapons and armor never fall through to these)
+    {"priority": 300, "type": "Potion", "keywords": ["potion", "flask", "brew"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 310, "type": "Dye", "keywords": ["dye"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 320, "type": "Arrow", "keywords": ["arrow"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 330, "type": "Bullet", "keywords": ["bullet"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 340, "type": "Fish", "keywords": ["fish", "koi", "trout", "salmon", "bass", "jellyfish", "tuna", "minnow"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 350, "type": "Seed", "keywords": ["seed", "spore"], "generic_none": ["weapon", "armor", "vanity"]},
+    {"priority": 360, "type": "Crate", "keywords": ["crate"], "generic_none": ["weapon", "armor", "vanity"]},
+]
+
+ALIAS_CACHE = {}
+ALIAS_RESOLVED_AT = {}  # name -> epoch seconds when ALIAS_CACHE[name] was confirmed
+SPRITE_ALIASES = {}     # sprite file name -> the byte-identical file actually stored, see load_sprite_aliases
+
+# ==========================================
+# COMPILED CLASSIFIER
+# ==========================================
+
+class InferenceEngine:
+    """INFERENCE_RULES compiled into one Aho-Corasick automaton plus an integer bitmask per rule.
+
+    Walking the lowercase name through the automaton once yields a bitmask of every keyword
+    it contains (overlaps included, so "pickaxe" also reports "axe"). The cost depends on
+    the name length, not on how many keywords the table has. Rules are then checked in
+    priority order with one AND per rule.
+    """
+
+    def __init__(self, rules: list):
+        keywords = sorted({kw for rule in rules for kw in rule["keywords"]})
+        bits = {kw: 1 << i for i, kw in enumerate(keywords)}
+
+        # Trie of all keywords; `outputs[state]` holds the bits of keywords ending there.
+        trie, outputs = [{}], [0]
+        for kw in keywords:
+            state = 0
+            for char in kw:
+                if char not in trie[state]:
+                    trie.append({})
+                    outputs.append(0)
+                    trie[state][char] = len(trie) - 1
+                state = trie[state][char]
+            outputs[state] |= bits[kw]
+
+        # Breadth-first pass adds failure links and flattens them into a full transition
+        # table (a DFA), so matching needs exactly one dict lookup per character.
+        alphabet = set("".join(keywords))
+        transitions, fail = [{} for _ in trie], [0] * len(trie)
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            for char in alphabet:
+                if char in trie[state]:
+                    child = trie[state][char]
+                    fail[child] = transitions[fail[state]].get(char, 0) if state else 0
+                    outputs[child] |= outputs[fail[child]]
+                    transitions[state][char] = child
+                    queue.append(child)
+                elif state and transitions[fail[state]].get(char, 0):
+                    transitions[state][char] = transitions[fail[state]][char]
+        self._transitions, self._outputs = transitions, outputs
+
+        self._rules = [
+            (
+                sum(bits[kw] for kw in rule["keywords"]),
+                rule["type"],
+                rule.get("damage_class"),
+                rule.get("stat"),
+                frozenset(rule.get("generic_any", ())),
+                frozenset(rule.get("generic_none", ())),
+            )
+            for rule in sorted(rules, key=lambda r: r["priority"])
+        ]
+
+    def keyword_mask(self, text: str) -> int:
+        transitions, outputs, state, hits = self._transitions, self._outputs, 0, 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if state: hits |= outputs[state]
+        return hits
+
+    def classify(self, item: dict) -> str | None:
+        hits = self.keyword_mask(item["name"].lower())
+        if not hits: return None
+
+        dmg_class = item.get("damage_class", "").lower()
+        g_types_lower = {t.lower() for t in item["generic_types"]}
+        for mask, specific_type, damage_class, stat, generic_any, generic_none in self._rules:
+            if not hits & mask: continue
+            if damage_class is not None and damage_class != dmg_class: continue
+            if stat is not None and not item["stats"].get(stat): continue
+            if generic_any and not generic_any & g_types_lower: continue
+            if generic_none & g_types_lower: continue
+            return specific_type
+        return None
+
+DETECTIVE = InferenceEngine(INFERENCE_RULES)
+
+# ==========================================
+# INSTRUMENTATION
+# ==========================================
+# Every request, merge and Step 4 filter decision is charged to the stage running it.
+# The current stage lives in a ContextVar. Worker pools wrap their callables in
+# charged_to_stage, so page fetches made on behalf of a stage are counted under it.
+
+CURRENT_STAGE = contextvars.ContextVar("CURRENT_STAGE", default="main")
+PROFILE_STAGES = set()   # Stage names to profile, from --profile
+PROFILE_MODE = "cpu"     # "cpu" (cProfile) or "memory" (tracemalloc), from --profile-mode
+
+def charged_to_stage(fn):
+    """Wraps `fn` for pool.submit / pool.map so its requests and CPU time count toward the caller's stage."""
+    stage = CURRENT_STAGE.get()
+
+    def run(*args):
+        token, cpu_start = CURRENT_STAGE.set(stage), time.thread_time()
+        try:
+            return fn(*args)
+        finally:
+            METRICS.add(cpu_s=time.thread_time() - cpu_start)
+            CURRENT_STAGE.reset(token)
+    return run
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))] if sorted_values else 0.0
+
+class PipelineMetrics:
+    """Thread-safe per-stage counters, written to METRICS_FILE at the end of a build.
+
+    Per stage: wall and CPU time, requests (with cache hits, bytes, latency percentiles,
+    rate-limiter waits, urllib3 retries and 429s), JSON decode and row-merge time, and
+    named counters such as the Step 4 recipe filters. CPU time is the stage thread's own
+    plus what its pool workers spent inside WikiClient.get.
+    """
+    FIELDS = ("wall_s", "cpu_s", "requests", "cache_hits", "bytes", "rate_limit_wait_s", "retries", "http_429", "json_decode_s", "parse_s")
+
+    def __init__(self):
+        self.stages = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._profilers = {}
+
+    def _stage(self, name: str) -> dict:
+        if name not in self.stages:
+            self.stages[name] = {**dict.fromkeys(self.FIELDS, 0), "counters": {}}
+            self._latencies[name] = []
+        return self.stages[name]
+
+    def add(self, **amounts):
+        """Adds to the current stage's fields, e.g. add(parse_s=0.2, bytes=512)."""
+        with self._lock:
+            stage = self._stage(CURRENT_STAGE.get())
+            for field, amount in amounts.items():
+                stage[field] += amount
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            counters = self._stage(CURRENT_STAGE.get())["counters"]
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def request(self, latency_s: float, nbytes: int, retries: int = 0):
+        with self._lock:
+            name = CURRENT_STAGE.get()
+            stage = self._stage(name)
+            stage["requests"] += 1
+            stage["bytes"] += nbytes
+            stage["retries"] += retries
+            self._latencies[name].append(latency_s)
+
+    def begin(self, name: str):
+        """Charges everything in the current context to `name` until end(). Returns the token for end()."""
+        token = CURRENT_STAGE.set(name)
+        with self._lock:
+            self._stage(name)
+        if name in PROFILE_STAGES:
+            self._start_profile(name)
+        return token, time.monotonic(), time.thread_time()
+
+    def end(self, began):
+        token, wall_start, cpu_start = began
+        name = CURRENT_STAGE.get()
+        if name in self._profilers:
+            self._stop_profile(name)
+        self.add(wall_s=time.monotonic() - wall_start, cpu_s=time.thread_time() - cpu_start)
+        CURRENT_STAGE.reset(token)
+
+    def run(self, name: str, fn):
+        """Runs fn() as stage `name`."""
+        began = self.begin(name)
+        try:
+            return fn()
+        finally:
+            self.end(began)
+
+    def _start_profile(self, name: str):
+        if PROFILE_MODE == "memory":
+            started_here = not tracemalloc.is_tracing()
+            if started_here: tracemalloc.start(10)
+            self._profilers[name] = ("memory", tracemalloc.take_snapshot(), started_here)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # Another stage's profiler already owns the interpreter
+            print(f"  [Profile] Skipped {name}: {e}")
+            return
+        self._profilers[name] = ("cpu", profiler, False)
+
+    def _stop_profile(self, name: str):
+        mode, profiler, started_here = self._profilers.pop(name)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if mode == "cpu":
+            profiler.disable()
+            path = os.path.join(PROFILE_DIR, f"{name}.prof")
+            profiler.dump_stats(path)
+            print(f"\n[Profile] {name}: top {PROFILE_TOP} functions by cumulative time (full profile: {path})")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            return
+        # tracemalloc is process-wide: allocations by stages running alongside are included.
+        top = tracemalloc.take_snapshot().compare_to(profiler, "lineno")[:PROFILE_TOP]
+        if started_here: tracemalloc.stop()
+        path = os.path.join(PROFILE_DIR, f"{name}.tracemalloc.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(str(stat) for stat in top) + "\n")
+        print(f"\n[Profile] {name}: top {min(5, len(top))} allocation sites (full list: {path})")
+        for stat in top[:5]:
+            print(f"  {stat}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                latencies = sorted(self._latencies[name])
+                stages[name] = {**{field: round(value, 4) if isinstance(value, float) else value for field, value in stage.items() if field != "counters"},
+                                "latency_ms": {label: round(percentile(latencies, q) * 1000, 1) for label, q in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]},
+                                "counters": dict(sorted(stage["counters"].items()))}
+            return stages
+
+    def write(self, path: str = METRICS_FILE, **run_info):
+        """Writes {"run": run_info, "stages": summary()} atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"run": run_info, "stages": self.summary()}, f, indent=2)
+        os.replace(tmp_path, path)
+
+METRICS = PipelineMetrics()
+
+# ==========================================
+# RATE LIMITING & CONCURRENT PAGING
+# ==========================================
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every wiki request. Halves its rate on HTTP 429."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def penalize(self, retry_after: float | None = None):
+        """Backs off after a 429: pauses every caller and halves the sustained rate."""
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            self._tokens = 0
+
+    def reward(self):
+        """Slowly restores the configured rate after successful requests."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * 1.05)
+
+class CacheMiss(KeyError):
+    """Raised in --replay mode when a request has no cached response."""
+
+class ResponseCache:
+    """SQLite-backed store of raw API responses keyed by the normalized request params.
+
+    Entries older than `ttl_hours` count as misses (except in replay mode, which serves
+    whatever was recorded), and the least recently used rows are evicted once the stored
+    bodies exceed `max_mb`.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, ttl_hours: float = CACHE_TTL_HOURS, max_mb: float = CACHE_MAX_MB, replay: bool = False):
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.replay = replay
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, params TEXT, body TEXT, fetched_at REAL, last_used REAL, size INTEGER)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def normalize(params: dict) -> str:
+        return json.dumps({str(k): str(v) for k, v in params.items()}, sort_keys=True, ensure_ascii=False)
+
+    def _key(self, params: dict) -> str:
+        return hashlib.sha256((API_URL + "?" + self.normalize(params)).encode("utf-8")).hexdigest()
+
+    def get(self, params: dict) -> dict | None:
+        key, now = self._key(params), time.time()
+        with self._lock:
+            row = self._db.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if not row or (not self.replay and now - row[1] > self.ttl):
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, params: dict, body: str):
+        key, now, size = self._key(params), time.time(), len(body.encode("utf-8"))
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, self.normalize(params), body, now, now, size))
+            self._total += size - (old[0] if old else 0)
+            while self._total > self.max_bytes:
+                victim = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+                if not victim or victim[0] == key: break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (victim[0],))
+                self._total -= victim[1]
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+def create_session(pool_size: int = 10) -> "requests.Session":
+    # Deferred so importing the package, and every command that never touches the network, starts instantly.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # 429 is left out of the retry adapter on purpose so the shared TokenBucket sees it.
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)  # A local fake-wiki-server.py
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+class WikiClient:
+    """Bundles the HTTP session, the shared rate limiter and the optional response cache."""
+
+    def __init__(self, session=None, limiter: TokenBucket | None = None, cache: ResponseCache | None = None):
+        self.session = session if session is not None else create_session()
+        self.limiter = limiter or TokenBucket(REQUESTS_PER_SECOND)
+        self.cache = cache
+
+    def get(self, params: dict, timeout: int = 10) -> dict:
+        """Single choke point for wiki API calls: cache first, then a rate-limited GET."""
+        if self.cache:
+            cached = self.cache.get(params)
+            if cached is not None:
+                METRICS.add(cache_hits=1)
+                return cached
+            if self.cache.replay:
+                raise CacheMiss(f"No cached response for {ResponseCache.normalize(params)}")
+
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            queued = time.monotonic()
+            self.limiter.acquire()
+            sent = time.monotonic()
+            resp = self.session.get(API_URL, params=params, timeout=timeout)
+            retry_history = getattr(getattr(getattr(resp, "raw", None), "retries", None), "history", None) or ()
+            METRICS.request(time.monotonic() - sent, len(resp.content), len(retry_history))
+            METRICS.add(rate_limit_wait_s=sent - queued)
+            if resp.status_code == 429:
+                METRICS.add(http_429=1)
+                retry_after = resp.headers.get("Retry-After", "")
+                self.limiter.penalize(float(retry_after) if retry_after.isdigit() else None)
+                continue
+            self.limiter.reward()
+            decode_start = time.monotonic()
+            data_json = resp.json()
+            METRICS.add(json_decode_s=time.monotonic() - decode_start)
+            # Error payloads are never cached so the next run asks again.
+            if self.cache and resp.status_code == 200 and "error" not in data_json:
+                self.cache.put(params, resp.text)
+            return data_json
+        raise RuntimeError(f"Still rate limited after {MAX_RATE_LIMIT_RETRIES} retries: {params}")
+
+def cargo_row_count(client: WikiClient, base_params: dict) -> int | None:
+    """Rows the query would page through (one COUNT(*) request), or None when the wiki cannot say."""
+    params = {key: value for key, value in base_params.items() if key != "fields"}
+    try:
+        resp = client.get({**params, "fields": "COUNT(*)=rows", "format": "json"})
+        return int(resp["cargoquery"][0]["title"]["rows"])
+    except (KeyError, IndexError, TypeError, ValueError):  # An error payload, or a CacheMiss under --replay
+        return None
+
+def iter_cargo_pages(client: WikiClient, base_params: dict, workers: int = 1, page_size: int = CARGO_PAGE_SIZE, start: int = 0):
+    """Yields (offset, response_json) for a cargoquery table in offset order, beginning at `start`.
+
+    A page shorter than `page_size` is the last one. With several workers the row count
+    is asked first, so exactly the offsets up to it are fetched concurrently and no
+    request lands past the end of the table. If the table grew since the count, paging
+    continues one page at a time until a short page. Pages are always handed back in
+    order, so callers merge exactly as a sequential crawl would. API error payloads are
+    yielded for the caller to inspect.
+    """
+    workers = max(1, workers)
+    end = cargo_row_count(client, base_params) if workers > 1 else None
+
+    def fetch_page(offset):
+        return client.get({**base_params, "limit": page_size, "offset": offset, "format": "json"})
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending, next_offset = {}, start
+        try:
+            while True:
+                while len(pending) < workers and (end is None or next_offset < end or not pending):
+                    pending[next_offset] = pool.submit(charged_to_stage(fetch_page), next_offset)
+                    next_offset += page_size
+                offset = min(pending)
+                data_json = pending.pop(offset).result()
+                if "error" not in data_json and not data_json.get("cargoquery"):
+                    return
+                yield offset, data_json
+                if "error" not in data_json and len(data_json["cargoquery"]) < page_size:
+                    return
+        finally:
+            for future in pending.values():
+                future.cancel()
+
+# ==========================================
+# HELPER FUNCTIONS
+# ==========================================
+
+def load_alias_cache(path: str = ALIAS_CACHE_FILE):
+    """Fills ALIAS_CACHE from disk, skipping entries older than ALIAS_TTL_DAYS and malformed ones."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"[Alias Cache] Starting empty ({e}).")
+        return
+    if not isinstance(stored, dict):
+        print(f"[Alias Cache] Starting empty ({path} does not hold an object).")
+        return
+    cutoff, malformed = time.time() - ALIAS_TTL_DAYS * 86400, 0
+    for name, entry in stored.items():
+        # [canonical name, epoch seconds], as save_alias_cache writes it; anything else is skipped.
+        if not (isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], str)
+                and isinstance(entry[1], (int, float)) and not isinstance(entry[1], bool)):
+            malformed += 1
+            continue
+        canonical, resolved_at = entry
+        if resolved_at >= cutoff:
+            ALIAS_CACHE[name], ALIAS_RESOLVED_AT[name] = canonical, resolved_at
+    print(f"[Alias Cache] Loaded {len(ALIAS_CACHE)} of {len(stored)} stored aliases"
+          f"{f', skipped {malformed} malformed' if malformed else ''}.")
+
+def load_sprite_aliases(path: str = SPRITE_ALIAS_FILE):
+    """Fills SPRITE_ALIASES from the downloader's content-hash dedup, so duplicates share one file."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            SPRITE_ALIASES.update(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    print(f"[Sprites] {len(SPRITE_ALIASES)} duplicate sprites resolve to a shared file.")
+
+def save_alias_cache(path: str = ALIAS_CACHE_FILE):
+    """Writes the newest ALIAS_CACHE_MAX_ENTRIES confirmed aliases back to disk."""
+    newest = sorted(ALIAS_RESOLVED_AT.items(), key=lambda kv: kv[1], reverse=True)[:ALIAS_CACHE_MAX_ENTRIES]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({name: [ALIAS_CACHE[name], resolved_at] for name, resolved_at in newest}, f, ensure_ascii=False)
+
+def resolve_canonical_names(client: WikiClient, names, batch_size: int = 50, workers: int = 1) -> dict:
+    """Resolves many titles to their canonical page names, 50 per query, following normalized/redirect chains.
+
+    Up to `workers` batches are in flight at once; the answers are merged in batch order.
+    Results are memoized in ALIAS_CACHE. A batch that fails (a network error or an API
+    error payload) raises StageAborted("aliases") once the other batches are cached, so a
+    build never publishes names that were never checked and the next run only asks again
+    for the failed ones.
+    """
+    pending = sorted({n for n in names if n and n not in ALIAS_CACHE})
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+
+    def fetch_batch(batch):
+        params = {"action": "query", "titles": "|".join(batch), "redirects": 1, "format": "json"}
+        try:
+            return client.get(params, timeout=5)
+        except Exception as e:
+            # SECURITY FIX: Caught explicit exception instead of bare 'except:'
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        answers = list(zip(batches, pool.map(charged_to_stage(fetch_batch), batches)))
+    failures = []
+    for batch, resp in answers:
+        if isinstance(resp, Exception):
+            failures.append(f"{len(batch)} names starting at {batch[0]}: {resp}")
+            continue
+        # An API error payload (maxlag, readonly) is a failed batch too, not "every name is canonical".
+        if "error" in resp or "query" not in resp:
+            reason = resp["error"].get("info") if "error" in resp else "no query result"
+            failures.append(f"{len(batch)} names starting at {batch[0]}: {reason}")
+            continue
+        query = resp["query"]
+
+        normalized = {n["from"]: n["to"] for n in query.get("normalized", [])}
+        redirects = {r["from"]: r["to"] for r in query.get("redirects", [])}
+        now = time.time()
+        for name in batch:
+            canonical, seen = normalized.get(name, name), set()
+            while canonical in redirects and canonical not in seen:
+                seen.add(canonical)
+                canonical = redirects[canonical]
+            if canonical != normalized.get(name, name):
+                print(f"    [Alias Resolved] {name} -> {canonical}")
+            ALIAS_CACHE[name], ALIAS_RESOLVED_AT[name] = canonical, now
+    if failures:
+        for failure in failures:
+            print(f"    [Alias Resolution Failed] {failure}")
+        raise StageAborted("aliases", None, f"{len(failures)} of {len(batches)} alias batches failed, first: {failures[0]}")
+    return {n: ALIAS_CACHE.get(n, n) for n in names}
+
+def resolve_canonical_name(client: WikiClient, name: str) -> str:
+    return resolve_canonical_names(client, [name])[name]
+
+def generate_wiki_url(item_name: str) -> str:
+    formatted_name = item_name.replace(" ", "_")
+    return f"https://terraria.wiki.gg/wiki/{urllib.parse.quote(formatted_name, safe='')}"
+
+def generate_image_url(item_name: str, resolve_alias: bool = True) -> str:
+    # 1. Replace spaces with underscores
+    raw_name = item_name.replace(" ", "_") + ".png"
+    
+    # 2. Replicate the strict whitelist using Regex
+    # This strips out ', (, ), and any other symbols not in the whitelist
+    sanitized = re.sub(r'[^a-zA-Z0-9_\-\.]', '', raw_name)
+    
+    # 3. Fallback for edge cases where the name is completely stripped
+    if not sanitized or sanitized == ".png":
+        sanitized = "unknown_file.png"
+        
+    # 4. Byte-identical sprites are stored once (sprites.py content-hash dedup)
+    if resolve_alias:
+        sanitized = SPRITE_ALIASES.get(sanitized, sanitized)
+
+    # 5. Route to the local directory
+    return f"/{SPRITES_DIR}/{sanitized}"
+
+# ==========================================
+# ROW PARSERS (shared by full and incremental builds)
+# ==========================================
+
+# _pageName is kept on every table so an incremental build can tell which items a changed page fed.
+ITEM_FIELDS = "_pageName,itemid,name,tooltip,damage,knockback,defense,usetime,velocity,rare,hardmode,type,damagetype,buy,sell,axe,hammer"
+RECIPE_FIELDS = "_pageName,resultid,station,ings,args"
+DROP_FIELDS = "_pageName, item, name, rate"
+
+# Recipes rows whose args carry any of these are legacy / non-desktop variants
+RECIPE_BAD_FLAGS = ["removed", "historical", "obsolete", "deprecated", "legacy", "old=", "former", "unobtainable", "desktop=n", "desktop=false", "desktop=0", "pc=n", "pc=false", "pc=0"]
+RECIPE_VERSION_PIN = re.compile(r'(?:version|patch)[=:\s\'"]+[0-9]+\.[0-9]+')
+RECIPE_VERSION_OFF = re.compile(r'\b[0-9]+\.[0-9]+(?:\.[0-9]+)?\s*=\s*(?:n|false|0)\b')
+
+def build_item_payload(data: dict) -> tuple[str, ItemRecord] | None:
+    """Turns one Items cargo row into (item_id, record), or None when the row has no numeric id."""
+    item_id = data.get("itemid", "")
+    if not item_id.isdigit(): return None
+
+    name = sanitize_text(data.get("name", ""))
+    stats = {}
+    
+    numeric_keys = ["damage", "knockback", "defense", "usetime", "velocity", "buy", "sell", "axe", "hammer", "rare"]
+    for key in numeric_keys:
+        if data.get(key):
+            val = parse_numeric_stat(data.get(key))
+            if val is not None:
+                if key == "rare": stats["rarity"] = int(val)
+                else: stats[key] = val
+    
+    raw_type = sanitize_text(data.get("type", ""))
+    generic_types = [t.strip().capitalize() for t in raw_type.split('^') if t.strip()]
+
+    item_payload = ItemRecord(
+        id=int(item_id),
+        name=name,
+        description=sanitize_text(data.get("tooltip", "")) or "N/A",
+        url=generate_wiki_url(name),
+        image_url=generate_image_url(name),
+        generic_types=generic_types,
+        specific_type=None, 
+        damage_class=sanitize_text(data.get("damagetype", "")),
+        stats=stats,
+        crafting={ "is_craftable": False, "recipes": [] },
+        acquisition=[] 
+    )
+    if data.get("_pageName"): item_payload.page = sys.intern(data["_pageName"])
+    
+    if data.get("hardmode"):
+        hm_raw = str(data.get("hardmode", "")).strip().lower()
+        item_payload.hardmode = hm_raw in ["1", "true", "yes"]
+
+    return item_id, item_payload
+
+def infer_specific_type(item: dict):
+    """Step 3 for a single item: generic-type fallback, name-based detective work, then the catch-all."""
+    if item["specific_type"]: return
+
+    for g_type in item["generic_types"]:
+        if g_type in GENERIC_FALLBACK_MAP:
+            item["specific_type"] = GENERIC_FALLBACK_MAP[g_type]
+            break 
+            
+    # Layer B: Detective Inference (Tools, Weapons, Armor, etc.) from the compiled rule table
+    if not item["specific_type"]:
+        item["specific_type"] = DETECTIVE.classify(item)
+    
+    # Layer C: The Universal Catch-All
+    if not item["specific_type"]:
+        item["specific_type"] = item["generic_types"][0] if item["generic_types"] else "Item"
+
+def infer_blank_types(items_db: ItemStore) -> int:
+    """Step 3 for every item the wiki left without a specific_type; returns how many were filled."""
+    blank = [item_id for item_id, item in items_db.items() if not item["specific_type"]]
+    for item_id in blank:
+        infer_specific_type(items_db[item_id])
+    items_db.inferred_ids.update(blank)
+    return len(blank)
+
+def add_recipe_row(items_db: ItemStore, data: dict):
+    """Step 4 for a single Recipes row: drops legacy/non-desktop variants and de-duplicates by signature."""
+    rid = data.get("resultid", "")
+    if rid not in items_db: return METRICS.count("recipe_rows.filtered.unknown_result")
+    items_db.note_source_page(rid, data.get("_pageName"))
+
+    page_name, args_lower = str(data.get("_pageName", "")).lower(), str(data.get("args", "")).lower()
+    station = sanitize_text(data.get("station", "By Hand"))
+    
+    if "legacy:" in page_name or "#i:old" in args_lower: return METRICS.count("recipe_rows.filtered.legacy")
+    if any(flag in args_lower for flag in RECIPE_BAD_FLAGS): return METRICS.count("recipe_rows.filtered.bad_flag")
+    if RECIPE_VERSION_PIN.search(args_lower): return METRICS.count("recipe_rows.filtered.version_pin")
+    if RECIPE_VERSION_OFF.search(args_lower): return METRICS.count("recipe_rows.filtered.version_off")
+    
+    resolved_ings = parse_ingredients(data.get("ings", ""))
+    if not resolved_ings: return METRICS.count("recipe_rows.filtered.no_ingredients")
+    
+    version = "Legacy" if ("old-gen" in args_lower or "3ds" in args_lower) else "Console" if "console" in args_lower else "Desktop"
+    kept = items_db.add_recipe(rid, {
+        "station": station,
+        "ingredients": resolved_ings,
+        "version": version,
+        "transmutation": "extractinator" in station.lower() or "shimmer" in station.lower()
+    })
+    METRICS.count("recipe_rows.kept" if kept else "recipe_rows.filtered.duplicate")
+
+def add_drop_row(items_db: ItemStore, entry_data: dict):
+    """Step 5 for a single Drops row: attaches the source to the dropped item once."""
+    item_name = sanitize_text(entry_data.get("item", "")).lower()
+    source_name = sanitize_text(entry_data.get("name", "")) 
+    rate = sanitize_text(entry_data.get("rate", ""))
+    
+    if item_name in items_db.name_index and source_name:
+        items_db.note_source_page(items_db.name_index[item_name], entry_data.get("_pageName"))
+        items_db.add_drop(items_db.name_index[item_name], {"type": "drop", "source": source_name, "rate": rate})
+
+def canonicalize_aliases(client: WikiClient, items_db: ItemStore, workers: int = 1):
+    """Rewrites ingredient names and drop sources that are wiki redirects to their canonical page names.
+
+    Ingredient names are only rewritten when the canonical name is a known item, so group
+    placeholders such as "Any Wood" are left alone.
+    """
+    name_index = items_db.name_index
+    unknown_ings = {ing["name"] for item in items_db.values() for recipe in item["crafting"]["recipes"]
+                    for ing in recipe["ingredients"] if ing["name"].lower() not in name_index}
+    canonical = resolve_canonical_names(client, unknown_ings | set(items_db.by_drop_source), workers=workers)
+
+    for item_id, item in items_db.items():
+        old_signatures = [items_db.recipe_signature(recipe) for recipe in item["crafting"]["recipes"]]
+        old_sources = [acq["source"] for acq in item["acquisition"]]
+        for recipe in item["crafting"]["recipes"]:
+            for ing in recipe["ingredients"]:
+                resolved = canonical.get(ing["name"], ing["name"])
+                if resolved.lower() in name_index:
+                    ing["name"] = resolved
+        for acq in item["acquisition"]:
+            acq["source"] = canonical.get(acq["source"], acq["source"])
+        # Aliases can collapse two sources (or two recipes) into one; re-adding de-duplicates them.
+        items_db.reindex(item_id, old_signatures, old_sources)
+
+def crawl_snapshot(items_db: ItemStore) -> dict:
+    """The payloads as crawled, page provenance included: Step 3 types blanked again, and no rollup or atlas fields.
+
+    These are the only fields the offline stages derive, so rerunning all of them on
+    the snapshot reproduces JSON_OUTPUT_FILE byte for byte.
+    """
+    snapshot = {}
+    for item_id, record in items_db.items():
+        payload = record.to_payload(internal=True)
+        if item_id in items_db.inferred_ids: payload["specific_type"] = None
+        payload.pop("sprite", None)
+        crafting = payload["crafting"] = {key: value for key, value in payload["crafting"].items() if key != "depth"}
+        crafting["recipes"] = [{key: value for key, value in recipe.items() if key != "raw_materials"} for recipe in crafting["recipes"]]
+        snapshot[item_id] = payload
+    return snapshot
+
+def save_database(items_db: ItemStore, write_crawl: bool = True):
+    """Step 6: evaluates craftability and writes the JSON database, plus the crawl snapshot unless told not to."""
+    print("\nStep 6/7: Evaluating Craftability...")
+    for item_data in items_db.values():
+        item_data["crafting"]["is_craftable"] = len(item_data["crafting"]["recipes"]) > 0
+
+    print(f"Saving to {JSON_OUTPUT_FILE}...")
+    with open(JSON_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(items_db.to_payloads(), f, indent=4, ensure_ascii=False)
+    if write_crawl:
+        with open(CRAWL_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(crawl_snapshot(items_db), f, indent=4, ensure_ascii=False)
+
+# ==========================================
+# BATCHED CATEGORIZATION
+# ==========================================
+
+def fetch_page_categories(client: WikiClient, titles, workers: int = 1, batch_size: int = 50) -> dict:
+    """Maps lowercase page title -> set of category names via prop=categories.
+
+    Titles are sent `batch_size` at a time (the API's multi-title limit), so the call count
+    scales with the number of items rather than with categories x pages. `normalized`
+    titles are mapped back to the names we asked for.
+    """
+    titles = sorted(set(titles))
+
+    def fetch_batch(batch):
+        batch_categories, continue_params = {}, {}
+        while True:
+            params = {"action": "query", "prop": "categories", "titles": "|".join(batch), "cllimit": "max", "format": "json", **continue_params}
+            resp = client.get(params)
+            if "error" in resp:
+                raise RuntimeError(resp["error"].get("info"))
+            query = resp.get("query", {})
+            requested = {n["to"]: n["from"] for n in query.get("normalized", [])}
+            for page in query.get("pages", {}).values():
+                title = requested.get(page.get("title", ""), page.get("title", ""))
+                page_cats = batch_categories.setdefault(title.lower(), set())
+                page_cats.update(c["title"].split(':', 1)[-1] for c in page.get("categories", []))
+            if "continue" not in resp: return batch_categories
+            continue_params = resp["continue"]
+
+    categories = {}
+    batches = [titles[start:start + batch_size] for start in range(0, len(titles), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch_categories in pool.map(charged_to_stage(fetch_batch), batches):
+            for title, page_cats in batch_categories.items():
+                categories.setdefault(title, set()).update(page_cats)
+    return categories
+
+def specific_type_from_categories(categories) -> str | None:
+    """Applies CATEGORY_MAP with Step 2's precedence: the last matching category in map order wins."""
+    specific_tag = None
+    for category_name, tag in CATEGORY_MAP.items():
+        if category_name in categories:
+            specific_tag = tag
+    return specific_tag
+
+# ==========================================
+# CHECKPOINTS & RESUME
+# ==========================================
+
+class StageAborted(RuntimeError):
+    """A stage stopped before the end of its table. The partial database must not be published.
+
+    next_offset is None for an incremental step, which has no resumable offset.
+    """
+
+    def __init__(self, stage: str, next_offset: int | None, reason):
+        super().__init__(f"stage '{stage}' aborted" + (f" at offset {next_offset}" if next_offset is not None else "") + f": {reason}")
+        self.stage, self.next_offset, self.reason = stage, next_offset, reason
+
+class Checkpoint:
+    """Durable state of a full crawl in progress, so --resume can pick up where it stopped.
+
+    For each stage it records a status and the next Cargo offset to fetch. The status is
+    "in_progress", "complete" (the end of the table was reached) or "aborted". It also
+    keeps the partial items_db. Writes go to a temp file first and are then swapped in
+    with os.replace, so a crash never leaves a torn checkpoint. Stages running concurrently
+    must hold `lock` whenever they mutate items_db, so every write sees a consistent store.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE, started_at: datetime | None = None, interval: float = CHECKPOINT_INTERVAL_SECONDS):
+        self.path, self.interval = path, interval
+        self.started_at = started_at or datetime.now(timezone.utc)
+        self.stages = {}
+        self.items_db = ItemStore()
+        self.lock = threading.RLock()
+        self._last_write = time.monotonic()
+
+    @classmethod
+    def load(cls, path: str = CHECKPOINT_FILE) -> "Checkpoint | None":
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            checkpoint = cls(path, datetime.fromisoformat(state["started_at"].replace("Z", "+00:00")))
+            checkpoint.stages = state["stages"]
+            checkpoint.items_db = ItemStore.from_payloads(state["items"])
+            checkpoint.items_db.inferred_ids.update(state.get("inferred", ()))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            print(f"[Resume] No usable checkpoint ({e}); starting a fresh crawl.")
+            return None
+        summary = ", ".join(f"{stage}={s['status']}@{s['next_offset']}" for stage, s in checkpoint.stages.items())
+        print(f"[Resume] Continuing the crawl started {checkpoint.started_at:%Y-%m-%d %H:%M} UTC ({summary}).")
+        return checkpoint
+
+    def status(self, stage: str) -> str:
+        return self.stages.get(stage, {}).get("status", "pending")
+
+    def next_offset(self, stage: str) -> int:
+        return self.stages.get(stage, {}).get("next_offset", 0)
+
+    def advance(self, stage: str, next_offset: int):
+        """Records a merged page; written to disk at most every `interval` seconds."""
+        self.stages[stage] = {"status": "in_progress", "next_offset": next_offset}
+        if time.monotonic() - self._last_write >= self.interval:
+            self.write()
+
+    def complete(self, stage: str):
+        with self.lock:
+            self.stages[stage] = {"status": "complete", "next_offset": self.next_offset(stage)}
+            self.write()
+
+    def abort(self, stage: str, reason) -> StageAborted:
+        """Marks the stage aborted, saves everything merged so far and returns the error to raise."""
+        with self.lock:
+            self.stages[stage] = {"status": "aborted", "next_offset": self.next_offset(stage), "error": str(reason)}
+            self.write()
+        return StageAborted(stage, self.next_offset(stage), reason)
+
+    def write(self):
+        with self.lock:
+            state = {"started_at": self.started_at.strftime("%Y-%m-%dT%H:%M:%SZ"), "stages": dict(self.stages), "items": self.items_db.to_payloads(internal=True),
+                     "inferred": sorted(self.items_db.inferred_ids)}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._last_write = time.monotonic()
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def crawl_cargo_stage(client: WikiClient, checkpoint: Checkpoint, stage: str, base_params: dict, add_row, workers: int = 1):
+    """Feeds every row of a Cargo table to `add_row`, resuming from the checkpoint. Yields each merged offset.
+
+    Reaching the last page marks the stage complete. An API error payload or an
+    exception marks it aborted and raises StageAborted.
+    """
+    if checkpoint.status(stage) == "complete":
+        print(f"  -> Restored from checkpoint ({len(checkpoint.items_db)} items).")
+        return
+    try:
+        for offset, resp in iter_cargo_pages(client, base_params, workers, start=checkpoint.next_offset(stage)):
+            if "error" in resp:
+                raise RuntimeError(f"API error: {resp['error'].get('info')}")
+            with checkpoint.lock:
+                merge_start = time.monotonic()
+                for entry in resp.get("cargoquery", []):
+                    add_row(entry.get("title", {}))
+                METRICS.add(parse_s=time.monotonic() - merge_start)
+                METRICS.count("rows", len(resp.get("cargoquery", [])))
+                checkpoint.advance(stage, offset + CARGO_PAGE_SIZE)
+            yield offset
+    except Exception as e:
+        raise checkpoint.abort(stage, e) from e
+    checkpoint.complete(stage)
+
+# ==========================================
+# STAGE SCHEDULER
+# ==========================================
+
+class Stage:
+    """One node of the build DAG: a callable plus the data it reads (`inputs`) and writes (`outputs`)."""
+
+    def __init__(self, name: str, run, inputs=(), outputs=()):
+        self.name, self.run = name, run
+        self.inputs, self.outputs = set(inputs), set(outputs)
+
+    def must_follow(self, earlier: "Stage") -> bool:
+        """True if running this stage before `earlier` finishes could change the result of the serial order."""
+        return bool(earlier.outputs & (self.inputs | self.outputs) or earlier.inputs & self.outputs)
+
+def run_stages(stages: list) -> dict:
+    """Runs stages as soon as every earlier stage they conflict with has finished, and reports the critical path.
+
+    Dependencies come from the declared inputs and outputs, taken in list order, so the
+    result is always the one a serial run would produce. Stages share whatever
+    WikiClient (and so whatever rate budget) their callables close over. If a stage
+    raises, nothing new is started; the stages already running are allowed to finish
+    (and checkpoint), every stage still waiting is skipped, and then the first error is re-raised.
+    Returns {stage name: {"start", "end", "critical_path"}} in seconds.
+    """
+    needs = {stage.name: {earlier.name for earlier in stages[:i] if stage.must_follow(earlier)} for i, stage in enumerate(stages)}
+    pending, running, timings, errors = list(stages), {}, {}, []
+    t0 = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while pending or running:
+            if not errors:
+                for stage in [s for s in pending if needs[s.name] <= timings.keys()]:
+                    pending.remove(stage)
+                    running[pool.submit(METRICS.run, stage.name, stage.run)] = (stage, time.monotonic() - t0)
+            if not running: break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, start = running.pop(future)
+                if future.exception():
+                    errors.append(future.exception())
+                    continue
+                critical_path = time.monotonic() - t0 - start + max((timings[n]["critical_path"] for n in needs[stage.name]), default=0.0)
+                timings[stage.name] = {"start": start, "end": time.monotonic() - t0, "critical_path": critical_path}
+    if errors:
+        if pending: print(f"[Stages] Skipped {', '.join(stage.name for stage in pending)}: an earlier stage aborted.")
+        raise errors[0]
+
+    print("\nStage timings (critical path = longest chain of dependencies ending with the stage):")
+    for name, t in timings.items():
+        direct = needs[name] - set().union(*(needs[n] for n in needs[name]))
+        print(f"  {name:<11} +{t['start']:7.1f}s -> +{t['end']:7.1f}s  ran {t['end'] - t['start']:7.1f}s  critical path {t['critical_path']:7.1f}s  after: {', '.join(sorted(direct)) or '-'}")
+    chain = [max(timings, key=lambda n: timings[n]["critical_path"])]
+    while needs[chain[-1]]:
+        chain.append(max(needs[chain[-1]], key=lambda n: timings[n]["critical_path"]))
+    print(f"  Critical path: {' -> '.join(reversed(chain))} ({timings[chain[0]]['critical_path']:.1f}s of {time.monotonic() - t0:.1f}s wall clock)")
+    return timings
+
+# ==========================================
+# MAIN WORKFLOW PIPELINE
+# ==========================================
+
+def fetch_data(workers: int = FETCH_WORKERS, requests_per_second: float = REQUESTS_PER_SECOND, cache: ResponseCache | None = None, checkpoint: Checkpoint | None = None) -> ItemStore:
+    """Fetches Terraria item data and writes it to a JSON file.
+
+    The steps are declared as Stages and handed to run_stages. Categories, recipes and
+    drops only need the Step 1 items, so they crawl concurrently under the one shared
+    rate budget. Progress is checkpointed per stage. A stage that cannot reach the end
+    of its table raises StageAborted before anything is written to JSON_OUTPUT_FILE.
+    """
+    # Categories, recipes and drops crawl at the same time, each with up to `workers` requests in flight.
+    client = WikiClient(session=create_session(max(10, 3 * workers)), limiter=TokenBucket(requests_per_second), cache=cache)
+
+    checkpoint = checkpoint or Checkpoint()
+    items_db = checkpoint.items_db
+    name_to_id_map = items_db.name_index
+
+    def add_item_row(data):
+        parsed = build_item_payload(data)
+        if parsed:
+            items_db.add(*parsed)
+
+    # --- Step 1: Base Items ---
+    def fetch_items():
+        print("Step 1/7: Fetching Base Items & Universal Stats...")
+        for offset in crawl_cargo_stage(client, checkpoint, "items", {"action": "cargoquery", "tables": "Items", "fields": ITEM_FIELDS}, add_item_row, workers):
+            print(f"Fetched {len(items_db)} items...")
+
+    # --- Step 2: Categorizing Sub-types ---
+    def fetch_categories():
+        if checkpoint.status("categories") == "complete":
+            print("\nStep 2/7: Restored categories from checkpoint.")
+            return
+        print(f"\nStep 2/7: Categorizing Sub-types via Category API...")
+        try:
+            page_categories = fetch_page_categories(client, [items_db[i]["name"] for i in name_to_id_map.values()], workers)
+        except Exception as e:
+            raise checkpoint.abort("categories", e) from e
+        tag_counts = {}
+        with checkpoint.lock:
+            for member_name, item_id in name_to_id_map.items():
+                specific_tag = specific_type_from_categories(page_categories.get(member_name, ()))
+                if specific_tag:
+                    items_db[item_id]["specific_type"] = specific_tag
+                    tag_counts[specific_tag] = tag_counts.get(specific_tag, 0) + 1
+        for specific_tag, match_count in tag_counts.items():
+            print(f"  -> Tagged {match_count} items as '{specific_tag}'.")
+        checkpoint.complete("categories")
+
+    # --- Step 3: Heuristic Inference (only fills blanks, so rerunning after a resume is harmless) ---
+    def infer_types():
+        print("\nStep 3/7: Running Heuristic Fallbacks & Detective Inference...")
+        with checkpoint.lock:
+            infer_blank_types(items_db)
+
+    # --- Step 4: Recipes ---
+    def fetch_recipes():
+        print("\nStep 4/7: Fetching Recipes & Resolving Aliases...")
+        for offset in crawl_cargo_stage(client, checkpoint, "recipes", {"action": "cargoquery", "tables": "Recipes", "fields": RECIPE_FIELDS}, lambda data: add_recipe_row(items_db, data), workers):
+            print(f"  ... Parsed {offset + CARGO_PAGE_SIZE} recipe entries ...")
+
+    # --- Step 5: Drops ---
+    def fetch_drops():
+        print("\nStep 5/7: Fetching Drops...")
+        for offset in crawl_cargo_stage(client, checkpoint, "drops", {"action": "cargoquery", "tables": "Drops", "fields": DROP_FIELDS}, lambda data: add_drop_row(items_db, data), workers):
+            pass
+
+    def resolve_aliases():
+        print("  -> Resolving ingredient & drop-source aliases...")
+        with checkpoint.lock:
+            canonicalize_aliases(client, items_db, workers)
+
+    def rollup():
+        print("  -> Rolling up crafting depth & raw materials...")
+        with checkpoint.lock:
+            rollup_crafting(items_db)
+
+    def atlases():
+        print("  -> Packing sprite atlases...")
+        with checkpoint.lock:
+            pack_sprite_atlases(items_db)
+
+    # --- Step 6: Cleanup & Export ---
+    def export():
+        save_database(items_db)
+
+    run_stages([
+        Stage("items", fetch_items, outputs=["items"]),
+        Stage("categories", fetch_categories, inputs=["items"], outputs=["specific_type"]),
+        Stage("inference", infer_types, inputs=["items", "specific_type"], outputs=["specific_type"]),
+        Stage("recipes", fetch_recipes, inputs=["items"], outputs=["recipes"]),
+        Stage("drops", fetch_drops, inputs=["items"], outputs=["acquisition"]),
+        Stage("aliases", resolve_aliases, inputs=["items", "recipes", "acquisition"], outputs=["recipes", "acquisition"]),
+        Stage("rollup", rollup, inputs=["items", "recipes"], outputs=["rollup"]),
+        Stage("atlases", atlases, inputs=["items", "specific_type"], outputs=["sprite"]),
+        Stage("export", export, inputs=["items", "specific_type", "recipes", "acquisition", "rollup", "sprite"], outputs=["database"]),
+    ])
+    checkpoint.discard()
+    return items_db
+
+# ==========================================
+# INCREMENTAL (DELTA) REBUILDS
+# ==========================================
+
+def load_build_state() -> dict | None:
+    """Returns the previous database plus its build timestamp, or None if a full build is required.
+
+    The crawl snapshot is preferred, so Step 3 reclassifies every item with the current
+    rules; a build from before the snapshot existed falls back to JSON_OUTPUT_FILE.
+    """
+    try:
+        with open(BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        items_db = load_database(CRAWL_OUTPUT_FILE if os.path.exists(CRAWL_OUTPUT_FILE) else JSON_OUTPUT_FILE)
+        built_at = datetime.fromisoformat(state["built_at"].replace("Z", "+00:00"))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError) as e:
+        print(f"[Incremental] No usable previous build ({e}); falling back to a full crawl.")
+        return None
+
+    age_days = (datetime.now(timezone.utc) - built_at).days
+    if age_days > RECENT_CHANGES_MAX_DAYS:
+        print(f"[Incremental] Previous build is {age_days} days old, beyond the wiki's change history; falling back to a full crawl.")
+        return None
+    return {"built_at": built_at, "items_db": items_db}
+
+def save_build_state(started_at: datetime, mode: str):
+    with open(BUILD_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"built_at": started_at.strftime("%Y-%m-%dT%H:%M:%SZ"), "mode": mode}, f, indent=4)
+
+def fetch_changed_titles(client: WikiClient, since: datetime) -> set:
+    """Lists every main-namespace page edited, created, deleted or moved since `since` via list=recentchanges.
+
+    Deletions and moves only show up as log events. A move lists both the old title and
+    its target, so the item is refetched under its new page and dropped from the old one.
+    """
+    titles, rccontinue = set(), None
+    while True:
+        params = {
+            "action": "query", "list": "recentchanges", "rcnamespace": 0, "rctype": "edit|new|log",
+            "rcprop": "title|loginfo", "rcend": since.strftime("%Y-%m-%dT%H:%M:%SZ"), "rclimit": 500, "format": "json"
+        }
+        if rccontinue: params["rccontinue"] = rccontinue
+        resp = client.get(params)
+        if "error" in resp:
+            raise RuntimeError(resp["error"].get("info"))
+        for change in resp.get("query", {}).get("recentchanges", []):
+            titles.add(change["title"])
+            if change.get("logtype") == "move" and change.get("logparams", {}).get("target_title"):
+                titles.add(change["logparams"]["target_title"])
+        rccontinue = resp.get("continue", {}).get("rccontinue")
+        if not rccontinue: return titles
+
+def cargo_in_clause(field: str, values) -> str:
+    quoted = ", ".join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values)
+    return f"{field} IN ({quoted})"
+
+def iter_cargo_rows_where(client: WikiClient, base_params: dict, field: str, values, workers: int = 1, batch_size: int = CARGO_IN_BATCH):
+    """Yields cargo rows whose `field` matches any of `values`, batching the IN (...) filter to keep URLs short.
+
+    Up to `workers` batches are in flight at once. Each is paged on its own, without a
+    row count first, so a batch is usually a single short page. Rows come back in batch order.
+    """
+    values = sorted(values)
+    batches = [values[start:start + batch_size] for start in range(0, len(values), batch_size)]
+
+    def fetch_batch(batch):
+        rows = []
+        for _, resp in iter_cargo_pages(client, {**base_params, "where": cargo_in_clause(field, batch)}):
+            if "error" in resp:
+                raise RuntimeError(resp["error"].get("info"))
+            rows.extend(entry.get("title", {}) for entry in resp.get("cargoquery", []))
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for rows in pool.map(charged_to_stage(fetch_batch), batches):
+            yield from rows
+
+def estimated_requests(items_db: ItemStore, changed_pages: set) -> tuple[int, int]:
+    """Rough (incremental, full crawl) request counts for refreshing `items_db` after `changed_pages` changed.
+
+    The incremental side counts the Items, Recipes and Drops queries by page, the
+    categories of the refetched items, and the recipe and drop refetches of every item
+    the changed pages feed, as far as the previous build can tell. The full side counts
+    Cargo pages and category batches for a wiki the size of the previous build.
+    """
+    def batches(count, size=CARGO_IN_BATCH): return -(-count // size)
+
+    affected = {item_id for item_id, item in items_db.items()
+                if (item.page or item.name) in changed_pages or (item.source_pages and not changed_pages.isdisjoint(item.source_pages))
+                or any(ing["name"] in changed_pages for recipe in item["crafting"]["recipes"] for ing in recipe["ingredients"])}
+    incremental = 4 * batches(len(changed_pages)) + 2 * batches(len(affected))
+    recipes = sum(len(item["crafting"]["recipes"]) for item in items_db.values())
+    drops = sum(len(item["acquisition"]) for item in items_db.values())
+    full = sum(batches(rows, CARGO_PAGE_SIZE) for rows in (len(items_db), recipes, drops)) + batches(len(items_db), 50)
+    return incremental, full
+
+def run_incremental_step(name: str, fn):
+    """Runs one network step of an incremental build as metrics stage `name`.
+
+    Any failure (an API error payload, a network error) becomes StageAborted, so the
+    build reports the same aborted status as a full crawl.
+    """
+    try:
+        return METRICS.run(name, fn)
+    except StageAborted:
+        raise
+    except Exception as e:
+        raise StageAborted(name, None, e) from e
+
+def fetch_data_incremental(previous: dict, workers: int = FETCH_WORKERS, requests_per_second: float = REQUESTS_PER_SECOND, cache: ResponseCache | None = None) -> ItemStore:
+    """Refreshes only the items, recipes and drops on wiki pages changed since the previous build.
+
+    Items whose page changed without still defining them (deleted, moved, renamed away)
+    are removed. An item fed by a changed page, through its Items row or through any
+    Recipes/Drops row before or after the change, has all its recipes and drops cleared
+    and refetched, so rows deleted from a page disappear too. The result matches a full
+    crawl of the same wiki state.
+    When so many pages changed that refetching them would take about as many requests
+    as crawling everything (see estimated_requests), it runs a full crawl instead.
+    Each step is its own metrics stage, named as in fetch_data. A failing network step
+    raises StageAborted before anything is written to JSON_OUTPUT_FILE.
+    """
+    client = WikiClient(session=create_session(max(10, workers)), limiter=TokenBucket(requests_per_second), cache=cache)
+    items_db = previous["items_db"]
+    name_to_id_map = items_db.name_index
+
+    def fetch_changes():
+        print(f"[Incremental] Asking the wiki for pages changed since {previous['built_at']:%Y-%m-%d %H:%M} UTC...")
+        changed = fetch_changed_titles(client, previous["built_at"])
+        print(f"[Incremental] {len(changed)} changed pages.")
+        return changed
+
+    changed_pages = run_incremental_step("changes", fetch_changes)
+    # A moved or deleted page no longer resolves the way the alias cache remembers.
+    for name in [name for name, canonical in ALIAS_CACHE.items() if name in changed_pages or canonical in changed_pages]:
+        del ALIAS_CACHE[name]
+        ALIAS_RESOLVED_AT.pop(name, None)
+    incremental_requests, full_requests = estimated_requests(items_db, changed_pages)
+    if incremental_requests >= full_requests:
+        print(f"[Incremental] Refetching them would take about {incremental_requests} requests, a full crawl about {full_requests}; "
+              f"falling back to a full crawl.")
+        return fetch_data(workers=workers, requests_per_second=requests_per_second, cache=cache)
+    # The sprite alias map can change between builds even when the wiki page did not.
+    for _, item in items_db.items():
+        if item["image_url"].startswith(f"/{SPRITES_DIR}/"): item["image_url"] = generate_image_url(item["name"])
+
+    # --- Step 1: Items defined on changed pages; items whose page no longer defines them are removed ---
+    def fetch_items() -> set:
+        print("Step 1/7: Refetching Changed Items...")
+        touched = set()
+        for data in iter_cargo_rows_where(client, {"action": "cargoquery", "tables": "Items", "fields": ITEM_FIELDS}, "_pageName", changed_pages, workers):
+            parsed = build_item_payload(data)
+            if parsed:
+                items_db.add(*parsed)
+                touched.add(parsed[0])
+        # Builds from before the page was recorded fall back to the item name, which is its page title on the wiki.
+        removed = [item_id for item_id, item in items_db.items() if (item.page or item.name) in changed_pages and item_id not in touched]
+        for item_id in removed:
+            items_db.remove(item_id)
+        print(f"Refreshed {len(touched)} items, removed {len(removed)}...")
+        return touched
+
+    touched_ids = run_incremental_step("items", fetch_items)
+
+    # --- Steps 2 & 3: Re-categorize only the refreshed items ---
+    def fetch_categories():
+        print("\nStep 2/7 & 3/7: Categorizing Refreshed Items...")
+        page_categories = fetch_page_categories(client, [items_db[i]["name"] for i in touched_ids], workers)
+        for item_id in touched_ids:
+            item = items_db[item_id]
+            item["specific_type"] = specific_type_from_categories(page_categories.get(item["name"].lower(), set()))
+        infer_blank_types(items_db)
+
+    run_incremental_step("categories", fetch_categories)
+
+    # --- Step 4: Every recipe of items a changed page feeds or used to feed ---
+    def fetch_recipes() -> set:
+        print("\nStep 4/7: Refetching Affected Recipes...")
+        recipe_params = {"action": "cargoquery", "tables": "Recipes", "fields": RECIPE_FIELDS}
+        # Ingredients count too: an alias rewritten to a changed page's title is kept only while that page is an item.
+        affected_ids = set(touched_ids) | {item_id for item_id, item in items_db.items()
+                                            if (item.source_pages and not changed_pages.isdisjoint(item.source_pages))
+                                            or any(ing["name"] in changed_pages for recipe in item["crafting"]["recipes"] for ing in recipe["ingredients"])}
+        for data in iter_cargo_rows_where(client, recipe_params, "_pageName", changed_pages, workers):
+            if data.get("resultid", "") in items_db: affected_ids.add(data["resultid"])
+        # Their provenance is rebuilt from the refetched rows, here and in Step 5, so Step 5 must cover them all.
+        for item_id in affected_ids:
+            items_db[item_id].source_pages = None
+            items_db.clear_recipes(item_id)
+        for data in iter_cargo_rows_where(client, recipe_params, "resultid", affected_ids, workers):
+            add_recipe_row(items_db, data)
+        print(f"  ... Rebuilt recipes for {len(affected_ids)} items ...")
+        return affected_ids
+
+    recipe_ids = run_incremental_step("recipes", fetch_recipes)
+
+    # --- Step 5: Every drop of those items and of items dropped per a changed page ---
+    def fetch_drops():
+        print("\nStep 5/7: Refetching Affected Drops...")
+        drop_params = {"action": "cargoquery", "tables": "Drops", "fields": DROP_FIELDS}
+        affected_names = {items_db[i]["name"] for i in recipe_ids}
+        for data in iter_cargo_rows_where(client, drop_params, "_pageName", changed_pages, workers):
+            item_name = sanitize_text(data.get("item", ""))
+            if item_name.lower() in name_to_id_map: affected_names.add(item_name)
+        for name in affected_names:
+            items_db.clear_drops(name_to_id_map[name.lower()])
+        for data in iter_cargo_rows_where(client, drop_params, "item", affected_names, workers):
+            add_drop_row(items_db, data)
+        print(f"  ... Rebuilt drops for {len(affected_names)} items ...")
+
+    run_incremental_step("drops", fetch_drops)
+    run_incremental_step("aliases", lambda: canonicalize_aliases(client, items_db, workers))
+    print("  -> Rolling up crafting depth & raw materials...")
+    METRICS.run("rollup", lambda: rollup_crafting(items_db))
+    print("  -> Packing sprite atlases...")
+    METRICS.run("atlases", lambda: pack_sprite_atlases(items_db))
+
+    METRICS.run("export", lambda: save_database(items_db))
+    return items_db
+
+# ==========================================
+# SPRITE ATLASES
+# ==========================================
+
+def png_size(path: str) -> tuple | None:
+    """(width, height) from a PNG's IHDR chunk without decoding it, or None for anything else."""
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR": return None
+    return struct.unpack(">II", head[16:24])
+
+def pack_shelves(sizes: dict, max_size: int = ATLAS_MAX_SIZE, padding: int = ATLAS_PADDING) -> list:
+    """Shelf first-fit decreasing height: key -> (w, h) into as few max_size squares as it takes.
+
+    Returns one (width, height, {key: (x, y)}) per atlas. Tallest sprites go first. Each
+    one lands on the first shelf with room, or opens a new shelf, or a new atlas. Shelves
+    are only as wide as a square holding every sprite, so a small group does not end up
+    as one max_size-wide shelf padded out to its tallest sprite.
+    """
+    if not sizes: return []
+    area = sum((w + padding) * (h + padding) for w, h in sizes.values())
+    width = min(max_size, max(max(w for w, _ in sizes.values()) + padding, math.ceil(math.sqrt(area))))
+    atlases = []  # [width, height, placements, shelves]; a shelf is [y, height, next x]
+    for key in sorted(sizes, key=lambda k: (-sizes[k][1], -sizes[k][0], k)):
+        w, h = sizes[key][0] + padding, sizes[key][1] + padding
+        for atlas in atlases:
+            shelf = next((s for s in atlas[3] if s[1] >= h and s[2] + w <= width), None)
+            if shelf is None and atlas[1] + h <= max_size:
+                shelf = [atlas[1], h, 0]
+                atlas[3].append(shelf)
+                atlas[1] += h
+            if shelf is not None: break
+        else:
+            shelf = [0, h, 0]
+            atlas = [0, h, {}, [shelf]]
+            atlases.append(atlas)
+        atlas[2][key] = (shelf[2], shelf[0])
+        shelf[2] += w
+        atlas[0] = max(atlas[0], shelf[2])
+    return [(width, height, placements) for width, height, placements, _ in atlases]
+
+def palette_buckets(sprites: dict, colors: int = ATLAS_PALETTE_COLORS) -> list:
+    """Splits path -> RGBA sprite into sheets that each fit one palette: [(palette, [paths])].
+
+    First fit, most colourful sprites first. The palette starts with the transparent
+    background, which every sheet needs. Sprites with more colours than a palette holds
+    share one truecolour sheet, whose palette is None.
+    """
+    transparent = (0, 0, 0, 0)
+    palettes = {}
+    for path, sprite in sprites.items():
+        counts = sprite.getcolors(colors)
+        palettes[path] = {colour for _, colour in counts} | {transparent} if counts else None
+    buckets, truecolor = [], []  # a bucket is [colours, paths]
+    for path in sorted(palettes, key=lambda p: (-len(palettes[p] or ()), p)):
+        sprite_colors = palettes[path]
+        if sprite_colors is None or len(sprite_colors) > colors:
+            truecolor.append(path)
+            continue
+        bucket = next((b for b in buckets if len(b[0]) + len(sprite_colors - b[0]) <= colors), None)
+        if bucket is None: buckets.append([set(sprite_colors), [path]])
+        else:
+            bucket[0] |= sprite_colors
+            bucket[1].append(path)
+    sheets = [([transparent] + sorted(colours - {transparent}), paths) for colours, paths in buckets]
+    return sheets + ([(None, truecolor)] if truecolor else [])
+
+def to_palette_image(sheet, palette: list):
+    """The RGBA `sheet` as a "P" image over `palette`, which holds every colour it uses; pixels are unchanged."""
+    from PIL import Image
+    index = {int.from_bytes(bytes(colour), sys.byteorder): n for n, colour in enumerate(palette)}
+    indexed = Image.frombytes("P", sheet.size, bytes(map(index.__getitem__, memoryview(sheet.tobytes()).cast("I"))))
+    indexed.putpalette(b"".join(bytes(colour) for colour in palette), rawmode="RGBA")
+    return indexed
+
+def pack_sprite_atlases(items_db: ItemStore, group_by: str = ATLAS_GROUP_BY) -> dict | None:
+    """Packs the local sprites into a few texture atlases and points every item at its slot.
+
+    Items are grouped like --shards ("category" or "id"), so a crafting tree, which mostly
+    stays within a few categories, pulls a handful of atlases. Sprites shared by several
+    items are packed once. Within a group, sprites that fit one ATLAS_PALETTE_COLORS palette
+    between them share a palette PNG, like the wiki's own icons, with every pixel kept
+    exact; the rest share a truecolour sheet. Each packed item gets `sprite`:
+    "<atlas url>#x,y,w,h". The coordinate map (ATLAS_MAP_FILE) holds the same slots keyed by item id. Non-PNG sprites
+    (animated GIFs), sprites over ATLAS_MAX_SPRITE_SIZE and missing files keep their own
+    image_url. Returns the request/byte metrics, or None when Pillow is not installed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("  -> Pillow is not installed; skipped the sprite atlases.")
+        return None
+
+    groups, sources = {}, {}
+    for item_id, item in items_db.items():
+        item["sprite"] = None
+        if not item["image_url"].startswith(f"/{SPRITES_DIR}/"): continue
+        path = os.path.join(SPRITES_DIR, item["image_url"][len(SPRITES_DIR) + 2:])
+        if path not in sources:
+            size = png_size(path) if os.path.isfile(path) else None
+            sources[path] = size if size and max(size) <= ATLAS_MAX_SPRITE_SIZE else None
+        if sources[path]:
+            groups.setdefault(shard_key(item_id, item, group_by), {}).setdefault(path, []).append(item_id)
+
+    def load_rgba(path):
+        with Image.open(path) as sprite:
+            return sprite.convert("RGBA")
+
+    os.makedirs(ATLAS_DIR, exist_ok=True)
+    atlas_map, written = {"group_by": group_by, "atlases": [], "slots": {}}, set()
+    for group in sorted(groups):
+        sprites = {path: load_rgba(path) for path in groups[group]}
+        sheets = [(palette, sheet) for palette, paths in palette_buckets(sprites)
+                  for sheet in pack_shelves({path: sources[path] for path in paths})]
+        for n, (palette, (width, height, placements)) in enumerate(sheets):
+            file_name = f"{group}-{n}.png"
+            sheet = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+            for path, (x, y) in placements.items():
+                sheet.paste(sprites[path], (x, y))
+            if palette: sheet = to_palette_image(sheet, palette)
+            tmp_path = os.path.join(ATLAS_DIR, file_name + ".tmp")
+            sheet.save(tmp_path, format="PNG", optimize=True)
+            os.replace(tmp_path, os.path.join(ATLAS_DIR, file_name))
+            written.add(file_name)
+            atlas_index = len(atlas_map["atlases"])
+            atlas_map["atlases"].append({"file": file_name, "group": group, "width": width, "height": height, "mode": sheet.mode,
+                                         "sprites": len(placements), "bytes": os.path.getsize(os.path.join(ATLAS_DIR, file_name))})
+            for path, (x, y) in placements.items():
+                w, h = sources[path]
+                for item_id in groups[group][path]:
+                    atlas_map["slots"][item_id] = [atlas_index, x, y, w, h]
+                    items_db[item_id]["sprite"] = f"/{ATLAS_DIR}/{file_name}#{x},{y},{w},{h}"
+    for stale in os.listdir(ATLAS_DIR):
+        if stale.endswith(".png") and stale not in written: os.remove(os.path.join(ATLAS_DIR, stale))
+    map_bytes = write_compressed(ATLAS_MAP_FILE, json.dumps(atlas_map, separators=(',', ':')).encode('utf-8'))
+
+    packed = {path for members in groups.values() for path in members}
+    metrics = {"sprites_packed": len(packed), "items_packed": len(atlas_map["slots"]),
+               "requests_before": len(packed), "bytes_before": sum(os.path.getsize(p) for p in packed),
+               "requests_after": len(atlas_map["atlases"]) + bool(atlas_map["atlases"]),
+               "bytes_after": sum(a["bytes"] for a in atlas_map["atlases"]) + map_bytes.get(ATLAS_MAP_FILE + ".gz", 0)}
+    print(f"  -> Packed {metrics['sprites_packed']} sprites ({metrics['items_packed']} items) into {len(atlas_map['atlases'])} atlases "
+          f"by {group_by}: {metrics['requests_before']} requests / {metrics['bytes_before'] / 1024:.0f} KiB before, "
+          f"{metrics['requests_after']} requests / {metrics['bytes_after'] / 1024:.0f} KiB after (incl. the gzipped map).")
+    return metrics
+
+# ==========================================
+# OFFLINE STAGES & LIBRARY API
+# ==========================================
+
+OFFLINE_STAGES = ("inference", "rollup", "atlases", "export", "exports", "versions", "sitemap")  # In build order
+PER_ITEM_STAGES = {"inference": infer_specific_type}  # Stages that only ever look at one item, so iter_items can stream them
+
+def load_database(path: str) -> ItemStore:
+    """Loads a crawl snapshot or a built terraria_items.json into an ItemStore.
+
+    The file is parsed one item at a time and each item goes straight into the store, so
+    the file's text and its full dict tree are never held alongside the records.
+    """
+    from .normalizer import iter_json_object
+
+    items_db = ItemStore()
+    for item_id, payload in iter_json_object(path):
+        items_db.add(item_id, ItemRecord(**payload))
+    return items_db
+
+def offline_stages(items_db: ItemStore, names, shard_by: str | None = None, versions_keep: int = VERSIONS_KEEP) -> list:
+    """The Stages among `names` that need no network, in build order, ready for run_stages.
+
+    They only read what the crawl left in items_db (plus the local sprites), so after an
+    INFERENCE_RULES change, say, rerunning inference + export over CRAWL_OUTPUT_FILE
+    takes seconds instead of a crawl. "export" rewrites JSON_OUTPUT_FILE but never the
+    crawl snapshot it may have been loaded from. A crawl snapshot has no Step 3 types,
+    rollup or atlas fields, so publishing from one (export, exports, versions, sitemap)
+    also runs inference, rollup and atlases rather than writing items without a
+    specific_type, depth, raw_materials or sprite.
+    """
+    names = set(names)
+    unknown = names - set(OFFLINE_STAGES)
+    if unknown:
+        raise ValueError(f"unknown stage(s) {', '.join(sorted(unknown))}; the offline stages are {', '.join(OFFLINE_STAGES)}")
+    if names & {"export", "exports", "versions", "sitemap"}:
+        missing = set()
+        if any(not item.specific_type for item in items_db.values()): missing.add("inference")
+        if any("depth" not in item.crafting for item in items_db.values()): missing.update(("rollup", "atlases"))
+        missing -= names
+        if missing:
+            print(f"[Stages] The database lacks fields these stages publish (a crawl snapshot?); also running {', '.join(n for n in OFFLINE_STAGES if n in missing)}.")
+        names |= missing
+    built = ["items", "specific_type", "recipes", "acquisition", "rollup", "sprite"]
+    stages = {
+        "inference": Stage("inference", lambda: infer_blank_types(items_db), inputs=["items", "specific_type"], outputs=["specific_type"]),
+        "rollup": Stage("rollup", lambda: rollup_crafting(items_db), inputs=["items", "recipes"], outputs=["rollup"]),
+        "atlases": Stage("atlases", lambda: pack_sprite_atlases(items_db), inputs=["items", "specific_type"], outputs=["sprite"]),
+        "export": Stage("export", lambda: save_database(items_db, write_crawl=False), inputs=built, outputs=["database"]),
+        # The publishing steps read the same store; they share an output only so their logs do not interleave.
+        "exports": Stage("exports", lambda: write_exports(items_db, ALIAS_CACHE, shard_by), inputs=built + ["database"], outputs=["published"]),
+        "versions": Stage("versions", lambda: publish_version(minified_json(items_db.to_payloads()), keep=versions_keep),
+                          inputs=built + ["database"], outputs=["published"]),
+        "sitemap": Stage("sitemap", lambda: generate_sitemap(items_db), inputs=built + ["database"], outputs=["published"]),
+    }
+    return [stages[name] for name in OFFLINE_STAGES if name in names]
+
+def iter_items(database: str | None = None, stages=("inference",), shard_by: str | None = None, versions_keep: int = VERSIONS_KEEP):
+    """Yields (item id, payload) as each item is built from a saved database (default: CRAWL_OUTPUT_FILE).
+
+    When every stage in `stages` is a PER_ITEM_STAGES one, the file is streamed and each
+    item is yielded as soon as it is parsed and processed, so memory stays at one item.
+    Any other stage needs the whole store (the rollup follows recipes across items). Then
+    memory holds every record: load_database still parses the file item by item, the
+    stages run, and then the items are yielded in order.
+    """
+    from .normalizer import iter_json_object
+
+    database = database or CRAWL_OUTPUT_FILE
+    if set(stages) <= PER_ITEM_STAGES.keys():
+        steps = [PER_ITEM_STAGES[name] for name in OFFLINE_STAGES if name in stages]
+        for item_id, payload in iter_json_object(database):
+            record = ItemRecord(**payload)
+            for step in steps:
+                step(record)
+            yield item_id, record.to_payload()
+        return
+    items_db = load_database(database)
+    run_stages(offline_stages(items_db, stages, shard_by, versions_keep))
+    for item_id, record in items_db.items():
+        yield item_id, record.to_payload()
@@ -0,0 +1,322 @@
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+EXPORT_GLOB = "Terraria_*_Export.json"  # Written by DataExporterMod, one per tModLoader environment
+EXPORT_NAME = re.compile(r"^Terraria_(?P<env>.+)_(?P<version>\d+(?:\.\d+)+)_Export\.json$")
+OUTPUT_TEMPLATE = "terraria_items_{env}_{version}.json"  # Same schema as the generator's terraria_items.json
+OUTPUT_DIR = "."
+NORMALIZE_WORKERS = 4  # Export files normalized at once, one process each
+CHUNK_SIZE = 1 << 16   # Characters read per step of the incremental parser
+WHITESPACE = " \t\r\n"
+
+# Vanilla crafting tiles (TileID names, as DataExporterMod writes them) -> the station names the wiki uses.
+# Mod tiles fall back to their class name split into words, e.g. "CosmicAnvil" -> "Cosmic Anvil".
+STATION_NAMES = {
+    "WorkBenches": "Work Bench", "Anvils": "Iron Anvil", "MythrilAnvil": "Mythril Anvil", "Furnaces": "Furnace",
+    "Hellforge": "Hellforge", "AdamantiteForge": "Adamantite Forge", "DemonAltar": "Demon Altar",
+    "HeavyWorkBench": "Heavy Work Bench", "LunarCraftingStation": "Ancient Manipulator",
+    "TinkerersWorkbench": "Tinkerer's Workshop", "Solidifier": "Solidifier", "Bottles": "Placed Bottle",
+    "Tables": "Table", "Tables2": "Table", "Chairs": "Chair", "Sawmill": "Sawmill", "Loom": "Loom",
+    "CookingPots": "Cooking Pot", "Kegs": "Keg", "ImbuingStation": "Imbuing Station", "DyeVat": "Dye Vat",
+    "Blendomatic": "Blend-O-Matic", "MeatGrinder": "Meat Grinder", "Bookcases": "Bookcase",
+    "CrystalBall": "Crystal Ball", "Autohammer": "Autohammer", "SkyMill": "Sky Mill", "IceMachine": "Ice Machine",
+    "LihzahrdFurnace": "Lihzahrd Furnace", "BoneWelder": "Bone Welder", "FleshCloningVat": "Flesh Cloning Vat",
+    "GlassKiln": "Glass Kiln", "HoneyDispenser": "Honey Dispenser", "LivingLoom": "Living Loom",
+    "SteampunkBoiler": "Steampunk Boiler", "LesionStation": "Decay Chamber", "Sinks": "Sink",
+    "AlchemyTable": "Alchemy Table", "TeaKettle": "Tea Kettle", "Campfire": "Campfire",
+}
+CAMEL_CASE_BREAK = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+# DetermineCategory() labels -> (specific_type, generic_types) in the generator's vocabulary
+CATEGORY_TYPES = {
+    "Wings": ("Wings", ["Accessory"]), "Mount": ("Mount", ["Mount summon"]), "Dye": ("Dye", ["Dye"]),
+    "Accessory": ("Accessory", ["Accessory"]), "Helmet": ("Head Armor", ["Armor"]),
+    "Chestplate": ("Body Armor", ["Armor"]), "Leggings": ("Leg Armor", ["Armor"]),
+    "Pickaxe": ("Pickaxe", ["Tool"]), "Axe": ("Axe", ["Tool"]), "Hammer": ("Hammer", ["Tool"]),
+    "Fishing Pole": ("Fishing Pole", ["Tool"]), "Yoyo": ("Yoyo", ["Weapon"]),
+    "Melee Projectile": ("Melee Weapon", ["Weapon"]), "Sword": ("Sword", ["Weapon"]), "Bow": ("Bow", ["Weapon"]),
+    "Gun": ("Gun", ["Weapon"]), "Launcher": ("Launcher", ["Weapon"]),
+    "Consumable Ranged": ("Consumable Ranged", ["Weapon", "Consumable"]), "Ranged Weapon": ("Ranged Weapon", ["Weapon"]),
+    "Magic Weapon": ("Magic Weapon", ["Weapon"]), "Sentry": ("Sentry Summon", ["Weapon"]), "Whip": ("Whip", ["Weapon"]),
+    "Summon Weapon": ("Minion Summon", ["Weapon"]), "Weapon": ("Weapon", ["Weapon"]),
+    "Ammunition": ("Ammo", ["Ammunition"]), "Bait": ("Bait", ["Bait"]), "Potion": ("Potion", ["Potion"]),
+    "Pet": ("Pet", ["Pet summon"]), "Consumable": ("Consumable", ["Consumable"]),
+    "Treasure Bag": ("Treasure Bag", ["Consumable"]), "Block / Furniture": ("Block", ["Block", "Furniture"]),
+    "Wall": ("Wall", ["Wall"]), "Material": ("Material", ["Material"]),
+}
+
+# ObtainedFromDrops source prefixes -> acquisition type
+SOURCE_TYPES = [("NPC: ", "drop"), ("Shop: ", "shop"), ("Chest/Crate/Bag: ", "container")]
+
+# ==========================================
+# INCREMENTAL PARSER
+# ==========================================
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE):
+    """Yields the elements of the top-level JSON array in `path` one at a time.
+
+    The file is read `chunk_size` characters at a time and each element is decoded with
+    JSONDecoder.raw_decode as soon as it is complete, so only one element (plus a chunk)
+    is ever held in memory. Malformed input raises json.JSONDecodeError like json.load.
+    """
+    return _iter_json_members(path, chunk_size, keyed=False)
+
+def iter_json_object(path: str, chunk_size: int = CHUNK_SIZE):
+    """Yields the (key, value) members of the top-level JSON object in `path` one at a time, like iter_json_array.
+
+    This is how terraria_items.json and its crawl snapshot are streamed item by item.
+    """
+    return _iter_json_members(path, chunk_size, keyed=True)
+
+def _iter_json_members(path: str, chunk_size: int, keyed: bool):
+    decoder = json.JSONDecoder()
+    opening, closing = "{}" if keyed else "[]"
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            return not eof
+
+        def skip(chars: str) -> str:
+            """Advances past `chars`, reading more as needed; returns the next character ("" at EOF)."""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return buffer[pos:pos + 1]
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Usually just a truncated value: read on, and re-raise once the file is exhausted.
+                    if eof or not fill():
+                        raise
+                    continue
+                # A number may have been cut off by the end of the buffer (containers and strings can't
+                # be): read on while it is followed by nothing ("" is in any string) or a digit/exponent.
+                if not isinstance(value, (dict, list, str)) and buffer[end:end + 1] in "0123456789+-.eE" and fill():
+                    continue
+                pos = end
+                return value
+
+        if skip(WHITESPACE) != opening:
+            raise json.JSONDecodeError(f"Expecting '{opening}' at the start of the file", buffer, pos)
+        pos += 1
+        if skip(WHITESPACE) == closing:
+            return
+        while True:
+            if keyed:
+                if buffer[pos:pos + 1] != '"':
+                    raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buffer, pos)
+                key = decode()
+                if skip(WHITESPACE) != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", buffer, pos)
+                pos += 1
+                skip(WHITESPACE)
+                yield key, decode()
+            else:
+                yield decode()
+
+            separator = skip(WHITESPACE)
+            if separator == closing:
+                return
+            if separator != ",":
+                raise json.JSONDecodeError(f"Expecting ',' or '{closing}' between elements", buffer, pos)
+            pos += 1
+            skip(WHITESPACE)
+
+# ==========================================
+# SCHEMA CONVERSION
+# ==========================================
+
+def station_name(tile: str) -> str:
+    return STATION_NAMES.get(tile) or CAMEL_CASE_BREAK.sub(" ", tile)
+
+def damage_class_name(raw: str) -> str:
+    """'true melee damage' -> 'Melee', ' damage' (DamageClass.Default) -> ''."""
+    words = [w for w in raw.lower().split() if w not in ("damage", "true")]
+    return " ".join(words).capitalize()
+
+def export_item_id(raw_id: str):
+    """Vanilla ids stay numeric like the generator's; mod ids ("CalamityMod_Foo") stay strings."""
+    return int(raw_id) if raw_id.isdigit() else raw_id
+
+def convert_stats(stats: dict) -> dict:
+    """Export Stats -> the generator's stats keys. Zero/absent values are left out, as the wiki leaves them blank."""
+    tool_power = stats.get("ToolPower") or {}
+    damage = stats.get("Damage") or 0
+    usable = damage > 0 or any(tool_power.values())
+    converted = {}
+    if damage > 0:
+        converted["damage"] = float(damage)
+        if stats.get("Knockback"): converted["knockback"] = float(stats["Knockback"])
+    if stats.get("Defense"): converted["defense"] = float(stats["Defense"])
+    if usable and stats.get("UseTime"): converted["usetime"] = float(stats["UseTime"])
+    if damage > 0 and stats.get("Velocity"): converted["velocity"] = float(stats["Velocity"])
+    value = (stats.get("Value") or {}).get("Raw") or 0
+    if value > 0:
+        converted["buy"] = float(value)        # Copper coins
+        converted["sell"] = float(value // 5)  # Terraria sells at a fifth of the value
+    for key, power in (("axe", "Axe"), ("hammer", "Hammer")):  # The wiki's Items table has no pickaxe power column
+        if tool_power.get(power): converted[key] = float(tool_power[power])
+    converted["rarity"] = int(stats.get("Rarity") or 0)
+    return converted
+
+def convert_recipe(recipe: dict) -> dict:
+    """One export recipe -> the generator's recipe dict. Several stations are joined with "and", conditions follow in parentheses."""
+    station = " and ".join(station_name(tile) for tile in recipe.get("Stations") or []) or "By Hand"
+    conditions = [c for c in recipe.get("Conditions") or [] if c]
+    if conditions:
+        station = f"{station} ({', '.join(conditions)})"
+    return {
+        "station": station,
+        "ingredients": [{"name": ing["Name"], "amount": int(ing["Amount"])} for ing in recipe.get("Ingredients") or []],
+        "version": "Desktop",
+        "transmutation": "extractinator" in station.lower() or "shimmer" in station.lower()
+    }
+
+def convert_source(drop: dict) -> dict:
+    source = drop.get("SourceNPC_Name") or ""
+    for prefix, acq_type in SOURCE_TYPES:
+        if source.startswith(prefix):
+            return {"type": acq_type, "source": source[len(prefix):], "rate": drop.get("DropChance") or ""}
+    return {"type": "drop", "source": source, "rate": drop.get("DropChance") or ""}
+
+def normalize_item(item: dict) -> dict:
+    """One DataExporterMod item -> a terraria_items.json payload (without the cross-item shimmer recipes)."""
+    stats = item.get("Stats") or {}
+    specific_type, generic_types = CATEGORY_TYPES.get(item.get("Category"), (item.get("Category") or "Item", []))
+    recipes, signatures = [], set()
+    for recipe in item.get("Recipes") or []:
+        converted = convert_recipe(recipe)
+        signature = json.dumps(converted, sort_keys=True)
+        if converted["ingredients"] and signature not in signatures:
+            signatures.add(signature)
+            recipes.append(converted)
+    acquisition, sources = [], set()
+    for drop in item.get("ObtainedFromDrops") or []:
+        converted = convert_source(drop)
+        if converted["source"] and (converted["type"], converted["source"]) not in sources:
+            sources.add((converted["type"], converted["source"]))
+            acquisition.append(converted)
+    return {
+        "id": export_item_id(str(item["ID"])),
+        "name": item.get("DisplayName") or item.get("InternalName") or "",
+        "description": (item.get("Tooltip") or "").strip() or "N/A",
+        "url": item.get("WikiUrl") or "",
+        "image_url": item.get("IconUrl") or "",
+        "generic_types": list(generic_types),
+        "specific_type": specific_type,
+        "damage_class": damage_class_name(stats.get("DamageClass") or "") if stats.get("Damage") else "",
+        "stats": convert_stats(stats),
+        "crafting": {"is_craftable": bool(recipes), "recipes": recipes},
+        "acquisition": acquisition,
+        "hardmode": bool(item.get("IsHardmode")),
+    }
+
+def shimmer_recipe(source_name: str) -> dict:
+    return {"station": "Shimmer", "ingredients": [{"name": source_name, "amount": 1}], "version": "Desktop", "transmutation": True}
+
+# ==========================================
+# FILE NORMALIZATION
+# ==========================================
+
+def output_path(export_path: str, output_dir: str = OUTPUT_DIR) -> str:
+    match = EXPORT_NAME.match(os.path.basename(export_path))
+    if not match:
+        raise ValueError(f"{export_path} is not named Terraria_<Env>_<version>_Export.json")
+    return os.path.join(output_dir, OUTPUT_TEMPLATE.format(**match.groupdict()))
+
+def peak_rss_mib() -> float | None:
+    """This process's peak resident set size (None where the resource module is missing, i.e. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB elsewhere
+
+def normalize_export(export_path: str, output_dir: str = OUTPUT_DIR, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Streams one export into terraria_items_<Env>_<version>.json and returns its stats.
+
+    Pass 1 converts items one at a time into a JSON-lines spool file, keeping only the
+    ShimmerDecraft edges (result name -> source names) in memory. Pass 2 replays the spool,
+    adds each result's "Shimmer" recipes and writes the final object item by item, in the
+    same layout as json.dump(..., indent=4). The output is swapped in with os.replace, so
+    readers never see a half-written file.
+    """
+    started = time.perf_counter()
+    final_path = output_path(export_path, output_dir)
+    spool_path, tmp_path = final_path + ".spool", final_path + ".tmp"
+    shimmer_sources = {}  # lowercase result name -> [source names]
+    counts = {"items": 0, "recipes": 0, "sources": 0, "shimmer": 0}
+    try:
+        with open(spool_path, 'w', encoding='utf-8') as spool:
+            for item in iter_json_array(export_path, chunk_size):
+                payload = normalize_item(item)
+                if item.get("ShimmerDecraft"):
+                    shimmer_sources.setdefault(item["ShimmerDecraft"].lower(), []).append(payload["name"])
+                spool.write(json.dumps(payload, ensure_ascii=False))
+                spool.write("\n")
+
+        with open(spool_path, 'r', encoding='utf-8') as spool, open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write("{")
+            for line in spool:
+                payload = json.loads(line)
+                recipes = payload["crafting"]["recipes"]
+                for source_name in shimmer_sources.get(payload["name"].lower(), ()):
+                    recipes.append(shimmer_recipe(source_name))
+                    counts["shimmer"] += 1
+                payload["crafting"]["is_craftable"] = bool(recipes)
+                body = json.dumps(payload, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+                out.write(f"{',' if counts['items'] else ''}\n    {json.dumps(str(payload['id']), ensure_ascii=False)}: {body}")
+                counts["items"] += 1
+                counts["recipes"] += len(recipes)
+                counts["sources"] += len(payload["acquisition"])
+            out.write("\n}" if counts["items"] else "}")
+        os.replace(tmp_path, final_path)
+    finally:
+        for leftover in (spool_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    peak_mib = peak_rss_mib()
+    return {"export": export_path, "output": final_path, **counts, "seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_mib": peak_mib and round(peak_mib, 1)}
+
+def normalize_exports(export_paths, output_dir: str = OUTPUT_DIR, workers: int = NORMALIZE_WORKERS,
+                      chunk_size: int = CHUNK_SIZE) -> list:
+    """Normalizes every export, one process per file, at most `workers` at a time.
+
+    Files are independent, so adding a mod environment adds a job rather than memory to
+    an existing one. Returns the per-file stats in the order the paths were given.
+    """
+    export_paths = list(export_paths)
+    for path in export_paths:
+        output_path(path, output_dir)  # Reject misnamed files before any work starts
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(export_paths) or 1))) as pool:
+        futures = {pool.submit(normalize_export, path, output_dir, chunk_size): path for path in export_paths}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            logging.info(f"{result['export']} -> {result['output']}: {result['items']} items, {result['recipes']} recipes "
+                         f"({result['shimmer']} shimmer), {result['sources']} sources in {result['seconds']:.2f} s")
+    return [results[path] for path in export_paths]
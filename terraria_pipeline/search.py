@@ -0,0 +1,127 @@
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+from .store import ItemStore
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# --- SEARCH ---
+SEARCH_RESULT_LIMIT = 15          # Matches the client's dropdown
+SEARCH_FUZZY_MIN_OVERLAP = 0.6    # Share of query trigrams a misspelled name must contain to be suggested
+SEARCH_MEMO_SIZE = 65536          # Distinct strings memoized by normalize_search_text / search_trigrams
+
+# ==========================================
+# SEARCH INDEX
+# ==========================================
+
+@lru_cache(maxsize=SEARCH_MEMO_SIZE)
+def normalize_search_text(text: str) -> str:
+    """Lowercase, accents and punctuation dropped, single spaces: "Jack 'O Lantern" -> "jack o lantern"."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return " ".join("".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c)).split())
+
+@lru_cache(maxsize=SEARCH_MEMO_SIZE)
+def search_trigrams(text: str, pad: bool = True) -> frozenset:
+    """Trigrams of `text`, space-padded on both sides when `pad` so word starts and ends count too."""
+    if pad: text = f" {text} "
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+def build_search_index(items_db: ItemStore, aliases: dict) -> dict:
+    """Item search without scanning every name, as JSON-ready data.
+
+    - terms: normalized item names, plus the `aliases` (alias -> canonical page name) that
+      resolve to an item. Ordered by rank, so every posting list is already best-first.
+      items[t] is the id that term t finds.
+    - prefix: term numbers sorted by term text, so a prefix is one bisect.
+    - trigrams: padded trigram -> ascending term numbers containing it.
+    - rank: item id -> tie-break position. Items used in more recipes come first, then
+      shorter names, so "Wood" beats "Wood Fishing Pole".
+    """
+    uses = Counter(ing["name"].lower() for _, item in items_db.items()
+                   for recipe in item["crafting"]["recipes"] for ing in recipe["ingredients"])
+    names = {item_id: item["name"] for item_id, item in items_db.items()}
+    ranked = sorted(names, key=lambda item_id: (-uses[names[item_id].lower()], len(names[item_id]), names[item_id]))
+    rank = {item_id: n for n, item_id in enumerate(ranked)}
+    by_name = {name.lower(): item_id for item_id, name in names.items()}
+    entries = {(normalize_search_text(name), item_id) for item_id, name in names.items()}
+    for alias, canonical in list(aliases.items()):
+        if canonical.lower() in by_name:
+            entries.add((normalize_search_text(alias), by_name[canonical.lower()]))
+    entries = sorted((entry for entry in entries if entry[0]), key=lambda entry: (rank[entry[1]], entry[0]))
+
+    trigrams = {}
+    for t, (term, _) in enumerate(entries):
+        for gram in sorted(search_trigrams(term)):
+            trigrams.setdefault(gram, []).append(t)
+    return {"terms": [term for term, _ in entries], "items": [item_id for _, item_id in entries],
+            "prefix": sorted(range(len(entries)), key=lambda t: entries[t][0]), "trigrams": trigrams, "rank": rank}
+
+def search_items(index: dict, query: str, limit: int | None = SEARCH_RESULT_LIMIT) -> list:
+    """Item ids matching `query`, best first. Python reference for the client search box.
+
+    Scored like the client: every token must appear in the name or an alias, with
+    exact 100, prefix 50 and contiguous substring 10 on top. Ties go to rank. Names
+    sharing at least SEARCH_FUZZY_MIN_OVERLAP of the query's trigrams fill any remaining
+    slots as typo suggestions. A query made only of one- and two-letter tokens matches
+    them at word starts, so "ir" finds "Iron Bar" but not "Fire".
+
+    Tiers are visited best-first, and each posting list is in rank order, so the walk
+    stops once `limit` items are found. Every substring match contains the query's
+    rarest trigram, so only that posting is scanned. A typo suggestion sharing `need` of
+    n trigrams contains one of the n - need + 1 rarest.
+    """
+    q = normalize_search_text(query)
+    if len(q) < 2: return []
+    terms, items, postings = index["terms"], index["items"], index["trigrams"]
+    tokens = q.split()
+    grams = set().union(*(search_trigrams(tok, pad=False) for tok in tokens if len(tok) >= 3))
+    word_starts = not grams
+    if word_starts: grams = {" " + tok for tok in tokens if len(tok) == 2}
+    by_rarity = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+    scores = {}
+
+    def full(): return limit is not None and len(scores) >= limit
+
+    def offer(t, score):
+        if score > scores.get(items[t], 0): scores[items[t]] = score
+
+    # --- Exact & prefix: one bisect into the prefix table ---
+    prefix = index["prefix"]
+    lo = bisect_left(prefix, q, key=terms.__getitem__)
+    hi = bisect_left(prefix, q + "\uffff", key=terms.__getitem__)
+    in_prefix = sorted(prefix[lo:hi])
+    for t in in_prefix:
+        if terms[t] == q: offer(t, 101)
+    for t in in_prefix:
+        if full(): break
+        offer(t, 51)
+
+    # --- Substring: every token present, contiguous query first ---
+    padded_tokens = [" " + tok for tok in tokens]
+    loose = []
+    for t in (postings.get(by_rarity[0], ()) if by_rarity else ()):
+        if full(): break
+        term = terms[t]
+        if word_starts and not all(tok in f" {term}" for tok in padded_tokens): continue
+        if not all(tok in term for tok in tokens): continue
+        if q in term: offer(t, 11)
+        else: loose.append(t)
+    for t in loose:
+        if full(): break
+        offer(t, 1)
+
+    # --- Typo suggestions ---
+    if grams and not full():
+        need = max(1, -int(-SEARCH_FUZZY_MIN_OVERLAP * len(grams) // 1))
+        candidates = set()
+        for gram in by_rarity[:len(grams) - need + 1]:
+            candidates.update(postings.get(gram, ()))
+        for t in candidates:
+            if items[t] in scores: continue
+            shared = len(grams & search_trigrams(terms[t]))
+            if shared >= need: offer(t, shared / (len(grams) + 1))
+    rank = index["rank"]
+    return sorted(scores, key=lambda item_id: (-scores[item_id], rank[item_id]))[:limit]
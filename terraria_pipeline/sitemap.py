@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import urllib.parse
+from datetime import datetime, timezone
+
+from .store import ItemRecord, ItemStore
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+SITEMAP_INDEX_FILE = "sitemap_index.xml"         # Lists the gzipped shards below; this is what robots.txt points at
+SITEMAP_SHARD_FILE = "sitemap-{n}.xml.gz"         # Shards sit next to the index so they may list every site URL
+SITEMAP_STATE_FILE = "sitemap_state.json"         # id -> [content hash, lastmod], kept between runs
+SITEMAP_MAX_URLS = 50000                          # Protocol limits per shard (uncompressed size)
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+BASE_URL = "https://terraritree.com/"
+
+# ==========================================
+# SITEMAP
+# ==========================================
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_FOOTER = '</urlset>\n'
+
+def sitemap_url(loc: str, lastmod: str, changefreq: str, priority: str) -> str:
+    # SECURITY FIX: html.escape applied to every URL to prevent structural breakage
+    return f"""  <url>
+    <loc>{html.escape(loc)}</loc>
+    <lastmod>{lastmod}</lastmod>
+    <changefreq>{changefreq}</changefreq>
+    <priority>{priority}</priority>
+  </url>
+"""
+
+class SitemapShards:
+    """Streams <url> entries into gzipped urlset files, rolling over at the protocol limits.
+
+    Each shard is written to a .tmp file and swapped in when it is closed. `written`
+    collects (file name, newest lastmod) for the sitemap index.
+    """
+
+    def __init__(self):
+        self.written = []
+        self._file = None
+
+    def add(self, entry: str, lastmod: str):
+        data = entry.encode('utf-8')
+        if self._file and (self._urls >= SITEMAP_MAX_URLS or self._bytes + len(data) + len(SITEMAP_FOOTER) > SITEMAP_MAX_BYTES):
+            self.close()
+        if not self._file:
+            self._path = SITEMAP_SHARD_FILE.format(n=len(self.written) + 1)
+            self._raw = open(self._path + ".tmp", 'wb')
+            self._file = gzip.GzipFile(filename="", mode='wb', fileobj=self._raw, compresslevel=9, mtime=0)
+            self._file.write(SITEMAP_HEADER.encode('utf-8'))
+            self._urls, self._bytes, self._lastmod = 0, len(SITEMAP_HEADER), lastmod
+        self._file.write(data)
+        self._urls += 1
+        self._bytes += len(data)
+        self._lastmod = max(self._lastmod, lastmod)
+
+    def close(self):
+        if not self._file: return
+        self._file.write(SITEMAP_FOOTER.encode('utf-8'))
+        self._file.close()
+        self._raw.close()
+        os.replace(self._path + ".tmp", self._path)
+        self.written.append((self._path, self._lastmod))
+        self._file = None
+
+def generate_sitemap(database: ItemStore):
+    """Streams gzipped sitemap shards plus sitemap_index.xml from the compiled database.
+
+    Each item's lastmod comes from a hash of its exported payload. The hash is kept in
+    SITEMAP_STATE_FILE between runs, so an item only gets a new date when its data
+    actually changed, and crawlers can skip the rest.
+    """
+    print("\nStep 7/7: Generating Sitemap...")
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    try:
+        with open(SITEMAP_STATE_FILE, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    state, changed, newest = {}, 0, ""
+    shards = SitemapShards()
+    for item_id, record in database.items():
+        payload = record.to_payload() if isinstance(record, ItemRecord) else record
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')).hexdigest()[:16]
+        known = previous.get(str(item_id))
+        fresh = not known or known[0] != digest
+        lastmod = today if fresh else known[1]
+        changed += fresh
+        state[str(item_id)] = [digest, lastmod]
+        newest = max(newest, lastmod)
+        shards.add(sitemap_url(f"{BASE_URL}?id={urllib.parse.quote(str(item_id))}", lastmod, "monthly", "0.8"), lastmod)
+    # The homepage lists every item, so it changes whenever any of them does.
+    shards.add(sitemap_url(BASE_URL, newest or today, "weekly", "1.0"), newest or today)
+    shards.close()
+
+    shard_pattern = re.compile("^" + re.escape(SITEMAP_SHARD_FILE).replace(r"\{n\}", r"\d+") + "$")
+    for stale in set(filter(shard_pattern.match, os.listdir("."))) - {path for path, _ in shards.written}:
+        os.remove(stale)
+    index = ['<?xml version="1.0" encoding="UTF-8"?>', '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for path, lastmod in shards.written:
+        index.append(f"  <sitemap>\n    <loc>{html.escape(BASE_URL + path)}</loc>\n    <lastmod>{lastmod}</lastmod>\n  </sitemap>")
+    index.append('</sitemapindex>\n')
+    for path, text in [(SITEMAP_INDEX_FILE, "\n".join(index)), (SITEMAP_STATE_FILE, json.dumps(state, separators=(',', ':')))]:
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+
+    print(f"Success! Generated {SITEMAP_INDEX_FILE} over {len(shards.written)} shard(s) with {len(state) + 1} indexed URLs "
+          f"({changed} items with new content).")
@@ -0,0 +1,420 @@
+import cProfile
+import hashlib
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import random
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, unquote
+
+from . import normalizer
+
+# Configuration
+JSON_FILE_PATH = 'Terraria_All_1.4.4_Export.json'
+OUTPUT_DIR = 'sprites'
+FAILED_LOG_FILE = 'failed_links_and_duplicates.txt'
+MANIFEST_FILE = 'sprites-manifest.json'  # filename -> url, ETag, Last-Modified, size, sha256 (+ alias_of) of every sprite
+ALIAS_FILE = 'sprites-aliases.json'      # Duplicate filename -> the byte-identical file actually stored; read by the generator
+DOWNLOAD_WORKERS = 8                     # Downloads in flight at once
+REQUESTS_PER_SECOND_PER_HOST = 4.0       # Shared by every worker hitting the same host
+PARTIAL_SUFFIX = '.part'                 # Downloads land here first and are renamed once complete
+METRICS_FILE = 'sprites-metrics.json'    # Per-stage timings and request statistics of the last run
+PROFILE_DIR = 'profiles'                 # --profile output: <stage>.prof or <stage>.tracemalloc.txt
+PROFILE_TOP = 25
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+def sanitize_and_validate_filename(url: str) -> str:
+    """
+    Strips paths, sanitizes characters, and strictly enforces safe image extensions.
+    """
+    parsed_url = urlparse(url)
+    filename = unquote(os.path.basename(parsed_url.path))
+    
+    # Whitelist safe characters
+    safe_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-. ")
+    sanitized = "".join(c for c in filename if c in safe_chars)
+    if not sanitized:
+        sanitized = "unknown_file"
+
+    # Enforce safe file extension
+    name, ext = os.path.splitext(sanitized)
+    if ext.lower() not in ALLOWED_EXTENSIONS:
+        # Neutralize potentially malicious extensions by forcing .png
+        sanitized = f"{sanitized}.png"
+        
+    return sanitized
+
+class HostRateLimiter:
+    """Thread-safe token bucket per host, so workers share each server's request budget."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._hosts = {}  # host -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str):
+        """Blocks until the URL's host has a request token available."""
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._hosts.setdefault(host, [1.0, now])
+                bucket[0] = min(1.0, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = (1 - bucket[0]) / self.rate
+            time.sleep(wait)
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))] if sorted_values else 0.0
+
+class DownloadMetrics:
+    """Thread-safe run statistics, written to METRICS_FILE when the run ends.
+
+    Each stage records wall and CPU time. Requests are counted by final status, with
+    bytes, latency percentiles and the urllib3 retries (and 429s among them) behind each.
+    """
+
+    def __init__(self, profile_stages=(), profile_mode: str = "cpu"):
+        self.stages = {}
+        self.requests = {"total": 0, "bytes": 0, "retries": 0, "http_429": 0, "by_status": {}}
+        self._latencies = []
+        self._lock = threading.Lock()
+        self.profile_stages, self.profile_mode = set(profile_stages), profile_mode
+
+    def request(self, response: "requests.Response", latency_s: float, nbytes: int = 0):
+        history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+        with self._lock:
+            self.requests["total"] += 1
+            self.requests["bytes"] += nbytes
+            self.requests["retries"] += len(history)
+            self.requests["http_429"] += sum(1 for attempt in history if attempt.status == 429) + (response.status_code == 429)
+            by_status = self.requests["by_status"]
+            by_status[str(response.status_code)] = by_status.get(str(response.status_code), 0) + 1
+            self._latencies.append(latency_s)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the block as stage `name`, under cProfile or tracemalloc if --profile picked it.
+
+        cProfile only sees this thread; in the download stage the workers' time shows up
+        as waits in as_completed. Use --profile-mode memory to see allocations across threads.
+        """
+        profiler = self._start_profile(name) if name in self.profile_stages else None
+        wall_start, cpu_start = time.monotonic(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages[name] = {"wall_s": round(time.monotonic() - wall_start, 3), "cpu_s": round(time.process_time() - cpu_start, 3)}
+            if profiler is not None:
+                self._stop_profile(name, profiler)
+
+    def _start_profile(self, name: str):
+        if self.profile_mode == "memory":
+            tracemalloc.start(10)
+            return tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, name: str, profiler):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if self.profile_mode == "memory":
+            top = tracemalloc.take_snapshot().compare_to(profiler, "lineno")[:PROFILE_TOP]
+            tracemalloc.stop()
+            path = os.path.join(PROFILE_DIR, f"sprites-{name}.tracemalloc.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(str(stat) for stat in top) + "\n")
+        else:
+            profiler.disable()
+            path = os.path.join(PROFILE_DIR, f"sprites-{name}.prof")
+            profiler.dump_stats(path)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        logging.info(f"Profile of the {name} stage written to {path}.")
+
+    def write(self, path: str = METRICS_FILE, **run_info):
+        """Writes {"run": run_info, "stages": ..., "requests": ...} atomically."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests_summary = {**self.requests, "by_status": dict(sorted(self.requests["by_status"].items())),
+                                "latency_ms": {label: round(percentile(latencies, q) * 1000, 1) for label, q in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]}}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"run": run_info, "stages": self.stages, "requests": requests_summary}, f, indent=2)
+        os.replace(tmp_path, path)
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest: dict):
+    """Atomic write: a crash mid-save leaves the previous manifest intact."""
+    tmp_path = MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=1)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def stored_path(filename: str, entry: dict | None) -> str | None:
+    """Where the bytes recorded in a manifest entry live on disk, if they are still intact."""
+    if not entry: return None
+    path = os.path.join(OUTPUT_DIR, entry.get("alias_of") or filename)
+    return path if os.path.isfile(path) and os.path.getsize(path) == entry.get("size") else None
+
+def download_sprite(session: "requests.Session", limiter: HostRateLimiter, metrics: DownloadMetrics, url: str, filename: str, known: dict | None) -> tuple:
+    """Fetches one sprite, returning (status, manifest entry or None, .part path or None).
+
+    A sprite whose bytes are still on disk (under its own name or as an alias) is
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged sprite costs
+    one 304. The body is streamed into a .part file, hashed on the way, and checked
+    against Content-Length. The .part file is handed back for store_sprite to keep or
+    drop, so sprites/ never holds a truncated image.
+    """
+    headers = {}
+    if known and known.get("url") == url and stored_path(filename, known):
+        if known.get("etag"): headers['If-None-Match'] = known["etag"]
+        if known.get("last_modified"): headers['If-Modified-Since'] = known["last_modified"]
+
+    limiter.acquire(url)
+    started = time.monotonic()
+    with session.get(url, headers=headers, timeout=10, stream=True) as response:
+        if response.status_code == 304:
+            metrics.request(response, time.monotonic() - started)
+            return "unchanged", known, None
+        if response.status_code != 200:
+            metrics.request(response, time.monotonic() - started)
+            return f"HTTP {response.status_code}", None, None
+
+        tmp_path = os.path.join(OUTPUT_DIR, f".{filename}{PARTIAL_SUFFIX}")
+        digest, size = hashlib.sha256(), 0
+        try:
+            with open(tmp_path, 'wb') as img_file:
+                for chunk in response.iter_content(chunk_size=8192):
+                    img_file.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            expected = response.headers.get('Content-Length')
+            if expected is not None and 'Content-Encoding' not in response.headers and int(expected) != size:
+                from requests.exceptions import ContentDecodingError
+                raise ContentDecodingError(f"truncated body ({size} of {expected} bytes)")
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            metrics.request(response, time.monotonic() - started, size)
+
+    entry = {"url": url, "etag": response.headers.get('ETag'), "last_modified": response.headers.get('Last-Modified'),
+             "size": size, "sha256": digest.hexdigest()}
+    return "fetched", entry, tmp_path
+
+def store_sprite(filename: str, entry: dict, tmp_path: str, manifest: dict, by_hash: dict) -> str:
+    """Keeps one copy per content hash: new bytes are renamed into place, known bytes become an alias.
+
+    `by_hash` maps sha256 -> the filename holding those bytes. The alphabetically first
+    filename holds them, so which file is canonical does not depend on download order.
+    Only the main thread calls this, so the manifest and the index never race.
+    """
+    canonical = by_hash.get(entry["sha256"])
+    if canonical and canonical < filename:
+        os.remove(tmp_path)
+        return record_alias(filename, entry, canonical, manifest, by_hash)
+    old = manifest.get(filename)
+    if old and not old.get("alias_of") and by_hash.get(old["sha256"]) == filename:
+        del by_hash[old["sha256"]]  # This file's old bytes are gone; aliases of them are repaired at the end
+    os.replace(tmp_path, os.path.join(OUTPUT_DIR, filename))
+    by_hash[entry["sha256"]] = filename
+    manifest[filename] = entry
+    if canonical and canonical != filename:
+        record_alias(canonical, manifest[canonical], filename, manifest, by_hash)  # Other aliases are re-pointed by save_aliases
+    return "unchanged" if old and old.get("sha256") == entry["sha256"] else "downloaded"
+
+def record_alias(filename: str, entry: dict, canonical: str, manifest: dict, by_hash: dict) -> str:
+    """Points `filename` at `canonical` and deletes its own now-redundant copy."""
+    old = manifest.get(filename)
+    manifest[filename] = {**entry, "alias_of": canonical}
+    filepath = os.path.join(OUTPUT_DIR, filename)
+    if by_hash.get(entry["sha256"]) != filename and filename not in by_hash.values() and os.path.exists(filepath):
+        os.remove(filepath)
+    return "unchanged" if old and old.get("alias_of") == canonical and old.get("sha256") == entry["sha256"] else "duplicate"
+
+def save_aliases(manifest: dict, by_hash: dict) -> int:
+    """Re-points every alias at the current copy of its bytes and writes ALIAS_FILE atomically.
+
+    An alias whose bytes no longer exist (its canonical file changed upstream) is dropped
+    from the manifest, so the next run downloads it again. Returns how many were dropped.
+    """
+    aliases, orphaned = {}, 0
+    for filename, entry in list(manifest.items()):
+        if not entry.get("alias_of"): continue
+        canonical = by_hash.get(entry["sha256"])
+        if canonical is None or canonical == filename:
+            del manifest[filename]
+            orphaned += 1
+            continue
+        entry["alias_of"] = aliases[filename] = canonical
+    tmp_path = ALIAS_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(aliases.items())), f, indent=1)
+    os.replace(tmp_path, ALIAS_FILE)
+    return orphaned
+
+def create_resilient_session(workers: int = DOWNLOAD_WORKERS) -> "requests.Session":
+    import requests  # Deferred with urllib3 so importing the package (and its offline commands) stays fast
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Bot/1.0'
+    })
+    return session
+
+def main(workers: int = DOWNLOAD_WORKERS, requests_per_second: float = REQUESTS_PER_SECOND_PER_HOST,
+         metrics_file: str = METRICS_FILE, profile_stages=(), profile_mode: str = "cpu"):
+    from requests.exceptions import RequestException
+
+    metrics = DownloadMetrics(profile_stages, profile_mode)
+    run_started, run_cpu = time.monotonic(), time.process_time()
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Leftovers of an interrupted run; the real files were never touched.
+    for stale in os.listdir(OUTPUT_DIR):
+        if stale.endswith(PARTIAL_SUFFIX):
+            os.remove(os.path.join(OUTPUT_DIR, stale))
+    
+    try:
+        # Streamed item by item: only the IconUrls are kept, never the whole export.
+        with metrics.stage("load"):
+            icon_urls = [item.get("IconUrl") for item in normalizer.iter_json_array(JSON_FILE_PATH)]
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logging.error(f"Failed to load JSON: {e}")
+        return
+
+    # Step 1: Pre-process and group URLs by their base filename
+    # Structure: { "Item.png": ["url1", "url2"], ... }
+    name_registry = {}
+    for url in icon_urls:
+        if url:
+            base_name = sanitize_and_validate_filename(url)
+            if base_name not in name_registry:
+                name_registry[base_name] = []
+            name_registry[base_name].append(url)
+
+    if not name_registry:
+        logging.info("No valid URLs found in the JSON file.")
+        return
+
+    # Step 2: Build the download queue and handle duplicate renaming
+    download_queue = []
+    duplicates_report = {} # To store data for the final text file
+    
+    for base_name, urls in name_registry.items():
+        if len(urls) > 1:
+            duplicates_report[base_name] = urls
+            
+        for index, url in enumerate(urls):
+            if index == 0:
+                final_filename = base_name
+            else:
+                # E.g., Item.png becomes Item_2.png
+                name, ext = os.path.splitext(base_name)
+                final_filename = f"{name}_{index + 1}{ext}"
+                
+            download_queue.append((url, final_filename))
+
+    # Step 3: One request per distinct URL (items sharing an icon URL share the download), in random order
+    files_by_url = {}
+    for url, filename in download_queue:
+        files_by_url.setdefault(url, []).append(filename)
+    unique_urls = list(files_by_url)
+    random.shuffle(unique_urls)
+    logging.info(f"Loaded {len(download_queue)} items ({len(unique_urls)} distinct URLs). Beginning download process with {workers} workers...")
+
+    session = create_resilient_session(workers)
+    limiter = HostRateLimiter(requests_per_second)
+    manifest = load_manifest()
+    by_hash = {entry["sha256"]: filename for filename, entry in manifest.items()
+               if not entry.get("alias_of") and stored_path(filename, entry)}
+    counts = {"downloaded": 0, "unchanged": 0, "duplicate": 0}
+    failed_urls = []
+    started = time.monotonic()
+
+    # Step 4: Bounded worker pool; the manifest and the hash index are only touched from this thread
+    with metrics.stage("download"):
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {pool.submit(download_sprite, session, limiter, metrics, url, files_by_url[url][0], manifest.get(files_by_url[url][0])): url
+                       for url in unique_urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                filename, *same_url = files_by_url[url]
+                try:
+                    status, entry, tmp_path = future.result()
+                    if tmp_path: status = store_sprite(filename, entry, tmp_path, manifest, by_hash)
+                except (RequestException, OSError) as e:
+                    logging.error(f"Request exception for {url}: {e}")
+                    failed_urls.append(url)
+                    continue
+                if entry is None:
+                    logging.error(f"Failed to download {url} - {status}")
+                    failed_urls.append(url)
+                    continue
+                counts[status] += 1
+                if status == "downloaded":
+                    print(f"[{filename}] icon downloaded. Total items downloaded: {counts['downloaded']}")
+                canonical = manifest[filename].get("alias_of") or filename
+                for other in same_url:
+                    counts[record_alias(other, entry, canonical, manifest, by_hash)] += 1
+        except KeyboardInterrupt:
+            metrics.write(metrics_file, status="interrupted", workers=workers, rps=requests_per_second, **counts, failed=len(failed_urls))
+            raise
+        finally:
+            # On Ctrl+C, queued downloads are dropped and in-flight ones finish (or clean up their .part file).
+            pool.shutdown(wait=True, cancel_futures=True)
+            orphaned = save_aliases(manifest, by_hash)
+            save_manifest(manifest)
+    logging.info(f"{counts['downloaded']} downloaded, {counts['unchanged']} unchanged, {counts['duplicate']} stored as aliases, "
+                 f"{len(failed_urls)} failed in {time.monotonic() - started:.0f}s.")
+    if orphaned:
+        logging.info(f"{orphaned} aliases lost their shared copy upstream and will be downloaded again next run.")
+
+    # Step 5: Composite Reporting
+    with metrics.stage("report"), open(FAILED_LOG_FILE, 'w', encoding='utf-8') as f:
+        f.write("=== FAILED DOWNLOADS ===\n")
+        if failed_urls:
+            for fail_url in failed_urls:
+                f.write(f"{fail_url}\n")
+        else:
+            f.write("No downloads failed.\n")
+            
+        f.write("\n\n=== REPEATED FILE NAMES AND THEIR LINKS ===\n")
+        if duplicates_report:
+            for base_name, urls in duplicates_report.items():
+                f.write(f"\nBase Filename: {base_name}\n")
+                for i, url in enumerate(urls):
+                    suffix = "" if i == 0 else f" (Saved as: {os.path.splitext(base_name)[0]}_{i+1}{os.path.splitext(base_name)[1]})"
+                    f.write(f"  - {url}{suffix}\n")
+        else:
+            f.write("No repeated filenames detected.\n")
+
+    metrics.write(metrics_file, status="ok", workers=workers, rps=requests_per_second, **counts, failed=len(failed_urls),
+                  wall_s=round(time.monotonic() - run_started, 3), cpu_s=round(time.process_time() - run_cpu, 3))
+    logging.info(f"Process complete. Log saved to {FAILED_LOG_FILE}, metrics to {metrics_file}.")
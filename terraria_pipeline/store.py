@@ -0,0 +1,252 @@
+import sys
+
+# ==========================================
+# ITEM STORE
+# ==========================================
+
+class ItemRecord:
+    """One item held in __slots__ rather than a per-item dict.
+
+    Supports item["key"] and item.get("key") so the row parsers and the classifier work on
+    records and plain JSON payloads alike. to_payload() restores the exact JSON shape.
+    The INTERNAL fields record which wiki pages the item came from. They are kept in the
+    crawl snapshot and the checkpoint (to_payload(internal=True)), never in the exports.
+    """
+    __slots__ = ("id", "name", "description", "url", "image_url", "generic_types", "specific_type", "damage_class", "stats", "crafting", "acquisition", "hardmode", "sprite",
+                 "page", "source_pages")
+    OPTIONAL = ("hardmode", "sprite")      # Left out of the payload while None
+    INTERNAL = ("page", "source_pages")    # Only in to_payload(internal=True), and only while set
+
+    def __init__(self, **fields):
+        self.hardmode = None      # Only present in the payload when the Items row had a value
+        self.sprite = None        # Atlas slot, set by pack_sprite_atlases
+        self.page = None          # Page holding the Items row (None in builds from before it was recorded)
+        self.source_pages = None  # Pages whose Recipes/Drops rows were merged into the item, see ItemStore.note_source_page
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_payload(self, internal: bool = False) -> dict:
+        payload = {key: getattr(self, key) for key in self.__slots__ if key not in self.OPTIONAL and key not in self.INTERNAL}
+        payload["acquisition"] = [acq.to_payload() if acq.__class__ is AcquisitionRecord else acq for acq in self.acquisition]
+        for key in self.OPTIONAL + (self.INTERNAL if internal else ()):
+            if getattr(self, key) is not None: payload[key] = getattr(self, key)
+        return payload
+
+class AcquisitionRecord:
+    """One acquisition entry held in __slots__; drops outnumber every other per-item row.
+
+    Supports entry["key"] like ItemRecord. to_payload() returns the JSON dict.
+    """
+    __slots__ = ("type", "source", "rate")
+
+    def __init__(self, type: str, source: str, rate: str):
+        self.type, self.source, self.rate = type, source, rate
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_payload(self) -> dict:
+        return {"type": self.type, "source": self.source, "rate": self.rate}
+
+class ItemStore:
+    """Replaces the dict-of-dicts items_db with slotted records and O(1) indexes.
+
+    Indexes: id -> record, lowercase name -> id (last writer wins, like the old
+    name_to_id_map), drop source -> ids, and recipe signature -> ids. The two reverse
+    indexes double as the Step 4/5 de-duplication check, so there are no per-item sets
+    or list scans. Repeated strings (names, stations, ingredients, sources, types) are
+    interned, and acquisition entries are stored as AcquisitionRecords.
+    Reverse-index values are a bare id until a second item shares the key, and only then
+    become a set; most recipe signatures belong to exactly one item. A recipe signature
+    is a flat tuple of interned strings and amounts, so it costs one small tuple per
+    recipe. Every item sharing a name is also kept, so when the item holding a
+    name_index entry is renamed or removed, the entry passes to the next one without a scan.
+    inferred_ids holds the items whose specific_type came from Step 3 rather than the
+    wiki, so the crawl snapshot can leave them blank for a rerun of the classifier.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self.name_index = {}
+        self.by_drop_source = {}
+        self.by_recipe_signature = {}
+        self._ids_by_name = {}  # lowercase name -> id, or {id: None, ...} in indexing order once several items share it
+        self.inferred_ids = set()
+
+    # --- Mapping interface (keeps items_db-style call sites working) ---
+    def __getitem__(self, item_id): return self._by_id[item_id]
+    def __contains__(self, item_id): return item_id in self._by_id
+    def __iter__(self): return iter(self._by_id)
+    def __len__(self): return len(self._by_id)
+    def get(self, item_id, default=None): return self._by_id.get(item_id, default)
+    def keys(self): return self._by_id.keys()
+    def values(self): return self._by_id.values()
+    def items(self): return self._by_id.items()
+
+    @staticmethod
+    def _index_add(index: dict, key: str | tuple, item_id: str) -> bool:
+        """Adds item_id under key; False when it was already there."""
+        owners = index.get(key)
+        if owners is None: index[key] = item_id
+        elif owners.__class__ is str:
+            if owners == item_id: return False
+            index[key] = {owners, item_id}
+        elif item_id in owners: return False
+        else: owners.add(item_id)
+        return True
+
+    @staticmethod
+    def _index_discard(index: dict, key: str | tuple, item_id: str):
+        owners = index.get(key)
+        if owners == item_id: del index[key]
+        elif owners.__class__ is set:
+            owners.discard(item_id)
+            if len(owners) == 1: index[key] = owners.pop()
+
+    @staticmethod
+    def _index_ids(index: dict, key: str | tuple) -> set:
+        owners = index.get(key)
+        if owners is None: return set()
+        return {owners} if owners.__class__ is str else set(owners)
+
+    def items_dropped_by(self, source: str) -> set:
+        return self._index_ids(self.by_drop_source, source)
+
+    def items_with_recipe(self, signature: tuple) -> set:
+        return self._index_ids(self.by_recipe_signature, signature)
+
+    @staticmethod
+    def recipe_signature(recipe: dict) -> tuple:
+        """(station, name, amount, name, amount, ...) with the ingredients sorted, so their order does not matter."""
+        ingredients = sorted((sys.intern(i["name"]), i["amount"]) for i in recipe["ingredients"])
+        return (sys.intern(recipe["station"]),) + tuple(part for ingredient in ingredients for part in ingredient)
+
+    def add(self, item_id: str, record: ItemRecord):
+        """Inserts or replaces an item, re-indexing any recipes and drops it already carries."""
+        if item_id in self._by_id:
+            self.clear_recipes(item_id)
+            self.clear_drops(item_id)
+            self._unindex_name(item_id)
+        record.name = sys.intern(record.name)
+        record.damage_class = sys.intern(record.damage_class)
+        record.generic_types = [sys.intern(t) for t in record.generic_types]
+        recipes, acquisition = record.crafting["recipes"], record.acquisition
+        record.crafting["recipes"], record.acquisition = [], []
+
+        self._by_id[item_id] = record
+        self.inferred_ids.discard(item_id)
+        key = record.name.lower()
+        self.name_index[key] = item_id
+        owners = self._ids_by_name.get(key)
+        if owners is None: self._ids_by_name[key] = item_id
+        elif owners.__class__ is str: self._ids_by_name[key] = {owners: None, item_id: None}
+        else: owners[item_id] = None
+        for recipe in recipes:
+            self.add_recipe(item_id, recipe)
+        for acq in acquisition:
+            self.add_drop(item_id, acq)
+
+    def _unindex_name(self, item_id: str):
+        """Drops the name entry of an item being renamed or removed; the last other item indexed under that name takes it over."""
+        key = self._by_id[item_id].name.lower()
+        owners = self._ids_by_name[key]
+        if owners.__class__ is str: del self._ids_by_name[key]
+        else:
+            del owners[item_id]
+            if len(owners) == 1: self._ids_by_name[key] = next(iter(owners))
+        if self.name_index.get(key) != item_id: return
+        remaining = self._ids_by_name.get(key)
+        if remaining is None: del self.name_index[key]
+        else: self.name_index[key] = remaining if remaining.__class__ is str else next(reversed(remaining))
+
+    def remove(self, item_id: str):
+        """Deletes an item whose wiki page is gone, with its recipes, drops and name entry."""
+        self.clear_recipes(item_id)
+        self.clear_drops(item_id)
+        self._unindex_name(item_id)
+        del self._by_id[item_id]
+        self.inferred_ids.discard(item_id)
+
+    def note_source_page(self, item_id: str, page: str):
+        """Records that a Recipes or Drops row on `page` was merged into the item, so an incremental build
+        knows to refetch the item's rows once that page changes or disappears."""
+        if not page: return
+        record = self._by_id[item_id]
+        if record.source_pages is None: record.source_pages = [sys.intern(page)]
+        elif page not in record.source_pages: record.source_pages.append(sys.intern(page))
+
+    def add_recipe(self, item_id: str, recipe: dict) -> bool:
+        """Appends the recipe unless the item already has one with the same signature."""
+        signature = self.recipe_signature(recipe)
+        if not self._index_add(self.by_recipe_signature, signature, item_id): return False
+        recipe["station"] = sys.intern(recipe["station"])
+        for ing in recipe["ingredients"]:
+            ing["name"] = sys.intern(ing["name"])
+        self._by_id[item_id].crafting["recipes"].append(recipe)
+        return True
+
+    def clear_recipes(self, item_id: str):
+        for recipe in self._by_id[item_id].crafting["recipes"]:
+            self._index_discard(self.by_recipe_signature, self.recipe_signature(recipe), item_id)
+        self._by_id[item_id].crafting["recipes"] = []
+
+    def add_drop(self, item_id: str, acquisition: dict) -> bool:
+        """Appends the acquisition entry (a dict or AcquisitionRecord) unless the item already lists that source."""
+        source = sys.intern(acquisition["source"])
+        if not self._index_add(self.by_drop_source, source, item_id): return False
+        self._by_id[item_id].acquisition.append(AcquisitionRecord(sys.intern(acquisition["type"]), source, sys.intern(acquisition["rate"])))
+        return True
+
+    def clear_drops(self, item_id: str):
+        for acq in self._by_id[item_id].acquisition:
+            self._index_discard(self.by_drop_source, acq["source"], item_id)
+        self._by_id[item_id].acquisition = []
+
+    def reindex(self, item_id: str, old_signatures: list, old_sources: list):
+        """Rebuilds an item's indexes after its recipes or sources were edited in place.
+
+        The caller passes the signatures and sources captured before editing, so the stale
+        reverse-index entries can be removed.
+        """
+        for signature in old_signatures:
+            self._index_discard(self.by_recipe_signature, signature, item_id)
+        for source in old_sources:
+            self._index_discard(self.by_drop_source, source, item_id)
+        record = self._by_id[item_id]
+        recipes, acquisition = record.crafting["recipes"], record.acquisition
+        record.crafting["recipes"], record.acquisition = [], []
+        for recipe in recipes:
+            self.add_recipe(item_id, recipe)
+        for acq in acquisition:
+            self.add_drop(item_id, acq)
+
+    def to_payloads(self, internal: bool = False) -> dict:
+        return {item_id: record.to_payload(internal) for item_id, record in self._by_id.items()}
+
+    @classmethod
+    def from_payloads(cls, payloads: dict) -> "ItemStore":
+        store = cls()
+        for item_id, payload in payloads.items():
+            store.add(item_id, ItemRecord(**payload))
+        return store
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from .exports import _MIN_JSON, MIN_JSON_OUTPUT_FILE, minified_json, write_compressed
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+VERSIONS_DIR = "terraria_items.versions"          # Content-addressed builds, delta patches and versions.json, see publish_version; CI ships it as release assets
+VERSIONS_KEEP = 12                                # Full builds kept (a year of monthly runs); older clients fetch the latest build
+VERSION_HASH_LENGTH = 16                          # Hex digits of the sha256 used in build and patch file names
+
+# ==========================================
+# VERSIONED BUILDS
+# ==========================================
+
+class PatchError(ValueError):
+    """A delta patch does not apply to the given base, or its result is not the build it promises."""
+
+def diff_object(old: dict, new: dict) -> dict:
+    """Structural diff of two JSON objects: {"set", "unset", "patch", "order"}, each only when needed.
+
+    Changed keys holding objects on both sides are diffed recursively when that is
+    smaller than the new value; anything else (lists included) is replaced in "set".
+    Values are compared by their serialization, so 1 vs 1.0 or a key reorder counts as
+    a change. "order" is only written when keeping the old order and appending new
+    keys would not reproduce the new key order.
+    """
+    diff, replaced, patched = {}, {}, {}
+    for key, value in new.items():
+        if key not in old:
+            replaced[key] = value
+            continue
+        encoded = _MIN_JSON(value)
+        if _MIN_JSON(old[key]) == encoded: continue
+        if isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff_object(old[key], value)
+            if len(_MIN_JSON(nested)) < len(encoded):
+                patched[key] = nested
+                continue
+        replaced[key] = value
+    removed = [key for key in old if key not in new]
+    if replaced: diff["set"] = replaced
+    if removed: diff["unset"] = removed
+    if patched: diff["patch"] = patched
+    if [key for key in old if key in new] + [key for key in new if key not in old] != list(new):
+        diff["order"] = list(new)
+    return diff
+
+def apply_object_diff(old: dict, diff: dict) -> dict:
+    unset = set(diff.get("unset", ()))
+    result = {key: value for key, value in old.items() if key not in unset}
+    for key, nested in diff.get("patch", {}).items():
+        result[key] = apply_object_diff(result[key], nested)
+    result.update(diff.get("set", {}))
+    if "order" in diff:
+        result = {key: result[key] for key in diff["order"]}
+    return result
+
+def diff_builds(old_payloads: dict, new_payloads: dict) -> dict:
+    """Per-item delta between two builds: removed ids, added items, per-item diffs, and the id order if it moved."""
+    changed = {}
+    for item_id, payload in new_payloads.items():
+        if item_id in old_payloads and _MIN_JSON(old_payloads[item_id]) != _MIN_JSON(payload):
+            changed[item_id] = diff_object(old_payloads[item_id], payload)
+    patch = {"removed": [i for i in old_payloads if i not in new_payloads],
+             "added": {i: payload for i, payload in new_payloads.items() if i not in old_payloads},
+             "changed": changed}
+    if [i for i in old_payloads if i in new_payloads] + list(patch["added"]) != list(new_payloads):
+        patch["order"] = list(new_payloads)
+    return patch
+
+def apply_build_patch(base: bytes, patch: dict) -> bytes:
+    """Applies one delta patch to the bytes of its base build and returns the new build's bytes.
+
+    Raises PatchError unless `base` is the build the patch starts from and the result
+    is byte-for-byte the build it leads to (both checked by sha256).
+    """
+    if hashlib.sha256(base).hexdigest() != patch["from_sha256"]:
+        raise PatchError(f"patch {patch['from']}-{patch['to']} does not start from this build")
+    payloads = json.loads(base)
+    removed = set(patch["removed"])
+    result = {item_id: apply_object_diff(payload, patch["changed"][item_id]) if item_id in patch["changed"] else payload
+              for item_id, payload in payloads.items() if item_id not in removed}
+    result.update(patch["added"])
+    if "order" in patch:
+        result = {item_id: result[item_id] for item_id in patch["order"]}
+    data = minified_json(result)
+    if hashlib.sha256(data).hexdigest() != patch["to_sha256"]:
+        raise PatchError(f"patch {patch['from']}-{patch['to']} did not reproduce its target build")
+    return data
+
+def load_versions(versions_dir: str = VERSIONS_DIR) -> dict:
+    try:
+        with open(os.path.join(versions_dir, "versions.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"format": 1, "latest": None, "versions": []}
+
+def read_version_file(versions_dir: str, file_name: str) -> bytes:
+    with open(os.path.join(versions_dir, file_name), 'rb') as f:
+        return f.read()
+
+def publish_version(data: bytes, versions_dir: str = VERSIONS_DIR, keep: int = VERSIONS_KEEP) -> dict | None:
+    """Step 6c: stores `data` as a content-addressed build plus a delta patch from the previous version.
+
+    versions.json chains the versions: entry N names its build and the patch taking
+    version N-1 to N, so a client holding any listed version can apply the patches after
+    it in order, or fetch the latest build when that is smaller. A patch is only
+    published once applying it to the previous build reproduces `data` exactly. Only the
+    newest `keep` builds are kept; the patches of the kept versions stay, so a client on
+    the version just before them can still catch up. Returns the new entry, or None when
+    the build did not change.
+    """
+    print("\nStep 6c/7: Publishing Versioned Build & Delta Patch...")
+    manifest = load_versions(versions_dir)
+    sha256 = hashlib.sha256(data).hexdigest()
+    build_hash = sha256[:VERSION_HASH_LENGTH]
+    previous = manifest["versions"][-1] if manifest["versions"] else None
+    if previous and previous["sha256"] == sha256:
+        print(f"  -> Unchanged since version {previous['version']} ({build_hash}); nothing to publish.")
+        return None
+
+    os.makedirs(os.path.join(versions_dir, "builds"), exist_ok=True)
+    os.makedirs(os.path.join(versions_dir, "patches"), exist_ok=True)
+    entry = {"version": previous["version"] + 1 if previous else 1, "hash": build_hash, "sha256": sha256,
+             "file": f"builds/{build_hash}.min.json", "bytes": len(data),
+             "built_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), "patch": None}
+    write_compressed(os.path.join(versions_dir, entry["file"]), data)
+
+    base = None
+    if previous:
+        try:
+            base = read_version_file(versions_dir, previous["file"])
+        except FileNotFoundError:
+            print(f"  [!] Build of version {previous['version']} is missing; publishing without a patch.")
+    if base is not None:
+        patch = {"format": 1, "from": previous["hash"], "to": build_hash, "from_sha256": previous["sha256"], "to_sha256": sha256,
+                 **diff_builds(json.loads(base), json.loads(data))}
+        try:
+            if apply_build_patch(base, patch) != data:
+                raise PatchError("result differs from the full build")
+        except PatchError as e:
+            print(f"  [!] Not publishing the patch from version {previous['version']}: {e}")
+        else:
+            patch_file = f"patches/{previous['hash']}-{build_hash}.patch.json"
+            patch_data = minified_json(patch)
+            sizes = write_compressed(os.path.join(versions_dir, patch_file), patch_data)
+            entry["patch"] = {"from": previous["hash"], "file": patch_file, "bytes": len(patch_data),
+                              "changed": len(patch["changed"]), "added": len(patch["added"]), "removed": len(patch["removed"])}
+            print(f"  -> Patch {previous['version']} -> {entry['version']}: {len(patch['changed'])} changed, {len(patch['added'])} added, "
+                  f"{len(patch['removed'])} removed; {len(patch_data) / 1024:.0f} KiB "
+                  f"({sizes[os.path.join(versions_dir, patch_file) + '.gz'] / 1024:.0f} KiB gzipped) vs. {len(data) / 1024:.0f} KiB full")
+
+    manifest["versions"].append(entry)
+    for stale in manifest["versions"][:-keep]:
+        for file_name in [stale["file"]] + ([stale["patch"]["file"]] if stale["patch"] else []):
+            for suffix in ("", ".gz", ".br"):
+                if os.path.exists(os.path.join(versions_dir, file_name + suffix)):
+                    os.remove(os.path.join(versions_dir, file_name + suffix))
+    manifest["versions"] = manifest["versions"][-keep:]
+    manifest["latest"] = {"version": entry["version"], "hash": build_hash}
+    manifest_path = os.path.join(versions_dir, "versions.json")
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    print(f"  -> Version {entry['version']} ({build_hash}) in {versions_dir}/, {len(manifest['versions'])} builds kept.")
+    return entry
+
+def apply_version_patches(base: bytes, versions_dir: str = VERSIONS_DIR) -> bytes:
+    """Brings a build held by a client up to the latest version by applying every patch after it, in order.
+
+    The base may be a listed version or the pruned one that the oldest kept patch starts from.
+    """
+    manifest = load_versions(versions_dir)
+    build_hash = hashlib.sha256(base).hexdigest()[:VERSION_HASH_LENGTH]
+    start = next((n + 1 for n, entry in reversed(list(enumerate(manifest["versions"]))) if entry["hash"] == build_hash), None)
+    if start is None and manifest["versions"] and (manifest["versions"][0]["patch"] or {}).get("from") == build_hash:
+        start = 0
+    if start is None:
+        raise PatchError(f"build {build_hash} is not a version listed in {versions_dir}/versions.json")
+    data = base
+    for entry in manifest["versions"][start:]:
+        try:
+            patch = json.loads(read_version_file(versions_dir, entry["patch"]["file"])) if entry["patch"] else None
+        except FileNotFoundError:
+            patch = None
+        if patch is None:
+            raise PatchError(f"version {entry['version']} has no patch; fetch {entry['file']} instead")
+        data = apply_build_patch(data, patch)
+    return data
+
+def verify_versions(versions_dir: str = VERSIONS_DIR, full_build: str | None = MIN_JSON_OUTPUT_FILE) -> list:
+    """Checks every kept build against its sha256, every patch whose base is kept against the full build
+    it leads to, the whole chain from the oldest kept build to the latest, and the latest build against
+    `full_build` when that exists. Returns the problems (empty = OK)."""
+    manifest, problems, builds = load_versions(versions_dir), [], {}
+    for entry in manifest["versions"]:
+        try:
+            data = read_version_file(versions_dir, entry["file"])
+        except FileNotFoundError:
+            problems.append(f"version {entry['version']}: {entry['file']} is missing")
+            continue
+        if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            problems.append(f"version {entry['version']}: {entry['file']} does not match its sha256")
+            continue
+        builds[entry["hash"]] = data
+    for entry in manifest["versions"]:
+        if entry["patch"] and entry["patch"]["from"] in builds and entry["hash"] in builds:
+            try:
+                patched = apply_build_patch(builds[entry["patch"]["from"]], json.loads(read_version_file(versions_dir, entry["patch"]["file"])))
+                if patched != builds[entry["hash"]]:
+                    problems.append(f"version {entry['version']}: patched build differs from {entry['file']}")
+            except (FileNotFoundError, PatchError) as e:
+                problems.append(f"version {entry['version']}: {e}")
+    if manifest["versions"] and not problems:
+        oldest, latest = manifest["versions"][0], manifest["versions"][-1]
+        try:
+            if apply_version_patches(builds[oldest["hash"]], versions_dir) != builds[latest["hash"]]:
+                problems.append(f"chain {oldest['version']} -> {latest['version']}: result differs from {latest['file']}")
+        except PatchError as e:
+            problems.append(f"chain {oldest['version']} -> {latest['version']}: {e}")
+    if manifest["versions"] and full_build and os.path.exists(full_build):
+        with open(full_build, 'rb') as f:
+            if builds.get(manifest["versions"][-1]["hash"]) != f.read():
+                problems.append(f"{full_build} is not the latest version's build")
+    return problems
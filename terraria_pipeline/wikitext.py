@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# --- TEXT NORMALIZATION ---
+TEXT_MEMO_SIZE = 65536  # Distinct strings memoized by sanitize_text / parse_ingredients
+
+# ==========================================
+# WIKITEXT NORMALIZATION
+# ==========================================
+
+# Station names, ingredient names and types repeat tens of thousands of times per build,
+# so normalization is memoized and only strings that contain markup are tokenized.
+MARKUP_CHARS = re.compile(r'[<\[\r\n\t]')
+# Every kind of markup in one alternation, scanned once. A run of whitespace also takes
+# in item tags followed by more whitespace, since dropping the tags would join the runs.
+MARKUP_TOKEN = re.compile(
+    r'(?P<tag><[^>]+>)'                                              # HTML tag -> space
+    r'|\[c/[a-fA-F0-9]{6}:(?P<colored>(?:\[\[[^\]]*\]\]|[^\]\n])*)\]'  # [c/rrggbb:text] -> text, links included
+    r'|(?P<icon>\[[a-zA-Z]:[^\]\n]*\])'                              # [i:123] and other chat tags -> nothing
+    r'|\[\[(?:[^|\]]*\|)?(?P<link>[^\]]+)\]\]'                       # [[Page|label]] -> label
+    r'|(?P<space>[\r\n\t]+(?:(?:\[[a-zA-Z]:[^\]\n]*\])+[\r\n\t]+)*)'  # line breaks and tabs -> one space
+)
+NUMERIC_STAT = re.compile(r'-?\d+(?:\.\d+)?')
+# One pass over the whole "^"-separated list; each match is the first "¦name¦amount" of one part.
+INGREDIENT_PART = re.compile(r'(?:\A|\^)[^^]*?¦([^^\n]*?)¦(\d+)[^^]*')
+
+def _replace_markup(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "icon": return ""
+    if kind in ("tag", "space"): return " "
+    # Coloured text and link labels can hold markup of their own.
+    return MARKUP_TOKEN.sub(_replace_markup, match.group(kind))
+
+@lru_cache(maxsize=TEXT_MEMO_SIZE)
+def _sanitize_text(text: str) -> str:
+    # Plain strings (the vast majority) have nothing to tokenize.
+    if not MARKUP_CHARS.search(text): return text.strip()
+    return MARKUP_TOKEN.sub(_replace_markup, text).strip()
+
+def sanitize_text(text: str) -> str:
+    if not text: return ""
+    return _sanitize_text(text)
+
+def parse_numeric_stat(text: str) -> float | None:
+    if not text: return None
+    match = NUMERIC_STAT.search(str(text))
+    return float(match.group()) if match else None
+
+@lru_cache(maxsize=TEXT_MEMO_SIZE)
+def _parse_ingredient_pairs(ings_string: str) -> tuple:
+    return tuple((sanitize_text(name), int(amount)) for name, amount in INGREDIENT_PART.findall(ings_string))
+
+def parse_ingredients(ings_string: str) -> list:
+    if not ings_string: return []
+    # Fresh dicts every call: callers (e.g. canonicalize_aliases) edit ingredients in place.
+    return [{"name": name, "amount": amount} for name, amount in _parse_ingredient_pairs(ings_string)]